@@ -0,0 +1,184 @@
+import numpy as np
+
+# Nodos y pesos de la regla de Gauss–Kronrod 7-15 en [-1, 1] (QUADPACK).
+# Los nodos de índice impar (1, 3, ..., 13) son los de Gauss de 7 puntos.
+_XGK = np.array([
+    0.991455371120812639206854697526329,
+    0.949107912342758524526189684047851,
+    0.864864423359769072789712788640926,
+    0.741531185599394439863864773280788,
+    0.586087235467691130294144845693013,
+    0.405845151377397166906606412076961,
+    0.207784955007898467600689403773245,
+    0.000000000000000000000000000000000,
+])
+_WGK = np.array([
+    0.022935322010529224963732008058970,
+    0.063092092629978553290700663189204,
+    0.104790010322250183839876322541518,
+    0.140653259715525918745189590510238,
+    0.169004726639267902826583426598550,
+    0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649,
+    0.209482141084727828012999174891714,
+])
+_WG = np.array([
+    0.129484966168869693270611432679082,
+    0.279705391489276667901467771423780,
+    0.381830050505118944950369775488975,
+    0.417959183673469387755102040816327,
+])
+
+NODOS_GK15 = np.concatenate([-_XGK[:-1], _XGK[::-1]])
+PESOS_K15 = np.concatenate([_WGK[:-1], _WGK[::-1]])
+PESOS_G7 = np.zeros(15)
+PESOS_G7[1:7:2] = _WG[:3]
+PESOS_G7[7] = _WG[3]
+PESOS_G7[9:15:2] = _WG[2::-1]
+
+# Valores por defecto del modo adaptativo
+RTOL = 1e-8
+ATOL = 1e-10
+MAX_EVAL = 200000
+
+
+class Presupuesto:
+    """
+    Contador de evaluaciones del integrando compartido entre todos los
+    niveles de una integral anidada.
+    """
+    def __init__(self, max_eval):
+        self.max_eval = int(max_eval)
+        self.usadas = 0
+
+    @property
+    def restantes(self):
+        return self.max_eval - self.usadas
+
+
+def _limite_vector(func, *args):
+    forma = np.shape(args[0])
+    return np.broadcast_to(np.asarray(func(*args), dtype=float), forma)
+
+
+def gauss_kronrod_adaptativo(f, a, b, rtol=RTOL, atol=ATOL, presupuesto=None, contar=True, al_refinar=None):
+    """
+    Cuadratura adaptativa de Gauss–Kronrod 7-15 con subdivisión global.
+    En cada ronda todos los subintervalos pendientes se evalúan en una sola
+    llamada vectorizada a f. Un subintervalo se acepta cuando |K15 - G7| es
+    menor que su parte proporcional de la tolerancia; si no, se biseca.
+    Con contar=False las evaluaciones de f no se descuentan del presupuesto
+    (f es a su vez una cuadratura interior que ya las contabiliza).
+    al_refinar, si se da, recibe la estimación acumulada de cada ronda.
+    Devuelve (valor, error_estimado, convergio).
+    """
+    if presupuesto is None:
+        presupuesto = Presupuesto(MAX_EVAL)
+    if a == b:
+        return 0.0, 0.0, True
+    if a > b:
+        valor, error, convergio = gauss_kronrod_adaptativo(
+            f, b, a, rtol, atol, presupuesto, contar,
+            None if al_refinar is None else lambda e: al_refinar({**e, "valor": -e["valor"]})
+        )
+        return -valor, error, convergio
+
+    longitud = b - a
+    izq = np.array([a], dtype=float)
+    der = np.array([b], dtype=float)
+    valor_aceptado = 0.0
+    error_aceptado = 0.0
+    while True:
+        centro = 0.5 * (izq + der)
+        radio = 0.5 * (der - izq)
+        nodos = centro[:, None] + radio[:, None] * NODOS_GK15
+        with np.errstate(all="ignore"):
+            vals = np.broadcast_to(np.asarray(f(nodos), dtype=float), nodos.shape)
+        if contar:
+            presupuesto.usadas += nodos.size
+        if not np.all(np.isfinite(vals)):
+            raise ValueError("La función tiene valores infinitos o indefinidos en el intervalo.")
+        kronrod = (vals @ PESOS_K15) * radio
+        gauss = (vals @ PESOS_G7) * radio
+        errores = np.abs(kronrod - gauss)
+
+        total = valor_aceptado + kronrod.sum()
+        error_total = error_aceptado + errores.sum()
+        tol = max(atol, rtol * abs(total))
+        if al_refinar is not None:
+            al_refinar({
+                "valor": float(total), "error_estimado": float(error_total),
+                "evaluaciones": presupuesto.usadas, "convergio": bool(error_total <= tol),
+            })
+        if error_total <= tol:
+            return float(total), float(error_total), True
+
+        aceptar = errores <= tol * (der - izq) / longitud
+        valor_aceptado += kronrod[aceptar].sum()
+        error_aceptado += errores[aceptar].sum()
+        refinar = ~aceptar
+        # Sin presupuesto para bisecar (o subintervalos ya en el límite de la
+        # precisión): se devuelve la mejor estimación disponible.
+        if (presupuesto.restantes < 2 * 15 * refinar.sum()
+                or np.any(radio[refinar] <= 8 * np.finfo(float).eps * max(abs(a), abs(b), 1.0))):
+            return float(total), float(error_total), False
+        medio = centro[refinar]
+        izq, der = np.concatenate([izq[refinar], medio]), np.concatenate([medio, der[refinar]])
+
+
+def _anidada(f, a, b, limites, rtol, atol, presupuesto, al_refinar=None):
+    """
+    Aplica la cuadratura adaptativa de forma anidada. limites es una lista de
+    pares (inf_func, sup_func) para las variables interiores; cada función
+    recibe las variables exteriores ya fijadas. al_refinar solo se pasa al
+    nivel exterior: cada ronda suya ya incluye todas las integrales interiores.
+    """
+    if not limites:
+        return gauss_kronrod_adaptativo(f, a, b, rtol, atol, presupuesto, al_refinar=al_refinar)
+
+    (inf_func, sup_func), resto = limites[0], limites[1:]
+    atol_int = atol / max(abs(b - a), 1.0)
+    estado = {"error_max": 0.0, "convergio": True}
+
+    def interna(xs):
+        forma = xs.shape
+        xs = xs.ravel()
+        c = _limite_vector(inf_func, xs)
+        d = _limite_vector(sup_func, xs)
+        out = np.zeros(xs.size)
+        for i, xi in enumerate(xs):
+            if d[i] <= c[i]:
+                continue
+            fi = lambda *v, xi=xi: f(xi, *v)
+            resto_i = [
+                (lambda *v, g=g_inf, xi=xi: g(xi, *v), lambda *v, g=g_sup, xi=xi: g(xi, *v))
+                for g_inf, g_sup in resto
+            ]
+            valor, error, convergio = _anidada(fi, c[i], d[i], resto_i, rtol, atol_int, presupuesto)
+            out[i] = valor
+            estado["error_max"] = max(estado["error_max"], error)
+            estado["convergio"] = estado["convergio"] and convergio
+        return out.reshape(forma)
+
+    valor, error, convergio = gauss_kronrod_adaptativo(
+        interna, a, b, rtol, atol, presupuesto, contar=False, al_refinar=al_refinar
+    )
+    error += abs(b - a) * estado["error_max"]
+    return valor, float(error), convergio and estado["convergio"]
+
+
+def integral_adaptativa(f, a, b, limites=(), rtol=RTOL, atol=ATOL, max_eval=MAX_EVAL, al_refinar=None):
+    """
+    Integral simple, doble o triple con control de error.
+    limites: [] para simple, [(y_inf, y_sup)] para doble y
+    [(y_inf, y_sup), (z_inf, z_sup)] para triple.
+    Devuelve un dict con valor, error_estimado, evaluaciones y convergio.
+    """
+    presupuesto = Presupuesto(max_eval)
+    valor, error, convergio = _anidada(f, a, b, list(limites), rtol, atol, presupuesto, al_refinar)
+    return {
+        "valor": valor,
+        "error_estimado": float(error),
+        "evaluaciones": presupuesto.usadas,
+        "convergio": convergio,
+    }
@@ -0,0 +1,199 @@
+import atexit
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app.utils.cache import CacheLRU
+
+log = logging.getLogger(__name__)
+
+# Caché de resultados de /simple, /doble y /triple en dos niveles:
+# memoria (LRU del proceso) y disco (SQLite, sobrevive a reinicios).
+# RESULTADOS_CACHE_DISCO vacío desactiva el nivel de disco. No se guarda
+# dentro de static/ porque ese directorio se sirve públicamente.
+RESULTADOS_CACHE_TAMANO = int(os.environ.get("RESULTADOS_CACHE_TAMANO", 1024))
+RESULTADOS_CACHE_TTL = float(os.environ.get("RESULTADOS_CACHE_TTL", 24 * 3600))
+RESULTADOS_CACHE_DISCO = os.environ.get("RESULTADOS_CACHE_DISCO", "cache/resultados.sqlite")
+
+# Cambiar esta versión invalida todas las entradas guardadas (p. ej. al cambiar el motor).
+# 2: lotes vectorizados de dobles y triples, kernels JIT y tanh-sinh sin convertir NaN en 0
+VERSION_CLAVE = 2
+
+def _canonico(valor):
+    if isinstance(valor, float):
+        return repr(valor)
+    return str(valor)
+
+
+def _resolucion(tipo):
+    # Import local: integrales carga SymPy y este módulo se importa al arrancar
+    from app.calculo.integrales import N_SIMPLE, N_DOBLE, N_TRIPLE
+    return {"simple": N_SIMPLE, "doble": N_DOBLE, "triple": N_TRIPLE}.get(tipo)
+
+
+def clave_integral(tipo: str, expr, limites: dict, opciones: dict) -> str:
+    """
+    Clave canónica de una integral: integrando ya parseado, límites evaluados
+    (números o expresiones canónicas), modo de cálculo y resolución.
+    """
+    spec = {
+        "version": VERSION_CLAVE,
+        "tipo": tipo,
+        "expresion": str(expr),
+        "limites": {k: _canonico(v) for k, v in sorted(limites.items())},
+        "opciones": {k: _canonico(v) for k, v in sorted(opciones.items())},
+        "resolucion": _resolucion(tipo.split("_")[-1]),
+    }
+    texto = json.dumps(spec, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+class CacheResultados:
+    """
+    Las lecturas de disco usan una conexión propia; las escrituras las hace un
+    hilo aparte, que agrupa en un solo commit todo lo que se encoló mientras
+    escribía el lote anterior. Con WAL, una lectura no espera a ese commit.
+    """
+    def __init__(self, max_tamano=RESULTADOS_CACHE_TAMANO, ttl=RESULTADOS_CACHE_TTL, ruta_disco=RESULTADOS_CACHE_DISCO):
+        self.memoria = CacheLRU(max_tamano, ttl)
+        self.ttl = ttl
+        self.ruta_disco = ruta_disco or None
+        self._lock = threading.Lock()
+        self._conexion = None
+        # Escrituras encoladas y el lote que se está escribiendo: clave -> (texto, creado, futuros)
+        self._pendientes = {}
+        self._en_curso = {}
+        self._hay_pendientes = threading.Condition()
+        self._hilo = None
+        self.aciertos_disco = 0
+        self.fallos_disco = 0
+        self.escrituras_disco = 0
+        self.lotes_disco = 0
+
+    def _conectar(self):
+        directorio = os.path.dirname(self.ruta_disco)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        conexion = sqlite3.connect(self.ruta_disco, check_same_thread=False)
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute(
+            "CREATE TABLE IF NOT EXISTS resultados (clave TEXT PRIMARY KEY, valor TEXT, creado REAL)"
+        )
+        conexion.commit()
+        return conexion
+
+    def _db(self):
+        if self._conexion is None:
+            self._conexion = self._conectar()
+        return self._conexion
+
+    def _get_disco(self, clave):
+        with self._hay_pendientes:
+            fila = self._pendientes.get(clave) or self._en_curso.get(clave)
+        with self._lock:
+            if fila is None:
+                fila = self._db().execute(
+                    "SELECT valor, creado FROM resultados WHERE clave = ?", (clave,)
+                ).fetchone()
+            if fila is None or (self.ttl is not None and time.time() - fila[1] > self.ttl):
+                self.fallos_disco += 1
+                return None
+            self.aciertos_disco += 1
+        return json.loads(fila[0])
+
+    def get(self, clave):
+        valor = self.memoria.get(clave)
+        if valor is None and self.ruta_disco:
+            try:
+                valor = self._get_disco(clave)
+            except sqlite3.Error as e:
+                log.warning("Error leyendo la caché de resultados en disco: %s", e)
+                valor = None
+            if valor is not None:
+                self.memoria.set(clave, valor)
+        if valor is None:
+            return None
+        # La gráfica pudo borrarse del disco; en ese caso se recalcula todo
+        grafica = valor.get("grafica")
+        if grafica and not grafica.startswith("http") and not os.path.exists(grafica):
+            return None
+        return dict(valor)
+
+    def set(self, clave, valor: dict):
+        """
+        Guarda valor en memoria y encola su escritura en disco sin esperarla.
+        Devuelve un concurrent.futures.Future que se completa (con True si se
+        escribió) cuando la entrada ya está en disco.
+        """
+        self.memoria.set(clave, dict(valor))
+        escrito = concurrent.futures.Future()
+        if not self.ruta_disco:
+            escrito.set_result(False)
+            return escrito
+        texto = json.dumps(valor)
+        with self._hay_pendientes:
+            anterior = self._pendientes.get(clave)
+            futuros = anterior[2] if anterior else []
+            futuros.append(escrito)
+            self._pendientes[clave] = (texto, time.time(), futuros)
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name="cache-resultados", daemon=True)
+                self._hilo.start()
+                atexit.register(self.vaciar)
+            self._hay_pendientes.notify()
+        return escrito
+
+    def _bucle(self):
+        conexion = None
+        while True:
+            with self._hay_pendientes:
+                while not self._pendientes:
+                    self._hay_pendientes.wait()
+                self._en_curso, self._pendientes = self._pendientes, {}
+                lote = self._en_curso
+            escrito = False
+            try:
+                if conexion is None:
+                    conexion = self._conectar()
+                with conexion:
+                    conexion.executemany(
+                        "INSERT OR REPLACE INTO resultados (clave, valor, creado) VALUES (?, ?, ?)",
+                        [(clave, texto, creado) for clave, (texto, creado, _) in lote.items()],
+                    )
+                escrito = True
+                with self._lock:
+                    self.escrituras_disco += len(lote)
+                    self.lotes_disco += 1
+            except sqlite3.Error as e:
+                log.warning("Error escribiendo la caché de resultados en disco: %s", e)
+            with self._hay_pendientes:
+                self._en_curso = {}
+            for _, _, futuros in lote.values():
+                for futuro in futuros:
+                    futuro.set_result(escrito)
+
+    def vaciar(self, timeout=5):
+        """Espera (como mucho timeout segundos) a que lo encolado llegue a disco."""
+        with self._hay_pendientes:
+            entradas = list(self._pendientes.values()) + list(self._en_curso.values())
+        concurrent.futures.wait([f for _, _, futuros in entradas for f in futuros], timeout)
+
+    def estadisticas(self):
+        return {
+            "memoria": self.memoria.estadisticas(),
+            "disco": {
+                "ruta": self.ruta_disco,
+                "aciertos": self.aciertos_disco,
+                "fallos": self.fallos_disco,
+                "escrituras": self.escrituras_disco,
+                "lotes": self.lotes_disco,
+            },
+        }
+
+
+cache_resultados = CacheResultados()
@@ -0,0 +1,461 @@
+import os
+
+import numpy as np
+
+from app.calculo.adaptativa import integral_adaptativa, RTOL, ATOL, MAX_EVAL
+from app.calculo.qmc import integral_qmc, estimaciones_qmc, QMC_MAX_MUESTRAS
+from app.calculo.reglas import regla_simpson, regla_gauss_legendre, regla_tanh_sinh
+from app.calculo.integrales import (
+    cuadratura_lote, cuadratura_doble, cuadratura_triple, simpson_simple, valores_region, _evalua_malla,
+    _filas_doble, _filas_triple, IntegralDivergente, N_SIMPLE, N_DOBLE, N_TRIPLE
+)
+
+# Registro de métodos de cuadratura. Cada método recibe
+#   (f, a, b, limites, rtol, atol, max_eval, semilla)
+# con limites = [] (simple), [(y_inf, y_sup)] (doble) o [(y_inf, y_sup), (z_inf, z_sup)] (triple),
+# igual que integral_adaptativa, y devuelve un dict con al menos "valor".
+METODOS = {}
+
+# Orden de Gauss–Legendre por dimensión (el error se estima contra la mitad de nodos)
+ORDEN_GAUSS_LEGENDRE = {1: 64, 2: 32, 3: 16}
+# Nivel de tanh-sinh por dimensión (paso 2**-nivel; se compara con el nivel anterior)
+NIVEL_TANH_SINH = {1: 6, 2: 4, 3: 2}
+RESOLUCION_SIMPSON = {1: N_SIMPLE, 2: N_DOBLE, 3: N_TRIPLE}
+MONTE_CARLO_MUESTRAS = int(os.environ.get("MONTE_CARLO_MUESTRAS", 200000))
+# Divisores de la resolución de cada nivel en modo progresivo (el último nivel es la resolución normal)
+DIVISORES_NIVELES = (8, 4, 2, 1)
+# Tanh-sinh: distancia (relativa al ancho del tramo) a un punto singular dentro
+# de la cual un valor ±inf se toma como desbordamiento y el nodo no aporta
+CERCA_SINGULAR = 1e-10
+# Tanh-sinh: la integral diverge si los términos de los nodos más extremos no
+# bajan de esta fracción del valor. Corte práctico: x**-p en [0, 1] se integra
+# hasta p ≈ 0.99 (sin alcanzar la tolerancia: la masa por debajo del nodo más
+# pequeño representable ya es del orden de 1e-3) y desde p ≈ 0.999 se declara
+# divergente, como 1/x
+COLA_RELATIVA = 1e-3
+_MENSAJE_NO_FINITOS = "La función tiene valores infinitos o indefinidos en el intervalo."
+
+
+def metodo(nombre):
+    def registrar(fn):
+        METODOS[nombre] = fn
+        return fn
+    return registrar
+
+
+def _tolerancia(valor, rtol, atol):
+    return max(atol, rtol * abs(valor))
+
+
+def _producto(f, a, b, limites, reglas):
+    """
+    Regla producto con una regla (t, w) por dimensión y límites interiores variables.
+    Devuelve (valor, evaluaciones).
+    """
+    evaluaciones = int(np.prod([r[0].size for r in reglas]))
+    if not limites:
+        return float(cuadratura_lote(f, a, b, reglas[0])[0]), evaluaciones
+    if len(limites) == 1:
+        (y_inf, y_sup), = limites
+        return float(cuadratura_doble(f, a, b, y_inf, y_sup, reglas[0], reglas[1])), evaluaciones
+    (y_inf, y_sup), (z_inf, z_sup) = limites
+    return float(cuadratura_triple(f, a, b, y_inf, y_sup, z_inf, z_sup, *reglas)), evaluaciones
+
+
+@metodo("simpson")
+def _simpson(f, a, b, limites, rtol=RTOL, atol=ATOL, max_eval=MAX_EVAL, semilla=0):
+    dim = len(limites) + 1
+    n = RESOLUCION_SIMPSON[dim]
+    if dim == 1:
+        # Misma ruta que siempre: lanza ValueError si hay valores no finitos
+        return {"valor": simpson_simple(f, a, b, n=n), "evaluaciones": n + 1}
+    valor, evaluaciones = _producto(f, a, b, limites, [regla_simpson(n)] * dim)
+    return {"valor": valor, "evaluaciones": evaluaciones}
+
+
+@metodo("gauss_legendre")
+def _gauss_legendre(f, a, b, limites, rtol=RTOL, atol=ATOL, max_eval=MAX_EVAL, semilla=0):
+    """
+    Gauss–Legendre de orden fijo; el error se estima con la regla de la mitad de nodos.
+    """
+    dim = len(limites) + 1
+    n = ORDEN_GAUSS_LEGENDRE[dim]
+    valor, evaluaciones = _producto(f, a, b, limites, [regla_gauss_legendre(n)] * dim)
+    grueso, evaluaciones_grueso = _producto(f, a, b, limites, [regla_gauss_legendre(n // 2)] * dim)
+    error = abs(valor - grueso)
+    return {
+        "valor": valor,
+        "error_estimado": error,
+        "evaluaciones": evaluaciones + evaluaciones_grueso,
+        "convergio": bool(error <= _tolerancia(valor, rtol, atol)),
+    }
+
+
+def _sin_desbordes(f):
+    # Regla producto de tanh-sinh: un ±inf es un nodo redondeado a un extremo
+    # singular o un desbordamiento junto a él y no aporta; nan es un punto fuera
+    # del dominio del integrando y se propaga a la suma
+    def g(*v):
+        with np.errstate(all="ignore"):
+            vals = np.asarray(f(*v), dtype=float)
+        return np.where(np.isinf(vals), 0.0, vals)
+    return g
+
+
+def _terminos_tanh_sinh(f, a, b, nivel, singulares=()):
+    """
+    Términos (b - a) w_i f(x_i) de la regla 1D y máscara de los nodos útiles.
+    No aportan los nodos que caen sobre a o b por redondeo ni los que valen
+    ±inf a menos de CERCA_SINGULAR de un punto de `singulares`; cualquier otro
+    valor no finito lanza ValueError, como Simpson.
+    """
+    t, w = regla_tanh_sinh(nivel)
+    # Cerca de b se mide la distancia desde b (1 - t = t[::-1]) para no perder precisión
+    x = np.where(t < 0.5, a + (b - a) * t, b - (b - a) * t[::-1])
+    valores = _evalua_malla(f, x)
+    interiores = (x != a) & (x != b)
+    desbordes = np.zeros(x.shape, dtype=bool)
+    for p in singulares:
+        desbordes |= np.isinf(valores) & (np.abs(x - p) <= CERCA_SINGULAR * abs(b - a))
+    if np.any(interiores & ~np.isfinite(valores) & ~desbordes):
+        raise ValueError(_MENSAJE_NO_FINITOS)
+    utiles = interiores & np.isfinite(valores)
+    return (b - a) * w * np.where(utiles, valores, 0.0), utiles
+
+
+def _cola(terminos, utiles, k=4):
+    # Mayor término entre los k nodos útiles más extremos de cada lado: en una
+    # singularidad integrable son ínfimos; si la integral diverge no decaen
+    indices = np.flatnonzero(utiles)
+    if indices.size == 0:
+        return 0.0
+    return float(np.abs(terminos[np.concatenate([indices[:k], indices[-k:]])]).max())
+
+
+@metodo("tanh_sinh")
+def _tanh_sinh(f, a, b, limites, rtol=RTOL, atol=ATOL, max_eval=MAX_EVAL, semilla=0, singulares=()):
+    """
+    Tanh-sinh para singularidades integrables en los extremos. El error se estima
+    con el nivel anterior; en 1D se declara además divergente la integral si
+    los términos de los nodos más extremos no son despreciables frente al
+    valor (p. ej. 1/x en [0, 1]; ver COLA_RELATIVA). singulares son los
+    extremos detectados como singulares (ver _terminos_tanh_sinh).
+    """
+    dim = len(limites) + 1
+    nivel = NIVEL_TANH_SINH[dim]
+    if dim == 1:
+        terminos, utiles = _terminos_tanh_sinh(f, a, b, nivel, singulares)
+        gruesos, _ = _terminos_tanh_sinh(f, a, b, nivel - 1, singulares)
+        valor, grueso = float(terminos.sum()), float(gruesos.sum())
+        evaluaciones = terminos.size + gruesos.size
+        divergente = _cola(terminos, utiles) > max(_tolerancia(valor, rtol, atol), COLA_RELATIVA * abs(valor))
+    else:
+        g = _sin_desbordes(f)
+        valor, evaluaciones = _producto(g, a, b, limites, [regla_tanh_sinh(nivel)] * dim)
+        grueso, evaluaciones_grueso = _producto(g, a, b, limites, [regla_tanh_sinh(nivel - 1)] * dim)
+        evaluaciones += evaluaciones_grueso
+        if np.isnan(valor) or np.isnan(grueso):
+            raise ValueError(_MENSAJE_NO_FINITOS)
+        divergente = False
+    error = abs(valor - grueso)
+    return {
+        "valor": valor,
+        "error_estimado": error,
+        "evaluaciones": evaluaciones,
+        "convergio": bool(error <= _tolerancia(valor, rtol, atol) and not divergente),
+        "divergente": divergente,
+    }
+
+
+def _tanh_sinh_exterior(f, a, b, limites, rtol=RTOL, atol=ATOL, max_eval=MAX_EVAL, semilla=0, singulares=()):
+    """
+    Tanh-sinh 1D en la variable exterior, con su control de divergencia, y
+    Gauss–Legendre en las interiores: para dobles y triples cuyas
+    singularidades dependen solo de x.
+    """
+    n = ORDEN_GAUSS_LEGENDRE[len(limites) + 1]
+    reglas = [regla_gauss_legendre(n)] * len(limites)
+
+    def interior(xi):
+        xi = np.ravel(xi)
+        if len(limites) == 1:
+            return _filas_doble(f, xi, [], *limites[0], *reglas)
+        return _filas_triple(f, xi, [], *limites[0], *limites[1], *reglas)
+
+    res = _tanh_sinh(interior, a, b, [], rtol, atol, max_eval, semilla, singulares)
+    return {**res, "evaluaciones": res["evaluaciones"] * int(np.prod([r[0].size for r in reglas]))}
+
+
+@metodo("gauss_kronrod")
+def _gauss_kronrod(f, a, b, limites, rtol=RTOL, atol=ATOL, max_eval=MAX_EVAL, semilla=0):
+    return integral_adaptativa(f, a, b, limites, rtol, atol, max_eval)
+
+
+@metodo("monte_carlo")
+def _monte_carlo(f, a, b, limites, rtol=RTOL, atol=ATOL, max_eval=MAX_EVAL, semilla=0):
+    """
+    Monte Carlo con muestras uniformes en el dominio (límites interiores variables
+    incluidos a través del jacobiano). El error estimado es el error estándar.
+    Útil como referencia para integrandos irregulares; converge como 1/sqrt(n).
+    """
+    n = min(MONTE_CARLO_MUESTRAS, max_eval)
+    u = np.random.default_rng(semilla).random((len(limites) + 1, n))
+    muestras = valores_region(f, a, b, limites, u)
+    valor = float(muestras.mean())
+    error = float(muestras.std(ddof=1) / np.sqrt(n))
+    return {
+        "valor": valor,
+        "error_estimado": error,
+        "evaluaciones": n,
+        "convergio": bool(error <= _tolerancia(valor, rtol, atol)),
+    }
+
+
+@metodo("qmc")
+def _qmc(f, a, b, limites, rtol=RTOL, atol=ATOL, max_eval=MAX_EVAL, semilla=0):
+    """
+    Cuasi-Monte Carlo (Sobol aleatorizado) hasta la tolerancia o max_eval muestras.
+    """
+    return integral_qmc(f, a, b, limites, rtol, atol, max_eval, semilla)
+
+
+def _automatico(f, a, b, limites, rtol=RTOL, atol=ATOL, max_eval=MAX_EVAL, semilla=0):
+    """
+    Gauss–Legendre si converge (integrandos suaves: decenas de nodos por
+    dimensión); si no, Simpson con la resolución de siempre, salvo en triples,
+    donde QMC da mejor precisión con un número de evaluaciones parecido; y si
+    encuentra valores no finitos (singularidad en un extremo), tanh-sinh.
+    """
+    try:
+        res = _gauss_legendre(f, a, b, limites, rtol, atol, max_eval, semilla)
+        if np.isfinite(res["valor"]) and res["convergio"]:
+            return {**res, "metodo": "gauss_legendre"}
+    except Exception:
+        pass
+    error_simpson = None
+    try:
+        if len(limites) == 2:
+            res = {**_qmc(f, a, b, limites, rtol, atol, QMC_MAX_MUESTRAS, semilla), "metodo": "qmc"}
+        else:
+            res = {**_simpson(f, a, b, limites, rtol, atol, max_eval, semilla), "metodo": "simpson"}
+        if np.isfinite(res["valor"]):
+            return res
+    except ValueError as e:
+        error_simpson = e
+    try:
+        res_ts = _tanh_sinh(f, a, b, limites, rtol, atol, max_eval, semilla)
+        if np.isfinite(res_ts["valor"]) and res_ts["convergio"]:
+            return {**res_ts, "metodo": "tanh_sinh"}
+    except ValueError:
+        pass
+    if error_simpson is not None:
+        raise error_simpson
+    return res
+
+
+def integrar(nombre, f, a, b, limites, rtol=RTOL, atol=ATOL, max_eval=MAX_EVAL, semilla=0):
+    """
+    Integra con el método registrado `nombre` o con la elección automática ("auto").
+    Devuelve el dict del método con la clave "metodo" indicando el usado.
+    """
+    if nombre == "auto":
+        return _automatico(f, a, b, list(limites), rtol, atol, max_eval, semilla)
+    if nombre not in METODOS:
+        raise KeyError(nombre)
+    return {**METODOS[nombre](f, a, b, list(limites), rtol, atol, max_eval, semilla), "metodo": nombre}
+
+
+def integrar_tramos(nombre, f, a, b, limites, puntos, rtol=RTOL, atol=ATOL, max_eval=MAX_EVAL, semilla=0):
+    """
+    Integra por tramos separados por los puntos singulares de la variable
+    exterior (ver singularidades.puntos_singulares; pueden incluir a y b).
+    Con "auto", los tramos que tocan un punto singular usan tanh-sinh, que no
+    evalúa los extremos; si ahí la integral diverge se lanza IntegralDivergente
+    sin seguir gastando evaluaciones. Devuelve la suma de los tramos con el
+    error estimado y las evaluaciones acumulados.
+    """
+    if a > b:
+        res = integrar_tramos(nombre, f, b, a, limites, puntos, rtol, atol, max_eval, semilla)
+        return {**res, "valor": -res["valor"]}
+    cortes = [a] + [p for p in puntos if a < p < b] + [b]
+    singulares = set(puntos)
+    n_tramos = len(cortes) - 1
+    total = {"valor": 0.0, "error_estimado": 0.0, "evaluaciones": 0, "convergio": True}
+    usados = []
+    for u, v in zip(cortes[:-1], cortes[1:]):
+        if nombre == "auto" and (u in singulares or v in singulares):
+            res = {**(_tanh_sinh_exterior if limites else _tanh_sinh)(
+                f, u, v, list(limites), rtol, atol / n_tramos, max_eval // n_tramos, semilla,
+                [p for p in (u, v) if p in singulares]
+            ), "metodo": "tanh_sinh"}
+        else:
+            res = integrar(nombre, f, u, v, limites, rtol, atol / n_tramos, max_eval // n_tramos, semilla)
+        if res.get("divergente") and nombre == "auto":
+            punto = u if u in singulares else v
+            raise IntegralDivergente(f"La integral diverge cerca de x = {punto:.6g}.")
+        total["valor"] += res["valor"]
+        total["error_estimado"] += res.get("error_estimado") or 0.0
+        total["evaluaciones"] += res.get("evaluaciones", 0)
+        total["convergio"] = total["convergio"] and res.get("convergio", True)
+        usados.append(res["metodo"])
+    total["metodo"] = "+".join(dict.fromkeys(usados))
+    if n_tramos > 1:
+        total["puntos_singulares"] = [float(p) for p in cortes[1:-1]]
+    return total
+
+
+def _niveles(f, a, b, limites, reglas, factor, rtol, atol, progreso):
+    """
+    Regla producto con resolución creciente (una regla por nivel). Notifica
+    cada nivel a progreso; el error es la diferencia con el nivel anterior
+    dividida por factor (15 en Simpson: extrapolación de Richardson).
+    Se detiene en cuanto un nivel alcanza la tolerancia.
+    """
+    dim = len(limites) + 1
+    anterior = None
+    evaluaciones = 0
+    for regla in reglas:
+        valor, n = _producto(f, a, b, limites, [regla] * dim)
+        evaluaciones += n
+        error = abs(valor - anterior) / factor if anterior is not None else None
+        convergio = error is not None and error <= _tolerancia(valor, rtol, atol)
+        res = {"valor": valor, "error_estimado": error, "evaluaciones": evaluaciones, "convergio": bool(convergio)}
+        progreso(res)
+        if convergio or not np.isfinite(valor):
+            break
+        anterior = valor
+    return res
+
+
+def _niveles_simpson(f, a, b, limites, rtol, atol, progreso):
+    n = RESOLUCION_SIMPSON[len(limites) + 1]
+    reglas = [regla_simpson(max(n // d, 2)) for d in DIVISORES_NIVELES]
+    return _niveles(f, a, b, limites, reglas, 15.0, rtol, atol, progreso)
+
+
+def _niveles_gauss_legendre(f, a, b, limites, rtol, atol, progreso):
+    n = ORDEN_GAUSS_LEGENDRE[len(limites) + 1]
+    reglas = [regla_gauss_legendre(max(n // d, 1)) for d in DIVISORES_NIVELES]
+    return _niveles(f, a, b, limites, reglas, 1.0, rtol, atol, progreso)
+
+
+def _niveles_qmc(f, a, b, limites, rtol, atol, max_muestras, semilla, progreso):
+    res = None
+    for res in estimaciones_qmc(f, a, b, limites, rtol, atol, max_muestras, semilla):
+        progreso(res)
+    return res
+
+
+def integrar_progresivo(nombre, f, a, b, limites, progreso, rtol=RTOL, atol=ATOL, max_eval=MAX_EVAL, semilla=0):
+    """
+    Como integrar, pero notifica a progreso(estimacion) cada refinamiento:
+    niveles de resolución en Simpson y Gauss–Legendre, bloques en QMC y
+    rondas de subdivisión en Gauss–Kronrod. Cada estimación lleva valor,
+    error_estimado, evaluaciones, convergio y metodo. progreso puede lanzar
+    una excepción para cancelar el cálculo entre refinamientos.
+    """
+    limites = list(limites)
+
+    def con_metodo(usado):
+        return lambda estimacion: progreso({**estimacion, "metodo": usado})
+
+    if nombre == "auto":
+        res = _niveles_gauss_legendre(f, a, b, limites, rtol, atol, con_metodo("gauss_legendre"))
+        if np.isfinite(res["valor"]) and res["convergio"]:
+            return {**res, "metodo": "gauss_legendre"}
+        if len(limites) == 2:
+            res = {**_niveles_qmc(f, a, b, limites, rtol, atol, QMC_MAX_MUESTRAS, semilla, con_metodo("qmc")),
+                   "metodo": "qmc"}
+        else:
+            res = {**_niveles_simpson(f, a, b, limites, rtol, atol, con_metodo("simpson")), "metodo": "simpson"}
+        if np.isfinite(res["valor"]):
+            return res
+        try:
+            res_ts = {**_tanh_sinh(f, a, b, limites, rtol, atol, max_eval, semilla), "metodo": "tanh_sinh"}
+        except ValueError:
+            return res
+        progreso(res_ts)
+        return res_ts if np.isfinite(res_ts["valor"]) and res_ts["convergio"] else res
+
+    if nombre not in METODOS:
+        raise KeyError(nombre)
+    if nombre == "simpson":
+        res = _niveles_simpson(f, a, b, limites, rtol, atol, con_metodo(nombre))
+    elif nombre == "gauss_legendre":
+        res = _niveles_gauss_legendre(f, a, b, limites, rtol, atol, con_metodo(nombre))
+    elif nombre == "qmc":
+        res = _niveles_qmc(f, a, b, limites, rtol, atol, max_eval, semilla, con_metodo(nombre))
+    elif nombre == "gauss_kronrod":
+        res = integral_adaptativa(f, a, b, limites, rtol, atol, max_eval, al_refinar=con_metodo(nombre))
+    else:
+        res = METODOS[nombre](f, a, b, limites, rtol, atol, max_eval, semilla)
+        con_metodo(nombre)(res)
+    return {**res, "metodo": nombre}
+
+
+def integrar_simple_lote(nombre, f, a, b, rtol=RTOL, atol=ATOL):
+    """
+    Integrales simples del mismo integrando sobre varios intervalos en una sola
+    pasada vectorizada, para "simpson" o "auto". Con "auto" se aceptan los
+    intervalos donde Gauss–Legendre converge y solo el resto pasa a Simpson.
+    Devuelve (valores, metodos); los valores no finitos quedan como nan.
+    """
+    a, b = np.broadcast_arrays(np.atleast_1d(np.asarray(a, dtype=float)), np.atleast_1d(np.asarray(b, dtype=float)))
+    valores = np.full(a.shape, np.nan)
+    metodos = np.full(a.shape, "simpson", dtype=object)
+    pendientes = np.ones(a.shape, dtype=bool)
+    if nombre == "auto":
+        n = ORDEN_GAUSS_LEGENDRE[1]
+        fino = cuadratura_lote(f, a, b, regla_gauss_legendre(n))
+        grueso = cuadratura_lote(f, a, b, regla_gauss_legendre(n // 2))
+        with np.errstate(invalid="ignore"):
+            ok = np.isfinite(fino) & (np.abs(fino - grueso) <= np.maximum(atol, rtol * np.abs(fino)))
+        valores[ok] = fino[ok]
+        metodos[ok] = "gauss_legendre"
+        pendientes = ~ok
+    if pendientes.any():
+        valores[pendientes] = cuadratura_lote(f, a[pendientes], b[pendientes], regla_simpson(N_SIMPLE))
+    return valores, metodos
+
+
+def _producto_lote(f, a, b, limites, reglas):
+    # Regla producto de _producto para varios intervalos [a_i, b_i] en x con los mismos límites interiores
+    if len(limites) == 1:
+        (y_inf, y_sup), = limites
+        return cuadratura_doble(f, a, b, y_inf, y_sup, reglas[0], reglas[1])
+    (y_inf, y_sup), (z_inf, z_sup) = limites
+    return cuadratura_triple(f, a, b, y_inf, y_sup, z_inf, z_sup, *reglas)
+
+
+def integrar_multiple_lote(nombre, f, a, b, limites, rtol=RTOL, atol=ATOL):
+    """
+    Versión doble y triple de integrar_simple_lote: integrales del mismo
+    integrando y los mismos límites interiores que solo cambian en [a_i, b_i],
+    todas sobre una sola malla. Con "auto" se aceptan las que convergen con
+    Gauss–Legendre y, en dobles, el resto pasa a Simpson, como en
+    _automatico; en triples ese paso es QMC, que no se vectoriza.
+    Devuelve (valores, metodos); metodo None marca las integrales que quedan
+    sin resolver (valores no finitos o triples que no convergen) y que el
+    llamador debe calcular una a una.
+    """
+    a, b = np.broadcast_arrays(np.atleast_1d(np.asarray(a, dtype=float)), np.atleast_1d(np.asarray(b, dtype=float)))
+    dim = len(limites) + 1
+    valores = np.full(a.shape, np.nan)
+    metodos = np.full(a.shape, None, dtype=object)
+    pendientes = np.ones(a.shape, dtype=bool)
+    if nombre == "auto":
+        n = ORDEN_GAUSS_LEGENDRE[dim]
+        with np.errstate(all="ignore"):
+            fino = _producto_lote(f, a, b, limites, [regla_gauss_legendre(n)] * dim)
+            grueso = _producto_lote(f, a, b, limites, [regla_gauss_legendre(n // 2)] * dim)
+            ok = np.isfinite(fino) & (np.abs(fino - grueso) <= np.maximum(atol, rtol * np.abs(fino)))
+        valores[ok] = fino[ok]
+        metodos[ok] = "gauss_legendre"
+        pendientes = ~ok
+    if pendientes.any() and (nombre == "simpson" or dim == 2):
+        simpson = _producto_lote(f, a[pendientes], b[pendientes], limites, [regla_simpson(RESOLUCION_SIMPSON[dim])] * dim)
+        finitos = np.isfinite(simpson)
+        indices = np.flatnonzero(pendientes)[finitos]
+        valores[indices] = simpson[finitos]
+        metodos[indices] = "simpson"
+    return valores, metodos
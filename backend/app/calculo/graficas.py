@@ -1,26 +1,28 @@
+import base64
+import io
+import logging
 import os
 import numpy as np
-import sympy
 import sympy as sp
-from sympy.parsing.sympy_parser import parse_expr
-import traceback
-
-# Diccionario extendido para funciones matemáticas
-sympy_func_dict = {
-    "sin": sympy.sin, "cos": sympy.cos, "tan": sympy.tan,
-    "log": sympy.log, "exp": sympy.exp, "sqrt": sympy.sqrt,
-    "sec": sympy.sec, "csc": sympy.csc, "cot": sympy.cot,
-    "asin": sympy.asin, "acos": sympy.acos, "atan": sympy.atan,
-    "pi": sympy.pi, "e": sympy.E,
-}
 
-def parse_limit_string(val):
-    # Convierte un string como "pi", "2*pi", "e", "3.5", etc. a float usando sympy
-    try:
-        expr = sympy.sympify(val, locals=sympy_func_dict)
-        return float(expr.evalf())
-    except Exception:
-        raise ValueError(f"Límite inválido: {val}")
+from app.utils.math_parser import obtener_expresion, compilar_numerica, compilar_limite
+from app.calculo.integrales import parse_limit_string
+from app.calculo.reglas import regla_gauss_legendre
+from app.calculo.render import renderizador
+from app.utils.almacen_graficas import ruta_grafica, grafica_existente, guardar_atomico
+from app.utils.metricas import etapa
+
+log = logging.getLogger(__name__)
+
+# Puntos por eje de las mallas: PNG y datos que dibuja el cliente (modo_grafica="datos")
+PUNTOS_GRAFICA = {"simple": 500, "doble": 40, "triple": 15}
+PUNTOS_DATOS = {
+    "simple": int(os.environ.get("GRAFICA_DATOS_PUNTOS_SIMPLE", 400)),
+    "doble": int(os.environ.get("GRAFICA_DATOS_PUNTOS_DOBLE", 48)),
+    "triple": int(os.environ.get("GRAFICA_DATOS_PUNTOS_TRIPLE", 32)),
+}
+# Nodos de Gauss–Legendre de la integral en z que se dibuja en las triples
+NODOS_Z_GRAFICA = int(os.environ.get("GRAFICA_NODOS_Z", 16))
 
 def _asegura_escalar(expr):
     if hasattr(expr, 'is_Matrix') and expr.is_Matrix:
@@ -43,167 +45,195 @@ def _valida_arreglo_json(vals):
     return np.all(np.isfinite(arr))
 
 def _parse_limit_func(expr, vars_):
-    # Devuelve una función de las variables vars_ a partir de una expresión string o numérica
-    if isinstance(expr, (float, int)):
-        return lambda *args: float(expr)
-    elif isinstance(expr, str):
-        try:
-            return sp.lambdify(vars_, parse_expr(expr, local_dict=sympy_func_dict), modules="numpy")
-        except Exception:
-            # Si no es función, intenta forzar a float interpretando como expresión sympy
-            try:
-                return lambda *args: float(sympy.sympify(expr, locals=sympy_func_dict).evalf())
-            except Exception:
-                raise
+    # Devuelve una función de las variables vars_ a partir de una expresión string o numérica.
+    # Usa la misma caché que el cálculo, así que un límite ya integrado no se vuelve a compilar.
+    if isinstance(expr, (float, int, str)):
+        return compilar_limite(expr, vars_)
     elif callable(expr):
         return expr
     else:
         raise ValueError("No se pudo convertir el límite a función.")
 
-def generar_grafica(tipo: str, expresion: str, limites: dict, modo_interactivo: bool = True):
+def _en_malla(f, *mallas):
+    # Una sola evaluación vectorizada sobre la malla; NaN donde no está definida
+    forma = np.broadcast_shapes(*(np.shape(m) for m in mallas))
+    try:
+        with np.errstate(all="ignore"):
+            vals = np.asarray(f(*(np.broadcast_to(m, forma) for m in mallas)), dtype=float)
+        vals = np.array(np.broadcast_to(vals, forma))
+    except Exception as e:
+        log.info("Error al evaluar la función sobre la malla: %s", e)
+        return np.full(forma, np.nan)
+    vals[~np.isfinite(vals)] = np.nan
+    return vals
+
+
+def _malla_y(X, y_inf_func, y_sup_func, ny):
+    # Malla (ny, nx) con ny puntos entre los límites en y de cada columna; NaN donde y_sup <= y_inf
+    Y_MIN = np.broadcast_to(y_inf_func(X), X.shape)
+    Y_MAX = np.broadcast_to(y_sup_func(X), X.shape)
+    Y = Y_MIN + (Y_MAX - Y_MIN) * np.linspace(0.0, 1.0, ny)[:, None]
+    Y[:, ~(Y_MAX > Y_MIN)] = np.nan
+    return Y
+
+
+def datos_grafica(tipo: str, expresion: str, limites: dict, puntos: int = None):
     """
-    Siempre genera PNG (matplotlib) con estilo profesional.
+    Datos numéricos de la gráfica, sin renderizar: (X, Y) para la simple,
+    (X, Y, Z) para la doble y (X, Y, S) para la triple, donde S(x, y) es la
+    integral en z calculada con Gauss–Legendre. X es 1D (nx); Y, Z y S son
+    mallas (ny, nx) con NaN donde la función o la región no están definidas.
+    `puntos` es la resolución por eje (por defecto, la de PUNTOS_GRAFICA).
+    Lanza ValueError si no hay nada que graficar.
     """
-    print("DEBUG: Entrando a generar_grafica")
-    print(f"Tipo: {tipo}, Expresión: {expresion}, Límites: {limites}")
-
-    os.makedirs("static/graficas", exist_ok=True)
-    ruta = f"static/graficas/integral_{tipo}_{hash(str(expresion)+str(limites))}.png"
     x, y, z = sp.symbols('x y z')
+    n = puntos or PUNTOS_GRAFICA[tipo]
+    if tipo == "simple":
+        f = compilar_numerica(expresion, (x,))
+        X = np.linspace(parse_limit_string(limites["a"]), parse_limit_string(limites["b"]), n)
+        Y = _en_malla(f, X)
+        if not _valida_arreglo_json(Y):
+            raise ValueError("La función tiene valores infinitos o indefinidos en el rango seleccionado. Cambia el intervalo.")
+        return X, Y
+
+    X = np.linspace(parse_limit_string(limites["a"]), parse_limit_string(limites["b"]), n)
+    Y = _malla_y(X, _parse_limit_func(limites["c"], [x]), _parse_limit_func(limites["d"], [x]), n)
+    if tipo == "doble":
+        Z = _en_malla(compilar_numerica(expresion, (x, y)), X, Y)
+        # Solo aborta si TODOS los valores son NaN o infinitos, no si hay algunos NaN
+        if not np.any(np.isfinite(Z)):
+            raise ValueError("No hay datos válidos para graficar (todos los valores son NaN o infinitos). Cambia el intervalo.")
+        return X, Y, Z
+
+    if tipo == "triple":
+        fxyz = compilar_numerica(expresion, (x, y, z))
+        XX = np.broadcast_to(X, Y.shape)
+        Z_MIN = np.broadcast_to(_parse_limit_func(limites["e"], [x, y])(XX, Y), Y.shape)
+        Z_MAX = np.broadcast_to(_parse_limit_func(limites["f"], [x, y])(XX, Y), Y.shape)
+        # Nodos en z de cada celda (nz, ny, nx) y suma ponderada: ∫ f dz ≈ (z_max - z_min) Σ w f
+        t, w = regla_gauss_legendre(NODOS_Z_GRAFICA)
+        ZZ = Z_MIN + (Z_MAX - Z_MIN) * t[:, None, None]
+        S = (Z_MAX - Z_MIN) * np.tensordot(w, _en_malla(fxyz, XX, Y, ZZ), axes=1)
+        S[~(Z_MAX > Z_MIN)] = np.nan
+        if not np.any(np.isfinite(S)):
+            raise ValueError("No hay datos válidos para graficar (todos los valores son NaN o infinitos). Cambia los límites o la función.")
+        return X, Y, S
+
+    raise ValueError(f"Tipo de integral no soportado para graficar: {tipo}")
+
+
+def _empaqueta(arr):
+    return base64.b64encode(np.ascontiguousarray(arr, dtype="<f4").tobytes()).decode("ascii")
+
+
+def datos_grafica_compactos(tipo: str, expresion: str, limites: dict):
+    """
+    Datos de la gráfica para que el cliente la dibuje, sin matplotlib: cada
+    arreglo va como float32 little-endian en base64 ("forma" da sus dimensiones;
+    "x" siempre es 1D) y "rango" es el mínimo y el máximo de los valores
+    finitos de la última serie. Devuelve None si no se puede graficar.
+    """
+    try:
+        with etapa("malla", tipo=tipo):
+            series = datos_grafica(tipo, expresion, limites, PUNTOS_DATOS[tipo])
+    except Exception as e:
+        log.info("No se pudieron calcular los datos de la gráfica: %s", e)
+        return None
+    ultima = series[-1]
+    return {
+        "tipo": tipo,
+        "formato": "float32-base64",
+        "forma": list(ultima.shape),
+        **{nombre: _empaqueta(arr) for nombre, arr in zip(("x", "y", "z"), series)},
+        "rango": [float(np.nanmin(ultima)), float(np.nanmax(ultima))],
+    }
+
+
+def _titulo(tipo, expr):
+    latex = sp.latex(expr)
+    if tipo == "simple":
+        return r'Visualización de $f(x) = %s$' % latex
+    if tipo == "doble":
+        return r'Visualización del volumen bajo $f(x, y) = %s$' % latex
+    return r'Visualización del volumen bajo $\int f(x, y, z)\,dz$ de $%s$' % latex
+
+
+def _escribe(destino, contenido):
+    with open(destino, "wb") as archivo:
+        archivo.write(contenido)
+
+
+def _guarda_medida(ruta, tipo, series, titulo, etiquetas=None):
+    # Renderiza en memoria con la plantilla del proceso y luego escribe el
+    # archivo, para medir por separado las etapas render y escritura.
+    # Devuelve la métrica de la gráfica
+    buffer = io.BytesIO()
+    with etapa("render", tipo=tipo):
+        metrica = renderizador().dibujar(tipo, series, titulo, buffer, etiquetas)
+    with etapa("escritura"):
+        guardar_atomico(lambda destino: _escribe(destino, buffer.getvalue()), ruta)
+    return metrica
+
+
+def generar_grafica_medida(tipo: str, expresion: str, limites: dict):
+    """
+    Como generar_grafica, pero devuelve (ruta, métrica). La métrica (tipo,
+    preset, formato, segundos y bytes) es None si la gráfica ya estaba en
+    disco o no se pudo generar; el proceso principal la registra en metricas_render.
+    """
+    log.debug("Gráfica %s de %s con límites %s", tipo, expresion, limites)
+    os.makedirs("static/graficas", exist_ok=True)
+    render = renderizador()
+    ruta = ruta_grafica(tipo, expresion, limites, render.ajustes, render.extension)
+    if grafica_existente(ruta):
+        return ruta, None
 
     try:
-        if tipo == "simple":
-            expr = sp.sympify(expresion, locals=sympy_func_dict)
-            expr = _asegura_escalar(expr)
-            f = sp.lambdify(x, expr, modules="numpy")
-            x_vals = np.linspace(parse_limit_string(limites["a"]), parse_limit_string(limites["b"]), 500)
-            y_vals = f(x_vals)
-            if not _valida_arreglo_json(y_vals):
-                raise ValueError("La función tiene valores infinitos o indefinidos en el rango seleccionado. Cambia el intervalo.")
-
-            import matplotlib
-            matplotlib.use('Agg')
-            import matplotlib.pyplot as plt
-            fig, ax = plt.subplots(figsize=(10, 6))
-            ax.plot(x_vals, y_vals, 'b-', linewidth=2)
-            ax.fill_between(x_vals, y_vals, alpha=0.3)
-            ax.set_title(r'Visualización de $f(x) = %s$' % sp.latex(expr), fontsize=18, pad=20)
-            ax.set_xlabel('x', fontsize=14, labelpad=10)
-            ax.set_ylabel('f(x)', fontsize=14, labelpad=10)
-            ax.grid(True)
-            plt.tight_layout()
-            plt.savefig(ruta, dpi=200, bbox_inches='tight')
-            plt.close(fig)
-            return ruta
-
-        elif tipo == "doble":
-            expr = sp.sympify(expresion, locals=sympy_func_dict)
-            expr = _asegura_escalar(expr)
-            fxy = sp.lambdify((x, y), expr, modules="numpy")
-            x_inf = parse_limit_string(limites["a"])
-            x_sup = parse_limit_string(limites["b"])
-            y_inf_func = _parse_limit_func(limites["c"], [x])
-            y_sup_func = _parse_limit_func(limites["d"], [x])
-
-            nx, ny = 40, 40
-            X = np.linspace(x_inf, x_sup, nx)
-            Y = np.zeros((ny, nx))
-            Z = np.zeros((ny, nx))
-            for ix, xv in enumerate(X):
-                y_min = y_inf_func(xv)
-                y_max = y_sup_func(xv)
-                if y_max <= y_min:
-                    Y[:, ix] = np.nan
-                    Z[:, ix] = np.nan
-                    continue
-                Y[:, ix] = np.linspace(y_min, y_max, ny)
-                try:
-                    Z[:, ix] = fxy(xv, Y[:, ix])
-                except Exception as e:
-                    print("Error en Z[:, ix] = fxy(xv, Y[:, ix])", e)
-                    Z[:, ix] = np.nan
-
-            # Solo aborta si TODOS los valores son NaN o infinitos, no si hay algunos NaN
-            if not np.any(np.isfinite(Z)):
-                raise ValueError("No hay datos válidos para graficar (todos los valores son NaN o infinitos). Cambia el intervalo.")
-
-            import matplotlib
-            matplotlib.use('Agg')
-            import matplotlib.pyplot as plt
-            fig = plt.figure(figsize=(8, 6))
-            ax = fig.add_subplot(111, projection='3d')
-            surf = ax.plot_surface(X, Y, Z, cmap='plasma', edgecolor='k', linewidth=0.5, antialiased=True)
-            ax.set_title(r'Visualización del volumen bajo $f(x, y) = %s$' % sp.latex(expr), fontsize=18, pad=20)
-            ax.set_xlabel('x', fontsize=14, labelpad=10)
-            ax.set_ylabel('y', fontsize=14, labelpad=10)
-            ax.set_zlabel('z', fontsize=14, labelpad=10)
-            fig.colorbar(surf, shrink=0.7, aspect=15, pad=0.1)
-            plt.tight_layout()
-            plt.savefig(ruta, dpi=200, bbox_inches='tight')
-            plt.close(fig)
-            return ruta
-
-        elif tipo == "triple":
-            expr = sp.sympify(expresion, locals=sympy_func_dict)
-            expr = _asegura_escalar(expr)
-            fxyz = sp.lambdify((x, y, z), expr, modules="numpy")
-
-            x_inf = parse_limit_string(limites["a"])
-            x_sup = parse_limit_string(limites["b"])
-            y_inf_func = _parse_limit_func(limites["c"], [x])
-            y_sup_func = _parse_limit_func(limites["d"], [x])
-            z_inf_func = _parse_limit_func(limites["e"], [x, y])
-            z_sup_func = _parse_limit_func(limites["f"], [x, y])
-
-            nx, ny, nz = 15, 15, 15
-            X = np.linspace(x_inf, x_sup, nx)
-            Y = np.zeros((ny, nx))
-            S = np.zeros((ny, nx))
-            for ix, xv in enumerate(X):
-                y_min = y_inf_func(xv)
-                y_max = y_sup_func(xv)
-                if y_max <= y_min:
-                    Y[:, ix] = np.nan
-                    S[:, ix] = np.nan
-                    continue
-                Y[:, ix] = np.linspace(y_min, y_max, ny)
-                for iy, yv in enumerate(Y[:, ix]):
-                    z_min = z_inf_func(xv, yv)
-                    z_max = z_sup_func(xv, yv)
-                    if z_max <= z_min:
-                        S[iy, ix] = np.nan
-                        continue
-                    Z = np.linspace(z_min, z_max, nz)
-                    try:
-                        vals = fxyz(xv, yv, Z)
-                        S[iy, ix] = np.nansum(vals)
-                    except Exception as e:
-                        print("Error en S[iy, ix] = np.nansum(vals):", e)
-                        S[iy, ix] = np.nan
-
-            if not np.any(np.isfinite(S)):
-                raise ValueError("No hay datos válidos para graficar (todos los valores son NaN o infinitos). Cambia los límites o la función.")
-
-            import matplotlib
-            matplotlib.use('Agg')
-            import matplotlib.pyplot as plt
-            fig = plt.figure(figsize=(8, 6))
-            ax = fig.add_subplot(111, projection='3d')
-            surf = ax.plot_surface(X, Y, S, cmap='plasma', edgecolor='k', linewidth=0.5, antialiased=True)
-            ax.set_title(r'Visualización del volumen bajo $\int f(x, y, z)\,dz$ de %s' % sp.latex(expr), fontsize=16, pad=20)
-            ax.set_xlabel('x', fontsize=14, labelpad=10)
-            ax.set_ylabel('y', fontsize=14, labelpad=10)
-            ax.set_zlabel('Suma f(x, y, z)', fontsize=14, labelpad=10)
-            fig.colorbar(surf, shrink=0.7, aspect=15, pad=0.1)
-            plt.tight_layout()
-            plt.savefig(ruta, dpi=200, bbox_inches='tight')
-            plt.close(fig)
-            return ruta
-
-        else:
+        if tipo not in ("simple", "doble", "triple"):
             raise ValueError(f"Tipo de integral no soportado para graficar: {tipo}")
+        with etapa("malla", tipo=tipo):
+            series = datos_grafica(tipo, expresion, limites)
+        titulo = _titulo(tipo, _asegura_escalar(obtener_expresion(expresion)))
+        etiquetas = ("x", "f(x)") if tipo == "simple" else None
+        return ruta, _guarda_medida(ruta, tipo, series, titulo, etiquetas)
+    except ValueError as e:
+        log.info("No se pudo graficar %s de %s: %s", tipo, expresion, e)
+        return "", None
+    except Exception:
+        log.exception("Error al graficar %s de %s", tipo, expresion)
+        return "", None
 
-    except Exception as e:
-        print("Error en generar_grafica:", e)
-        traceback.print_exc()
-        return ""
\ No newline at end of file
+
+def generar_grafica(tipo: str, expresion: str, limites: dict, modo_interactivo: bool = True):
+    """
+    Gráfica de la integral (matplotlib, con el preset y formato del
+    renderizador). Devuelve la ruta del archivo o "" si no se pudo generar.
+    """
+    return generar_grafica_medida(tipo, expresion, limites)[0]
+
+
+def generar_grafica_barrido(expresion: str, parametro: str, valores_parametro, resultados, tipo: str = "simple"):
+    """
+    Curva del valor de la integral frente al parámetro de un barrido.
+    Devuelve (ruta, métrica) como generar_grafica_medida.
+    """
+    os.makedirs("static/graficas", exist_ok=True)
+    limites = {"parametro": parametro, "valores": list(valores_parametro), "resultados": list(resultados)}
+    render = renderizador()
+    ruta = ruta_grafica(f"barrido_{tipo}", expresion, limites, render.ajustes, render.extension)
+    if grafica_existente(ruta):
+        return ruta, None
+    try:
+        k_vals = np.asarray(valores_parametro, dtype=float)
+        i_vals = np.array([np.nan if v is None else v for v in resultados], dtype=float)
+        if not np.any(np.isfinite(i_vals)):
+            raise ValueError("No hay resultados finitos para graficar.")
+        expr = obtener_expresion(expresion)
+        titulo = r'Integral de $%s$ según $%s$' % (sp.latex(expr), parametro)
+        return ruta, _guarda_medida(ruta, "barrido", (k_vals, i_vals), titulo, (parametro, 'I(%s)' % parametro))
+    except ValueError as e:
+        log.info("No se pudo graficar el barrido de %s: %s", expresion, e)
+        return "", None
+    except Exception:
+        log.exception("Error al graficar el barrido de %s", expresion)
+        return "", None
@@ -1,116 +1,64 @@
+import logging
+import os
 import sympy as sp
 import numpy as np
-import re
-
-from sympy.parsing.sympy_parser import (
-    parse_expr, standard_transformations, implicit_multiplication_application,
-    convert_xor
-)
-
-# Diccionario extendido para trigonométricas y constantes
-sympy_func_dict = {
-    "sin": sp.sin, "cos": sp.cos, "tan": sp.tan,
-    "log": sp.log, "exp": sp.exp, "sqrt": sp.sqrt,
-    "sec": sp.sec, "csc": sp.csc, "cot": sp.cot,
-    "Abs": sp.Abs, "abs": sp.Abs, "pi": sp.pi, "e": sp.E
-}
-
-def preprocess_math_expr(expr_str):
-    """
-    Preprocesa la expresión matemática:
-    - Reemplaza abs( por Abs(
-    - Soporta 'π' como 'pi'
-    - Soporta PI/E en cualquier capitalización
-    - Inserta * entre número y pi o e, por ejemplo 2pi -> 2*pi
-    """
-    expr_str = re.sub(r'\babs\s*\(', 'Abs(', expr_str)
-    expr_str = expr_str.replace('π', 'pi')
-    expr_str = re.sub(r'\bPI\b', 'pi', expr_str, flags=re.IGNORECASE)
-    expr_str = re.sub(r'\bE\b', 'e', expr_str, flags=re.IGNORECASE)
-    # Inserta un * entre número y pi o e (por ejemplo 2pi -> 2*pi, 3e -> 3*e)
-    expr_str = re.sub(r'(\d)(pi|e)\b', r'\1*\2', expr_str)
-    return expr_str
+
+from app.calculo.adaptativa import RTOL, ATOL, MAX_EVAL
+from app.calculo.simbolica import integral_simbolica, coincide, disponible as simbolica_disponible
+from app.calculo.singularidades import puntos_singulares, puede_ser_singular
+from app.calculo.reglas import regla_simpson
+from app.calculo.jit import kernel_filas, integra_filas, registrar_uso
+from app.utils.math_parser import obtener_expresion, compilar_numerica, compilar_limite
+from app.utils.metricas import etapa, contar
+
+log = logging.getLogger(__name__)
+
+# Presupuesto de memoria (bytes) para evaluar de una vez la malla de nodos de las
+# integrales dobles y triples. Si la malla no cabe, se evalúa por bloques de filas en x.
+MEMORIA_MAX_BYTES = int(os.environ.get("INTEGRALES_MEMORIA_MAX_BYTES", 64 * 1024 * 1024))
+# Arreglos temporales del tamaño de la malla que se crean durante una evaluación
+_TEMPORALES_POR_NODO = 8
+
+# Resolución por defecto de cada tipo de integral
+N_SIMPLE = 10000
+N_DOBLE = 200
+N_TRIPLE = 40
 
 def parse_limit_string(val):
     # Convierte un string como "pi", "2*pi", "e", "3.5", etc. a float usando sympy
     try:
-        val_proc = preprocess_math_expr(str(val))
-        expr = sp.sympify(val_proc, locals=sympy_func_dict)
-        return float(expr.evalf())
+        constante = compilar_limite(val if isinstance(val, (float, int)) else str(val), ()).constante
+        if constante is None:
+            raise ValueError("El límite depende de variables.")
+        return constante
     except Exception as ex:
-        print(f"Error en parse_limit_string para val={val}: {ex}")
+        log.debug("Límite inválido %r: %s", val, ex)
         raise ValueError(f"Límite inválido: {val}")
 
-def parse_math_expr(expr_str):
-    if expr_str is None or expr_str == "":
-        raise ValueError("Expresión vacía")
-    expr_str = preprocess_math_expr(expr_str)
-    transformations = (
-        standard_transformations +
-        (implicit_multiplication_application, convert_xor)
-    )
-    return parse_expr(str(expr_str), transformations=transformations, local_dict=sympy_func_dict)
-
 def get_limit_func(expr, args):
-    if isinstance(expr, (float, int)):
-        return lambda *a: float(expr)
-    elif isinstance(expr, str):
-        expr = expr.replace('^', '**')
-        expr = re.sub(r'([a-zA-Z])(\d)', r'\1*\2', expr)
-        expr = re.sub(r'(\d)([a-zA-Z])', r'\1*\2', expr)
-        expr = preprocess_math_expr(expr)
-        try:
-            return sp.lambdify(args, parse_math_expr(expr), modules=["numpy"])
-        except Exception:
-            # Si no es función, intenta forzar a float interpretando como expresión sympy
-            try:
-                return lambda *a: float(sp.sympify(expr, locals=sympy_func_dict).evalf())
-            except Exception:
-                raise
+    """
+    Función de límite evaluable sobre arreglos (ver compilar_limite).
+    Los callables se devuelven tal cual.
+    """
+    if isinstance(expr, (float, int, str)):
+        return compilar_limite(expr, args)
     elif callable(expr):
         return expr
     else:
         raise ValueError("No se pudo convertir el límite a función.")
 
-def detectar_discontinuidad(expr, a, b):
-    """
-    Detecta discontinuidades simples para tan(x), sec(x), csc(x), cot(x), 1/x en [a, b].
-    Solo para integrales simples, pero fácil de adaptar a dobles/triples.
-    """
-    x = sp.symbols('x')
-    puntos = []
-    # tan(x), sec(x) --> cos(x)=0
-    if expr.has(sp.tan) or expr.has(sp.sec):
-        k = int(np.floor(a/np.pi - 0.5))
-        while True:
-            punto = (np.pi/2) + k*np.pi
-            if punto > b:
-                break
-            if a < punto < b:
-                puntos.append(punto)
-            k += 1
-    # cot(x), csc(x) --> sin(x)=0
-    if expr.has(sp.cot) or expr.has(sp.csc):
-        k = int(np.floor(a/np.pi))
-        while True:
-            punto = k*np.pi
-            if punto > b:
-                break
-            if a < punto < b:
-                puntos.append(punto)
-            k += 1
-    # 1/x
-    if expr.has(1/x):
-        if a < 0 < b:
-            puntos.append(0)
-    return len(puntos) > 0
-
 def simpson_simple(f, a, b, n=10000):
     """
     Regla de Simpson compuesta (robusta para trigonométricas).
     """
     if n % 2:
         n += 1
+    kernel = kernel_filas(f)
+    if kernel is not None and f.aridad == 1:
+        total = float(integra_filas(kernel, [], a, b, regla_simpson(n))[()])
+        if not np.isfinite(total):
+            raise ValueError("La función tiene valores infinitos o indefinidos en el intervalo.")
+        return total
     x = np.linspace(a, b, n+1)
     y = f(x)
     # Si hay nan/inf, abortar
@@ -119,96 +67,225 @@ def simpson_simple(f, a, b, n=10000):
     S = y[0] + y[-1] + 4 * np.sum(y[1:-1:2]) + 2 * np.sum(y[2:-2:2])
     return (b - a) * S / (3 * n)
 
-def simpson_doble_variable(f, x_inf, x_sup, y_inf_func, y_sup_func, nx=100, ny=100):
-    if nx % 2: nx += 1
-    if ny % 2: ny += 1
-    x_vals = np.linspace(x_inf, x_sup, nx+1)
-    hx = (x_sup - x_inf) / nx
-    S_total = 0.0
-    for i, xi in enumerate(x_vals):
-        y_inf = y_inf_func(xi)
-        y_sup = y_sup_func(xi)
-        if y_sup <= y_inf:
-            continue
-        y_vals = np.linspace(y_inf, y_sup, ny+1)
-        hy = (y_sup - y_inf) / ny
-        S_y = 0.0
-        for j, yj in enumerate(y_vals):
-            coeff = 1
-            if i == 0 or i == nx:
-                coeff *= 1
-            elif i % 2 == 1:
-                coeff *= 4
-            else:
-                coeff *= 2
-            if j == 0 or j == ny:
-                coeff *= 1
-            elif j % 2 == 1:
-                coeff *= 4
-            else:
-                coeff *= 2
-            try:
-                v = f(xi, yj)
-            except Exception:
-                v = 0.0
-            S_y += coeff * v
-        S_y *= hy / 3
-        S_total += S_y
-    return S_total * hx / 3
-
-def simpson_triple_variable(f, x_inf, x_sup, y_inf_func, y_sup_func, z_inf_func, z_sup_func, nx=20, ny=20, nz=20):
-    if nx % 2: nx += 1
-    if ny % 2: ny += 1
-    if nz % 2: nz += 1
-    x_vals = np.linspace(x_inf, x_sup, nx+1)
-    hx = (x_sup - x_inf) / nx
-    S_total = 0.0
-    for i, xi in enumerate(x_vals):
-        y_inf = y_inf_func(xi)
-        y_sup = y_sup_func(xi)
-        if y_sup <= y_inf:
-            continue
-        y_vals = np.linspace(y_inf, y_sup, ny+1)
-        hy = (y_sup - y_inf) / ny
-        S_y = 0.0
-        for j, yj in enumerate(y_vals):
-            z_inf = z_inf_func(xi, yj)
-            z_sup = z_sup_func(xi, yj)
-            if z_sup <= z_inf:
-                continue
-            z_vals = np.linspace(z_inf, z_sup, nz+1)
-            hz = (z_sup - z_inf) / nz
-            S_z = 0.0
-            for k, zk in enumerate(z_vals):
-                coeff = 1
-                if i == 0 or i == nx:
-                    coeff *= 1
-                elif i % 2 == 1:
-                    coeff *= 4
-                else:
-                    coeff *= 2
-                if j == 0 or j == ny:
-                    coeff *= 1
-                elif j % 2 == 1:
-                    coeff *= 4
-                else:
-                    coeff *= 2
-                if k == 0 or k == nz:
-                    coeff *= 1
-                elif k % 2 == 1:
-                    coeff *= 4
-                else:
-                    coeff *= 2
-                try:
-                    v = f(xi, yj, zk)
-                except Exception:
-                    v = 0.0
-                S_z += coeff * v
-            S_z *= hz / 3
-            S_y += S_z
-        S_y *= hy / 3
-        S_total += S_y
-    return S_total * hx / 3
+def cuadratura_lote(f, a, b, regla, memoria_max=None, params=()):
+    """
+    Aplica la regla (t, w) normalizada a [0, 1] a varios intervalos [a_i, b_i]
+    del mismo integrando, evaluando f una sola vez sobre la malla (intervalos x nodos).
+    params son arreglos con un valor por intervalo que se pasan a f como
+    argumentos extra (p. ej. el parámetro de un barrido: f(x, k)).
+    Devuelve un arreglo con una integral por intervalo; las que tienen valores
+    infinitos o indefinidos quedan como nan.
+    """
+    t, w = regla
+    a, b, *params = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=float)) for v in (a, b, *params)))
+    kernel = None if params else kernel_filas(f)
+    if kernel is not None and f.aridad == 1:
+        S = integra_filas(kernel, [], a, b, regla)
+        return np.where(np.isfinite(S), S, np.nan)
+    resultados = np.empty(a.shape)
+    for bloque in _bloques(a.size, t.size, memoria_max):
+        X = a[bloque, None] + (b - a)[bloque, None] * t
+        extra = [np.broadcast_to(p[bloque, None], X.shape) for p in params]
+        Y = _evalua_malla(f, X, *extra)
+        finito = np.all(np.isfinite(Y), axis=1)
+        S = np.where(finito, np.where(np.isfinite(Y), Y, 0.0) @ w, np.nan)
+        resultados[bloque] = (b[bloque] - a[bloque]) * S
+    return resultados
+
+def simpson_simple_lote(f, a, b, n=10000, memoria_max=None, params=()):
+    """
+    Regla de Simpson compuesta para varios intervalos del mismo integrando
+    (ver cuadratura_lote).
+    """
+    return cuadratura_lote(f, a, b, regla_simpson(n), memoria_max, params)
+
+def _bloques(n_filas, elems_por_fila, memoria_max=None):
+    """
+    Divide las filas de la malla (una por nodo en x) en bloques cuyo tamaño
+    respeta el presupuesto de memoria. Si toda la malla cabe, devuelve un solo bloque.
+    """
+    if memoria_max is None:
+        memoria_max = MEMORIA_MAX_BYTES
+    bytes_por_fila = elems_por_fila * 8 * _TEMPORALES_POR_NODO
+    filas = max(1, int(memoria_max // max(bytes_por_fila, 1)))
+    for inicio in range(0, n_filas, filas):
+        yield slice(inicio, min(inicio + filas, n_filas))
+
+def _evalua_limite(func, *args):
+    """
+    Evalúa una función de límite sobre arreglos y devuelve un arreglo con la forma de args[0].
+    Los límites constantes devuelven un escalar, que se expande por broadcast.
+    """
+    forma = np.shape(args[0])
+    try:
+        vals = np.asarray(func(*args), dtype=float)
+    except Exception:
+        vals = np.array([float(func(*p)) for p in zip(*(np.ravel(a) for a in args))]).reshape(forma)
+    return np.broadcast_to(vals, forma)
+
+def _evalua_malla(f, *mallas):
+    """
+    Evalúa el integrando una sola vez sobre toda la malla.
+    Si la evaluación vectorizada falla, cae a evaluación punto a punto
+    (los puntos que lanzan excepción valen 0, como en la versión escalar).
+    """
+    forma = mallas[0].shape
+    try:
+        with np.errstate(all="ignore"):
+            return np.broadcast_to(np.asarray(f(*mallas), dtype=float), forma)
+    except Exception:
+        pass
+    vals = np.empty(forma)
+    planos = [np.ravel(m) for m in mallas]
+    for idx in range(vals.size):
+        try:
+            vals.flat[idx] = float(f(*(p[idx] for p in planos)))
+        except Exception:
+            vals.flat[idx] = 0.0
+    return vals
+
+def _filas_doble(f, xi, extra, y_inf_func, y_sup_func, regla_y):
+    """
+    Integral en y para cada fila de la malla: una por nodo xi.
+    extra son argumentos adicionales por fila (p. ej. un parámetro) que reciben
+    f y las funciones de límite después de las variables de integración.
+    """
+    ty, wy = regla_y
+    y_inf = _evalua_limite(y_inf_func, xi, *extra)
+    y_sup = _evalua_limite(y_sup_func, xi, *extra)
+    valido = y_sup > y_inf
+    kernel = None if extra else kernel_filas(f)
+    if kernel is not None and f.aridad == 2:
+        return np.where(valido, integra_filas(kernel, [xi], y_inf, y_sup, regla_y), 0.0)
+    Y = y_inf[:, None] + (y_sup - y_inf)[:, None] * ty
+    X = np.broadcast_to(xi[:, None], Y.shape)
+    extra2 = [np.broadcast_to(p[:, None], Y.shape) for p in extra]
+    V = np.where(valido[:, None], _evalua_malla(f, X, Y, *extra2), 0.0)
+    return (V @ wy) * np.where(valido, y_sup - y_inf, 0.0)
+
+def _filas_triple(f, xi, extra, y_inf_func, y_sup_func, z_inf_func, z_sup_func, regla_y, regla_z):
+    """
+    Integral en (y, z) para cada fila de la malla (una por nodo xi).
+    """
+    ty, wy = regla_y
+    tz, wz = regla_z
+    y_inf = _evalua_limite(y_inf_func, xi, *extra)
+    y_sup = _evalua_limite(y_sup_func, xi, *extra)
+    valido_y = y_sup > y_inf
+    Y = y_inf[:, None] + (y_sup - y_inf)[:, None] * ty
+    X2 = np.broadcast_to(xi[:, None], Y.shape)
+    extra2 = [np.broadcast_to(p[:, None], Y.shape) for p in extra]
+    z_inf = _evalua_limite(z_inf_func, X2, Y, *extra2)
+    z_sup = _evalua_limite(z_sup_func, X2, Y, *extra2)
+    valido_z = (z_sup > z_inf) & valido_y[:, None]
+    kernel = None if extra else kernel_filas(f)
+    if kernel is not None and f.aridad == 3:
+        S_z = np.where(valido_z, integra_filas(kernel, [X2, Y], z_inf, z_sup, regla_z), 0.0)
+        return (S_z @ wy) * np.where(valido_y, y_sup - y_inf, 0.0)
+    Z = z_inf[..., None] + (z_sup - z_inf)[..., None] * tz
+    X3 = np.broadcast_to(X2[..., None], Z.shape)
+    Y3 = np.broadcast_to(Y[..., None], Z.shape)
+    extra3 = [np.broadcast_to(p[..., None], Z.shape) for p in extra2]
+    V = np.where(valido_z[..., None], _evalua_malla(f, X3, Y3, Z, *extra3), 0.0)
+    S_z = (V @ wz) * np.where(valido_z, z_sup - z_inf, 0.0)
+    return (S_z @ wy) * np.where(valido_y, y_sup - y_inf, 0.0)
+
+def simpson_doble_variable(f, x_inf, x_sup, y_inf_func, y_sup_func, nx=100, ny=100, memoria_max=None):
+    """
+    Regla de Simpson compuesta en 2D con límites en y que dependen de x.
+    Construye la malla de nodos completa y la evalúa de una vez con NumPy,
+    por bloques de filas en x si la malla excede el presupuesto de memoria.
+    """
+    return simpson_doble_parametrico(
+        f, x_inf, x_sup, y_inf_func, y_sup_func, (), nx, ny, memoria_max
+    )[()]
+
+def simpson_triple_variable(f, x_inf, x_sup, y_inf_func, y_sup_func, z_inf_func, z_sup_func, nx=20, ny=20, nz=20, memoria_max=None):
+    """
+    Regla de Simpson compuesta en 3D con límites en y que dependen de x
+    y límites en z que dependen de (x, y). Misma estrategia que la versión doble:
+    malla completa evaluada en bloque, con partición por filas en x si no cabe en memoria.
+    """
+    return simpson_triple_parametrico(
+        f, x_inf, x_sup, y_inf_func, y_sup_func, z_inf_func, z_sup_func, (), nx, ny, nz, memoria_max
+    )[()]
+
+def _filas_x(x_inf, x_sup, params, tx):
+    """
+    Nodos en x de varias integrales a la vez (una por valor de los parámetros),
+    aplanados en filas. Devuelve (xi, extra, ancho, forma).
+    """
+    x_inf, x_sup, *params = np.broadcast_arrays(
+        np.asarray(x_inf, dtype=float), np.asarray(x_sup, dtype=float), *(np.asarray(p, dtype=float) for p in params)
+    )
+    X = x_inf[..., None] + (x_sup - x_inf)[..., None] * tx
+    extra = [np.broadcast_to(p[..., None], X.shape).ravel() for p in params]
+    return X.ravel(), extra, x_sup - x_inf, X.shape
+
+def cuadratura_doble(f, x_inf, x_sup, y_inf_func, y_sup_func, regla_x, regla_y, params=(), memoria_max=None):
+    """
+    Regla producto en 2D (reglas (t, w) normalizadas a [0, 1] en x y en y) para
+    una familia de integrales que solo difieren en los valores de params
+    (arreglos con un valor por integral). f recibe (x, y, *params) y los límites
+    en y reciben (x, *params); x_inf/x_sup pueden ser arreglos.
+    Todas las integrales se evalúan juntas sobre una sola malla.
+    """
+    tx, wx = regla_x
+    xi, extra, ancho, forma = _filas_x(x_inf, x_sup, params, tx)
+    S_y = np.empty(xi.size)
+    for bloque in _bloques(xi.size, regla_y[0].size, memoria_max):
+        S_y[bloque] = _filas_doble(f, xi[bloque], [p[bloque] for p in extra], y_inf_func, y_sup_func, regla_y)
+    return (S_y.reshape(forma) @ wx) * ancho
+
+def cuadratura_triple(f, x_inf, x_sup, y_inf_func, y_sup_func, z_inf_func, z_sup_func, regla_x, regla_y, regla_z,
+                      params=(), memoria_max=None):
+    """
+    Versión 3D de cuadratura_doble: f recibe (x, y, z, *params), los
+    límites en y reciben (x, *params) y los de z (x, y, *params).
+    """
+    tx, wx = regla_x
+    xi, extra, ancho, forma = _filas_x(x_inf, x_sup, params, tx)
+    S_y = np.empty(xi.size)
+    for bloque in _bloques(xi.size, regla_y[0].size * regla_z[0].size, memoria_max):
+        S_y[bloque] = _filas_triple(
+            f, xi[bloque], [p[bloque] for p in extra], y_inf_func, y_sup_func, z_inf_func, z_sup_func,
+            regla_y, regla_z
+        )
+    return (S_y.reshape(forma) @ wx) * ancho
+
+def valores_region(f, a, b, limites, u):
+    """
+    Lleva puntos del cubo unidad a la región de integración y devuelve f por el
+    jacobiano en cada punto, de modo que la media de los valores es la integral.
+    u tiene forma (dimensión, n); limites son pares (inf_func, sup_func) de las
+    variables interiores, como en integral_adaptativa. Sirve para Monte Carlo y QMC.
+    """
+    variables = [a + (b - a) * u[0]]
+    jacobiano = np.full(u.shape[1], b - a, dtype=float)
+    for (inf_func, sup_func), ui in zip(limites, u[1:]):
+        inf = _evalua_limite(inf_func, *variables)
+        sup = _evalua_limite(sup_func, *variables)
+        jacobiano = jacobiano * np.where(sup > inf, sup - inf, 0.0)
+        variables.append(inf + (sup - inf) * ui)
+    return np.where(jacobiano > 0, _evalua_malla(f, *variables) * jacobiano, 0.0)
+
+def simpson_doble_parametrico(f, x_inf, x_sup, y_inf_func, y_sup_func, params=(), nx=100, ny=100, memoria_max=None):
+    """
+    Simpson 2D para una familia de integrales (ver cuadratura_doble).
+    """
+    return cuadratura_doble(
+        f, x_inf, x_sup, y_inf_func, y_sup_func, regla_simpson(nx), regla_simpson(ny), params, memoria_max
+    )
+
+def simpson_triple_parametrico(f, x_inf, x_sup, y_inf_func, y_sup_func, z_inf_func, z_sup_func, params=(),
+                               nx=20, ny=20, nz=20, memoria_max=None):
+    """
+    Simpson 3D para una familia de integrales (ver cuadratura_triple).
+    """
+    return cuadratura_triple(
+        f, x_inf, x_sup, y_inf_func, y_sup_func, z_inf_func, z_sup_func,
+        regla_simpson(nx), regla_simpson(ny), regla_simpson(nz), params, memoria_max
+    )
 
 def _valida_resultado(result):
     if isinstance(result, (float, int, np.floating)):
@@ -219,66 +296,199 @@ def _valida_resultado(result):
     except Exception:
         return False
 
-def calcular_integral(tipo: str, expresion: str, limites: dict):
+def _resultado_metodo(res):
+    if not _valida_resultado(res["valor"]):
+        return {"error": "El resultado de la integral es infinito o indefinido. Cambia los límites o la función."}
+    resultado = {"valor": float(res["valor"])}
+    for clave in ("error_estimado", "evaluaciones", "convergio", "metodo", "puntos_singulares"):
+        if clave in res:
+            resultado[clave] = res[clave]
+    return resultado
+
+class CalculoCancelado(Exception):
+    """
+    La lanza la función de progreso cuando el cliente canceló el cálculo.
+    """
+
+class IntegralDivergente(ValueError):
+    """
+    La integral no converge junto a un punto singular del intervalo.
+    """
+
+def _limite_simbolico(val):
+    # Los límites numéricos se toman como el decimal que escribió el usuario (0.1 -> 1/10)
+    if isinstance(val, (int, float)):
+        return sp.Rational(repr(float(val)))
+    return obtener_expresion(str(val))
+
+def _resultado_simbolico(expr, limites_simbolicos, estimar):
+    """
+    Intenta la vía simbólica y valida el valor exacto contra estimar(), una
+    cuadratura numérica gruesa. Devuelve None si hay que usar la vía numérica.
+    """
+    exacto = integral_simbolica(expr, limites_simbolicos)
+    if exacto is None:
+        return None
+    valor = float(sp.re(exacto.evalf()))
+    if not np.isfinite(valor) or not coincide(valor, float(estimar())):
+        return None
+    return {"valor": valor, "exacto": str(exacto), "latex": sp.latex(exacto), "metodo": "simbolico"}
+
+def _puntos_exteriores(expresion, f, variable, a, b):
+    # Puntos singulares del integrando en la variable exterior; SymPy solo se usa
+    # si el integrando tiene algo que pueda ser singular
+    if not puede_ser_singular(f):
+        return []
+    return puntos_singulares(obtener_expresion(expresion), variable, a, b)
+
+def _interiores(puntos, a, b):
+    return [p for p in puntos if min(a, b) < p < max(a, b)]
+
+def calcular_integral(tipo: str, expresion: str, limites: dict, modo: str = "fijo",
+                      rtol: float = RTOL, atol: float = ATOL, max_eval: int = MAX_EVAL,
+                      simbolico: bool = False, metodo: str = "auto", semilla: int = 0, progreso=None):
     """
-    Calcula la integral definida usando la Regla de Simpson compuesta,
-    con manejo robusto de trigonométricas y discontinuidades.
+    Calcula la integral definida con la cuadratura elegida en metodo (por
+    defecto "auto": Gauss–Legendre si converge y, si no, Simpson compuesta,
+    QMC o tanh-sinh; ver cuadraturas._automatico), con manejo robusto de trigonométricas y discontinuidades: el intervalo de
+    la variable exterior se corta en los puntos singulares del integrando
+    (ver cuadraturas.integrar_tramos) y una integral divergente da error.
+    Con modo="adaptativo" usa Gauss–Kronrod adaptativo con tolerancias rtol/atol
+    y un máximo de max_eval evaluaciones, y devuelve además el error estimado
+    y las evaluaciones usadas.
+    metodo elige la cuadratura del registro de app.calculo.cuadraturas
+    (simpson, gauss_legendre, gauss_kronrod, tanh_sinh, monte_carlo, qmc) o "auto";
+    semilla fija los puntos de los métodos aleatorios para que el resultado sea reproducible.
+    Con simbolico=True intenta primero una primitiva exacta con SymPy (con
+    tiempo acotado) y devuelve además el valor exacto y su LaTeX; si no la
+    encuentra a tiempo, sigue con la vía numérica. Si la vía simbólica no está
+    disponible en este hilo (ver simbolica.disponible), el resultado numérico
+    lleva simbolico="no_disponible".
+    Con progreso, cada refinamiento del cálculo se notifica a progreso(estimacion)
+    (ver cuadraturas.integrar_progresivo); si progreso lanza CalculoCancelado,
+    el cálculo se abandona.
+    Cada etapa (límites, singularidades, vía simbólica, cuadratura) se mide en
+    app.utils.metricas, junto con el método usado y las evaluaciones.
     """
+    resultado = _calcular_integral(tipo, expresion, limites, modo, rtol, atol, max_eval, simbolico, metodo, semilla,
+                                   progreso)
+    usado = resultado.get("metodo", "ninguno")
+    contar("integrales_calculos_total", tipo=tipo, metodo=usado, resultado="error" if "error" in resultado else "ok")
+    if "evaluaciones" in resultado:
+        contar("integrales_evaluaciones_total", resultado["evaluaciones"], tipo=tipo, metodo=usado)
+    return resultado
+
+def _calcular_integral(tipo, expresion, limites, modo, rtol, atol, max_eval, simbolico, metodo, semilla, progreso):
+    # Import local: cuadraturas usa los motores de este módulo
+    from app.calculo.cuadraturas import METODOS, integrar, integrar_progresivo, integrar_tramos
+
     x, y, z = sp.symbols('x y z')
-    resultado = None
 
     try:
-        print("==== DATOS RECIBIDOS ====")
-        print("tipo:", tipo)
-        print("expresion:", expresion)
-        print("limites:", limites)
+        log.debug("Integral %s de %s con límites %s", tipo, expresion, limites)
 
-        expr = parse_math_expr(expresion) if expresion else None
+        if modo not in ("fijo", "adaptativo"):
+            return {"error": f"Modo de cálculo no soportado: {modo}"}
+        if metodo != "auto" and metodo not in METODOS:
+            return {"error": f"Método de cuadratura no soportado: {metodo}"}
+        # modo="adaptativo" equivale a metodo="gauss_kronrod" si no se pide otro método
+        if modo == "adaptativo" and metodo == "auto":
+            metodo = "gauss_kronrod"
+
+        if not expresion:
+            return {"error": "Expresión vacía"}
+        # Sin alarma para acotar SymPy (p. ej. en los hilos del ejecutor) no hay vía
+        # simbólica: se avisa en la respuesta en lugar de ignorar la opción sin más
+        simbolica_omitida = simbolico and not simbolica_disponible()
+        if simbolica_omitida:
+            log.warning("Vía simbólica no disponible en este hilo; se usa la cuadratura numérica.")
+            simbolico = False
 
         if tipo == "simple":
-            a = parse_limit_string(limites["a"])
-            b = parse_limit_string(limites["b"])
-            print("Límite inferior procesado:", a)
-            print("Límite superior procesado:", b)
-            if detectar_discontinuidad(expr, a, b):
-                return {"error": "La función tiene discontinuidades en el intervalo de integración. El resultado puede ser indefinido o incorrecto."}
-            f = sp.lambdify(x, expr, modules=["numpy"])
-            resultado = simpson_simple(f, a, b, n=10000)
+            with etapa("limites"):
+                a = parse_limit_string(limites["a"])
+                b = parse_limit_string(limites["b"])
+            f = compilar_numerica(expresion, (x,))
+            with etapa("singularidades"):
+                puntos = _puntos_exteriores(expresion, f, x, a, b)
+            if simbolico and not _interiores(puntos, a, b):
+                with etapa("simbolico"):
+                    exacto = _resultado_simbolico(
+                        obtener_expresion(expresion), [(x, _limite_simbolico(limites["a"]), _limite_simbolico(limites["b"]))],
+                        lambda: simpson_simple(f, a, b, n=1000)
+                    )
+                if exacto is not None:
+                    return exacto
+            limites_interiores = []
 
         elif tipo == "doble":
-            a = parse_limit_string(limites["a"])
-            b = parse_limit_string(limites["b"])
-            print("Límites X procesados:", a, b)
-            f = sp.lambdify((x, y), expr, modules=["numpy"])
-            y_inf_func = get_limit_func(limites["c"], (x,))
-            y_sup_func = get_limit_func(limites["d"], (x,))
-            resultado = simpson_doble_variable(
-                f, a, b, y_inf_func, y_sup_func, nx=100, ny=100
-            )
+            with etapa("limites"):
+                a = parse_limit_string(limites["a"])
+                b = parse_limit_string(limites["b"])
+                y_inf_func = get_limit_func(limites["c"], (x,))
+                y_sup_func = get_limit_func(limites["d"], (x,))
+            f = compilar_numerica(expresion, (x, y))
+            with etapa("singularidades"):
+                puntos = _puntos_exteriores(expresion, f, x, a, b)
+            if simbolico and not _interiores(puntos, a, b):
+                with etapa("simbolico"):
+                    exacto = _resultado_simbolico(
+                        obtener_expresion(expresion),
+                        [(x, _limite_simbolico(limites["a"]), _limite_simbolico(limites["b"])),
+                         (y, _limite_simbolico(limites["c"]), _limite_simbolico(limites["d"]))],
+                        lambda: simpson_doble_variable(f, a, b, y_inf_func, y_sup_func, nx=64, ny=64)
+                    )
+                if exacto is not None:
+                    return exacto
+            limites_interiores = [(y_inf_func, y_sup_func)]
 
         elif tipo == "triple":
-            a = parse_limit_string(limites["a"])
-            b = parse_limit_string(limites["b"])
-            print("Límites X procesados:", a, b)
-            f = sp.lambdify((x, y, z), expr, modules=["numpy"])
-            y_inf_func = get_limit_func(limites["c"], (x,))
-            y_sup_func = get_limit_func(limites["d"], (x,))
-            z_inf_func = get_limit_func(limites["e"], (x, y))
-            z_sup_func = get_limit_func(limites["f"], (x, y))
-            resultado = simpson_triple_variable(
-                f, a, b, y_inf_func, y_sup_func, z_inf_func, z_sup_func, nx=20, ny=20, nz=20
-            )
+            with etapa("limites"):
+                a = parse_limit_string(limites["a"])
+                b = parse_limit_string(limites["b"])
+                y_inf_func = get_limit_func(limites["c"], (x,))
+                y_sup_func = get_limit_func(limites["d"], (x,))
+                z_inf_func = get_limit_func(limites["e"], (x, y))
+                z_sup_func = get_limit_func(limites["f"], (x, y))
+            f = compilar_numerica(expresion, (x, y, z))
+            with etapa("singularidades"):
+                puntos = _puntos_exteriores(expresion, f, x, a, b)
+            if simbolico and not _interiores(puntos, a, b):
+                with etapa("simbolico"):
+                    exacto = _resultado_simbolico(
+                        obtener_expresion(expresion),
+                        [(x, _limite_simbolico(limites["a"]), _limite_simbolico(limites["b"])),
+                         (y, _limite_simbolico(limites["c"]), _limite_simbolico(limites["d"])),
+                         (z, _limite_simbolico(limites["e"]), _limite_simbolico(limites["f"]))],
+                        lambda: simpson_triple_variable(
+                            f, a, b, y_inf_func, y_sup_func, z_inf_func, z_sup_func, nx=16, ny=16, nz=16
+                        )
+                    )
+                if exacto is not None:
+                    return exacto
+            limites_interiores = [(y_inf_func, y_sup_func), (z_inf_func, z_sup_func)]
         else:
             return {"error": f"Tipo de integral no soportada: {tipo}"}
 
-        if not _valida_resultado(resultado):
-            return {"error": "El resultado de la integral es infinito o indefinido. Cambia los límites o la función."}
-        return {
-            "valor": float(resultado)
-        }
+        registrar_uso(f)
+        with etapa("cuadratura", tipo=tipo):
+            if puntos:
+                res = integrar_tramos(metodo, f, a, b, limites_interiores, puntos, rtol, atol, max_eval, semilla)
+                if progreso is not None:
+                    progreso(res)
+            elif progreso is not None:
+                res = integrar_progresivo(metodo, f, a, b, limites_interiores, progreso, rtol, atol, max_eval, semilla)
+            else:
+                res = integrar(metodo, f, a, b, limites_interiores, rtol, atol, max_eval, semilla)
+        resultado = _resultado_metodo(res)
+        if simbolica_omitida and "valor" in resultado:
+            resultado["simbolico"] = "no_disponible"
+        return resultado
 
+    except CalculoCancelado:
+        return {"error": "Cálculo cancelado.", "cancelado": True}
+    except IntegralDivergente as e:
+        return {"error": str(e)}
     except Exception as e:
-        import traceback
-        print("==== ERROR INTERNO AL CALCULAR LA INTEGRAL ====")
-        traceback.print_exc()
+        log.exception("Error interno al calcular la integral %s de %s", tipo, expresion)
         return {"error": f"Error interno al calcular la integral: {str(e)}"}
\ No newline at end of file
@@ -0,0 +1,206 @@
+import concurrent.futures
+import hashlib
+import importlib.util
+import logging
+import os
+import sys
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Nivel JIT opcional (numba): las expresiones que se repiten en el proceso se
+# compilan a un kernel con un solo bucle que evalúa el integrando y acumula los
+# pesos de la regla, sin crear un arreglo temporal por operación. Sin numba,
+# o si la expresión no viene del compilador restringido, todo sigue con NumPy.
+# La compilación la hace un hilo aparte: mientras tanto se sigue con NumPy.
+# JIT_UMBRAL: cálculos (llamadas a calcular_integral) de una expresión en el
+#   proceso antes de compilarla
+# JIT_CACHE: directorio de los kernels generados; numba guarda ahí mismo el código
+#   máquina (cache=True), así que otros workers y reinicios los cargan ya compilados
+JIT_ACTIVO = os.environ.get("JIT_ACTIVO", "1") != "0"
+JIT_UMBRAL = int(os.environ.get("JIT_UMBRAL", 3))
+JIT_CACHE = os.environ.get("JIT_CACHE", "cache/jit")
+
+_FUNCIONES = {
+    "sin": "np.sin({})", "cos": "np.cos({})", "tan": "np.tan({})",
+    "log": "np.log({})", "exp": "np.exp({})", "sqrt": "np.sqrt({})",
+    "sec": "(1.0 / np.cos({}))", "csc": "(1.0 / np.sin({}))", "cot": "(1.0 / np.tan({}))",
+    "asin": "np.arcsin({})", "acos": "np.arccos({})", "atan": "np.arctan({})",
+    "Abs": "abs({})",
+}
+
+# Kernel por filas: para cada fila i, las primeras variables son fijas (columnas
+# de P) y la última recorre [lo_i, hi_i] con la regla (t, w). Devuelve
+# (hi_i - lo_i) * Σ w_j f(P_i, lo_i + (hi_i - lo_i) t_j) para cada fila.
+_PLANTILLA = """import numpy as np
+from numba import njit
+
+
+@njit(cache=True, error_model="numpy")
+def kernel(P, lo, hi, t, w):
+    S = np.empty(lo.shape[0])
+    for i in range(lo.shape[0]):
+{prefijo}        ancho = hi[i] - lo[i]
+        s = 0.0
+        for j in range(t.shape[0]):
+            v{ultima} = lo[i] + ancho * t[j]
+            s += w[j] * ({expresion})
+        S[i] = s * ancho
+    return S
+"""
+
+# clave -> kernel ya compilado (o None si falló); clave -> usos; clave -> futuro
+# de la compilación encargada. _lock solo protege estos diccionarios: la
+# compilación corre fuera de él, en el hilo de _compilador
+_kernels = {}
+_usos = {}
+_compilaciones = {}
+_lock = threading.Lock()
+_compilador = None
+
+
+@lru_cache(maxsize=1)
+def _numba_instalado():
+    # numba tarda en importarse: se importa la primera vez que se consulta
+    try:
+        import numba  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def disponible():
+    return JIT_ACTIVO and _numba_instalado()
+
+
+def _codigo(nodo):
+    # Expresión de Python escalar equivalente al árbol de math_parser
+    tipo = nodo[0]
+    if tipo == "num":
+        # Entre paréntesis: una constante negativa como base de ** ((-1)^x) no debe leerse -(1 ** x)
+        return f"({nodo[1]!r})"
+    if tipo == "var":
+        return f"v{nodo[1]}"
+    if tipo == "neg":
+        return f"(-{_codigo(nodo[1])})"
+    if tipo == "fun":
+        return _FUNCIONES[nodo[1]].format(_codigo(nodo[2]))
+    return f"({_codigo(nodo[2])} {nodo[1]} {_codigo(nodo[3])})"
+
+
+@lru_cache(maxsize=256)
+def _fuente(nodo, aridad):
+    prefijo = "".join(f"        v{k} = P[i, {k}]\n" for k in range(aridad - 1))
+    fuente = _PLANTILLA.format(prefijo=prefijo, ultima=aridad - 1, expresion=_codigo(nodo))
+    return fuente, hashlib.sha256(fuente.encode("utf-8")).hexdigest()[:24]
+
+
+def _lee(ruta):
+    try:
+        with open(ruta, encoding="utf-8") as archivo:
+            return archivo.read()
+    except (OSError, ValueError):
+        return None
+
+
+def _carga(ruta, fuente, aridad):
+    # Solo se importa un archivo con exactamente el código generado: uno que no
+    # coincide (a medio escribir, corrupto o modificado) se reescribe antes
+    if _lee(ruta) != fuente:
+        if os.path.exists(ruta):
+            log.warning("El kernel JIT %s no coincide con su código generado; se reescribe.", ruta)
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            archivo.write(fuente)
+        os.replace(temporal, ruta)
+        if _lee(ruta) != fuente:
+            raise RuntimeError(f"El kernel JIT {ruta} cambió después de escribirlo.")
+    nombre = os.path.splitext(os.path.basename(ruta))[0]
+    spec = importlib.util.spec_from_file_location(nombre, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    # numba localiza su caché a partir del módulo registrado
+    sys.modules[nombre] = modulo
+    spec.loader.exec_module(modulo)
+    kernel = modulo.kernel
+    # Compila (o carga de la caché de numba) ahora, con los mismos tipos que se usarán después
+    uno = np.ones(1)
+    kernel(np.zeros((1, aridad - 1)), uno * 0.0, uno, uno * 0.5, uno)
+    return kernel
+
+
+def _compila(clave, ruta, fuente, aridad):
+    # En el hilo compilador, sin _lock: importar numba y compilar tarda segundos
+    kernel = None
+    if _numba_instalado():
+        try:
+            kernel = _carga(ruta, fuente, aridad)
+        except Exception as e:
+            log.warning("No se pudo compilar el kernel JIT; se sigue con NumPy: %s", e)
+    _kernels[clave] = kernel
+    return kernel
+
+
+def registrar_uso(f):
+    """
+    Cuenta un cálculo con la expresión de f (una vez por llamada a
+    calcular_integral). Al llegar a JIT_UMBRAL, o en el primero si su kernel
+    ya está en el disco, encarga la compilación al hilo compilador y vuelve
+    sin esperarla.
+    """
+    nodo = getattr(f, "nodo", None)
+    if nodo is None or not JIT_ACTIVO:
+        return
+    fuente, clave = _fuente(nodo, f.aridad)
+    ruta = os.path.join(JIT_CACHE, f"kernel_{clave}.py")
+    global _compilador
+    with _lock:
+        if clave in _compilaciones:
+            return
+        usos = _usos[clave] = _usos.get(clave, 0) + 1
+        if usos < JIT_UMBRAL and not (usos == 1 and os.path.exists(ruta)):
+            return
+        del _usos[clave]
+        if _compilador is None:
+            _compilador = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="jit")
+        _compilaciones[clave] = _compilador.submit(_compila, clave, ruta, fuente, f.aridad)
+
+
+def kernel_filas(f):
+    """
+    Kernel JIT de f (ver _PLANTILLA), o None si todavía no está compilado:
+    f no viene de compilar_numerica, no llegó a JIT_UMBRAL usos (ver
+    registrar_uso) o el hilo compilador no terminó. No bloquea nunca.
+    """
+    nodo = getattr(f, "nodo", None)
+    if nodo is None or not JIT_ACTIVO or not _kernels:
+        return None
+    return _kernels.get(_fuente(nodo, f.aridad)[1])
+
+
+def esperar(timeout=None):
+    """Espera (como mucho timeout segundos) a las compilaciones encargadas."""
+    with _lock:
+        futuros = list(_compilaciones.values())
+    concurrent.futures.wait(futuros, timeout)
+
+
+def integra_filas(kernel, prefijo, lo, hi, regla):
+    """
+    Aplica el kernel a filas con coordenadas fijas `prefijo` (lista de arreglos
+    de la forma de lo, una por variable exterior) y límites [lo, hi] en la última
+    variable. Devuelve un arreglo con la forma de lo.
+    """
+    # Copias escribibles: numba compila aparte cada combinación con arreglos de
+    # solo lectura (p. ej. las reglas en caché), y _carga solo precalienta esta
+    forma = np.shape(lo)
+    t, w = (np.array(v, dtype=float) for v in regla)
+    lo = np.array(np.ravel(lo), dtype=float)
+    hi = np.array(np.broadcast_to(hi, forma).ravel(), dtype=float)
+    P = np.empty((lo.size, len(prefijo)))
+    for k, columna in enumerate(prefijo):
+        P[:, k] = np.broadcast_to(columna, forma).ravel()
+    return kernel(P, lo, hi, t, w).reshape(forma)
@@ -0,0 +1,79 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from app.utils.metricas import capturar
+
+log = logging.getLogger(__name__)
+
+# Precalentado de un proceso (el principal o un worker del pool): importa los
+# módulos de cálculo, que cargan SymPy, y deja hechas las primeras llamadas
+# caras, para que no las pague la primera petición después de un despliegue.
+# Integrandos de prueba de cada tipo, con límites pequeños
+_INTEGRALES_PRUEBA = (
+    ("simple", "x", {"a": "0", "b": "1"}),
+    ("doble", "x*y", {"a": "0", "b": "1", "c": "0", "d": "x"}),
+    ("triple", "x*y*z", {"a": "0", "b": "1", "c": "0", "d": "x", "e": "0", "f": "y"}),
+)
+
+# Segundos de cada fase del último precalentado de este proceso
+duraciones = {}
+
+
+@contextmanager
+def _fase(nombre):
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        log.warning("Falló la fase %s del precalentado: %s", nombre, e)
+    finally:
+        duraciones[nombre] = time.perf_counter() - inicio
+
+
+def precalentar(expresiones, calcular=True):
+    """
+    Fases (cada una se mide en `duraciones`, que también se devuelve):
+    - importacion: módulos de cálculo y gráficas;
+    - parser: parsea cada expresión con SymPy (la primera llamada a parse_expr es lenta);
+    - compilacion: compila cada expresión a NumPy en sus variables (lambdify si hace falta).
+    Con calcular=True, además:
+    - cuadratura: una integral de prueba de cada tipo (tablas de las reglas, numba);
+    - render: las plantillas de matplotlib y sus fuentes.
+    El proceso principal, que solo valida, usa calcular=False si hay pool de procesos.
+    Lo que se mide mientras tanto no cuenta en /metrics: no es tráfico real.
+    """
+    inicio = time.perf_counter()
+    with capturar():
+        with _fase("importacion"):
+            from app.utils.math_parser import obtener_expresion, compilar_numerica
+            from app.calculo.integrales import calcular_integral
+            from app.calculo.jit import disponible
+            import app.calculo.servicio  # noqa: F401
+            import app.calculo.cuadraturas  # noqa: F401
+            import app.calculo.graficas  # noqa: F401
+
+        expresiones_validas = []
+        with _fase("parser"):
+            for texto in expresiones:
+                try:
+                    expresiones_validas.append((texto, sorted(obtener_expresion(texto).free_symbols, key=str)))
+                except Exception as e:
+                    log.warning("No se pudo precalentar la expresión %s: %s", texto, e)
+
+        with _fase("compilacion"):
+            for texto, variables in expresiones_validas:
+                compilar_numerica(texto, variables)
+
+        if calcular:
+            with _fase("cuadratura"):
+                disponible()
+                for tipo, expresion, limites in _INTEGRALES_PRUEBA:
+                    calcular_integral(tipo, expresion, limites)
+
+            with _fase("render"):
+                from app.calculo.render import renderizador
+                renderizador().precalentar()
+
+    duraciones["total"] = time.perf_counter() - inicio
+    return dict(duraciones)
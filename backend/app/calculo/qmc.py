@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+
+from app.calculo.adaptativa import RTOL, ATOL
+from app.calculo.integrales import valores_region
+
+# Cuasi-Monte Carlo aleatorizado (Sobol con scrambling de Owen).
+# QMC_REPLICAS secuencias independientes dan el error estándar. Cada réplica
+# empieza con QMC_PUNTOS_BLOQUE puntos y luego duplica los que lleva, para que
+# el total sea siempre potencia de 2 y se conserve el equilibrio de la secuencia.
+# QMC_MAX_MUESTRAS es el presupuesto por defecto (suma de todas las réplicas).
+QMC_REPLICAS = int(os.environ.get("QMC_REPLICAS", 8))
+QMC_PUNTOS_BLOQUE = int(os.environ.get("QMC_PUNTOS_BLOQUE", 1024))
+QMC_MAX_MUESTRAS = int(os.environ.get("QMC_MAX_MUESTRAS", 65536))
+
+
+def estimaciones_qmc(f, a, b, limites=(), rtol=RTOL, atol=ATOL, max_muestras=QMC_MAX_MUESTRAS, semilla=0,
+                     replicas=QMC_REPLICAS, puntos_bloque=QMC_PUNTOS_BLOQUE):
+    """
+    Generador con la estimación acumulada después de cada bloque de puntos:
+    dicts con valor, error_estimado (error estándar entre réplicas),
+    evaluaciones y convergio. Termina al alcanzar max(atol, rtol*|valor|)
+    o el presupuesto de muestras. Con la misma semilla da los mismos valores.
+    """
+    # scipy.stats tarda en importarse; solo lo necesita este método
+    from scipy.stats import qmc
+
+    dim = len(limites) + 1
+    puntos_bloque = 1 << max(int(puntos_bloque).bit_length() - 1, 0)
+    motores = [
+        qmc.Sobol(dim, scramble=True, seed=np.random.default_rng(s))
+        for s in np.random.SeedSequence(semilla).spawn(replicas)
+    ]
+    sumas = np.zeros(replicas)
+    n = 0
+    while True:
+        m = int(np.log2(max(puntos_bloque, n)))
+        u = np.concatenate([motor.random_base2(m) for motor in motores]).T
+        vals = valores_region(f, a, b, limites, u).reshape(replicas, 1 << m)
+        sumas += vals.sum(axis=1)
+        n += 1 << m
+        medias = sumas / n
+        valor = float(medias.mean())
+        error = float(medias.std(ddof=1) / np.sqrt(replicas))
+        evaluaciones = n * replicas
+        # Al menos dos bloques antes de confiar en el error estándar
+        convergio = bool(n > puntos_bloque and error <= max(atol, rtol * abs(valor)))
+        yield {"valor": valor, "error_estimado": error, "evaluaciones": evaluaciones, "convergio": convergio}
+        if convergio or not np.isfinite(valor) or 2 * evaluaciones > max_muestras:
+            return
+
+
+def integral_qmc(f, a, b, limites=(), rtol=RTOL, atol=ATOL, max_muestras=QMC_MAX_MUESTRAS, semilla=0):
+    """
+    Consume estimaciones_qmc y devuelve la última estimación.
+    """
+    resultado = None
+    for resultado in estimaciones_qmc(f, a, b, limites, rtol, atol, max_muestras, semilla):
+        pass
+    return resultado
@@ -0,0 +1,61 @@
+from functools import lru_cache
+
+import numpy as np
+
+# Tablas de nodos y pesos de las reglas de cuadratura, normalizadas a [0, 1]:
+#   ∫_a^b f(x) dx ≈ (b - a) * Σ w_i f(a + (b - a) t_i)
+# Se calculan una vez por orden y se guardan como arreglos de solo lectura,
+# porque todos los motores (simple, doble, triple, lotes y barridos) las comparten.
+
+
+def _solo_lectura(*arreglos):
+    for arr in arreglos:
+        arr.setflags(write=False)
+    return arreglos
+
+
+@lru_cache(maxsize=64)
+def regla_simpson(n):
+    """
+    Simpson compuesta con n subintervalos (n se redondea a par): n + 1 nodos equiespaciados.
+    """
+    if n % 2:
+        n += 1
+    t = np.linspace(0.0, 1.0, n + 1)
+    w = np.ones(n + 1)
+    w[1:-1:2] = 4.0
+    w[2:-1:2] = 2.0
+    return _solo_lectura(t, w / (3 * n))
+
+
+@lru_cache(maxsize=64)
+def regla_gauss_legendre(n):
+    """
+    Gauss–Legendre de n nodos: exacta para polinomios de grado 2n - 1 y con
+    convergencia exponencial para integrandos analíticos. No evalúa los extremos.
+    """
+    x, w = np.polynomial.legendre.leggauss(n)
+    return _solo_lectura((x + 1.0) / 2.0, w / 2.0)
+
+
+@lru_cache(maxsize=16)
+def regla_tanh_sinh(nivel):
+    """
+    Tanh-sinh (doble exponencial) con paso h = 2**-nivel. Los nodos se acumulan
+    hacia los extremos con pesos que decaen doble-exponencialmente, por eso
+    converge con singularidades integrables en los extremos (1/sqrt(x) en [0, 1]).
+    Los nodos son simétricos: 1 - t[k] == t[::-1][k] sin pérdida de precisión,
+    aunque t[k] se redondee a 1; así se pueden medir distancias al extremo
+    superior tan pequeñas como al inferior. Se descartan los nodos cuyo peso o
+    distancia a un extremo ya no se representa en doble precisión.
+    """
+    h = 2.0 ** -nivel
+    # Con |s| > 6.5 todos los nodos ya coinciden con un extremo en doble precisión
+    s = np.arange(-int(np.ceil(6.5 / h)), int(np.ceil(6.5 / h)) + 1) * h
+    u = (np.pi / 2) * np.sinh(s)
+    with np.errstate(over="ignore"):
+        # t = (1 + tanh(u)) / 2 escrito como logística para no perder precisión cerca de 0
+        t = 1.0 / (1.0 + np.exp(-2.0 * u))
+        w = h * (np.pi / 2) * np.cosh(s) / (2.0 * np.cosh(u) ** 2)
+    validos = (t > 0.0) & (t[::-1] > 0.0) & (w > 0.0) & (w[::-1] > 0.0)
+    return _solo_lectura(t[validos], w[validos])
@@ -0,0 +1,210 @@
+import io
+import os
+import threading
+import time
+
+import numpy as np
+
+# Renderizador persistente: cada proceso importa matplotlib una vez, crea una
+# figura por tipo de gráfica (ejes, etiquetas, barra de color) y en cada
+# gráfica solo cambia los datos y el título. Sin pyplot, sin tight_layout y
+# sin bbox_inches="tight", que obligan a dibujar dos veces.
+# GRAFICA_PRESET: tamaño y resolución (ver PRESETS_GRAFICA)
+# GRAFICA_FORMATO: formato de salida (ver FORMATOS_GRAFICA)
+PRESETS_GRAFICA = {
+    "rapida": {"tamano": (6.4, 4.0), "dpi": 72},
+    "estandar": {"tamano": (8.0, 5.0), "dpi": 110},
+    "alta": {"tamano": (10.0, 6.0), "dpi": 200},
+}
+FORMATOS_GRAFICA = {
+    "png": {"extension": "png", "mime": "image/png", "opciones": {}},
+    # Pillow prueba varias estrategias de compresión: más lento, archivos más pequeños
+    "png_optimizado": {"extension": "png", "mime": "image/png", "opciones": {"pil_kwargs": {"optimize": True}}},
+    "webp": {"extension": "webp", "mime": "image/webp", "opciones": {"pil_kwargs": {"quality": 85, "method": 4}}},
+    "svg": {"extension": "svg", "mime": "image/svg+xml", "opciones": {}},
+}
+GRAFICA_PRESET = os.environ.get("GRAFICA_PRESET", "estandar")
+GRAFICA_FORMATO = os.environ.get("GRAFICA_FORMATO", "png")
+
+
+def tipo_mime(ruta: str) -> str:
+    extension = os.path.splitext(ruta)[1].lstrip(".")
+    for formato in FORMATOS_GRAFICA.values():
+        if formato["extension"] == extension:
+            return formato["mime"]
+    return "application/octet-stream"
+
+
+class _Plantilla:
+    """
+    Figura reutilizable de un tipo de gráfica: los artistas fijos se crean una
+    vez y actualizar() reemplaza solo los datos.
+    """
+    def __init__(self, tipo, tamano, dpi):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib import cm
+        from matplotlib.colors import Normalize
+
+        self.tipo = tipo
+        self.fig = Figure(figsize=tamano, dpi=dpi)
+        FigureCanvasAgg(self.fig)
+        self._datos = None
+        if tipo in ("simple", "barrido"):
+            self.fig.subplots_adjust(left=0.1, right=0.96, bottom=0.12, top=0.88)
+            self.ax = self.fig.add_subplot(111)
+            estilo = 'b-o' if tipo == "barrido" else 'b-'
+            self.linea, = self.ax.plot([], [], estilo, linewidth=2, markersize=3)
+            self.ax.grid(True)
+            self.titulo = self.ax.set_title("", fontsize=16, pad=14)
+        else:
+            self.fig.subplots_adjust(left=0.0, right=0.92, bottom=0.04, top=0.9)
+            self.ax = self.fig.add_subplot(111, projection='3d')
+            self.ax.set_xlabel('x', fontsize=12, labelpad=8)
+            self.ax.set_ylabel('y', fontsize=12, labelpad=8)
+            self.ax.set_zlabel('z' if tipo == "doble" else r'$\int f\,dz$', fontsize=12, labelpad=8)
+            self.colores = cm.ScalarMappable(norm=Normalize(0.0, 1.0), cmap='plasma')
+            self.fig.colorbar(self.colores, ax=self.ax, shrink=0.7, aspect=15, pad=0.1)
+            self.titulo = self.fig.suptitle("", fontsize=14)
+
+    def actualizar(self, series, titulo, etiquetas=None):
+        if self._datos is not None:
+            self._datos.remove()
+            self._datos = None
+        self.titulo.set_text(titulo)
+        if self.tipo in ("simple", "barrido"):
+            x, y = series
+            self.linea.set_data(x, y)
+            if self.tipo == "simple":
+                self._datos = self.ax.fill_between(x, y, color="C0", alpha=0.3)
+            if etiquetas:
+                self.ax.set_xlabel(etiquetas[0], fontsize=12, labelpad=8)
+                self.ax.set_ylabel(etiquetas[1], fontsize=12, labelpad=8)
+            self.ax.relim()
+            self.ax.autoscale_view()
+            return
+        X, Y, Z = series
+        XX = np.broadcast_to(X, Y.shape)
+        z_min, z_max = float(np.nanmin(Z)), float(np.nanmax(Z))
+        if z_max <= z_min:
+            z_min, z_max = z_min - 0.5, z_max + 0.5
+        # Avisa a la barra de color del nuevo rango
+        self.colores.set_clim(z_min, z_max)
+        self._datos = self.ax.plot_surface(
+            XX, Y, Z, cmap=self.colores.cmap, norm=self.colores.norm, edgecolor='k', linewidth=0.5, antialiased=True
+        )
+        self.ax.set_xlim(float(np.min(X)), float(np.max(X)))
+        self.ax.set_ylim(float(np.nanmin(Y)), float(np.nanmax(Y)) + (0.0 if np.nanmax(Y) > np.nanmin(Y) else 1.0))
+        self.ax.set_zlim(z_min, z_max)
+
+
+class Renderizador:
+    """
+    Una plantilla por tipo de gráfica en cada proceso. Las figuras de matplotlib
+    no son seguras entre hilos, así que dibujar() se serializa con un lock.
+    """
+    def __init__(self, preset=GRAFICA_PRESET, formato=GRAFICA_FORMATO):
+        if preset not in PRESETS_GRAFICA:
+            raise ValueError(f"Preset de gráfica no soportado: {preset}")
+        if formato not in FORMATOS_GRAFICA:
+            raise ValueError(f"Formato de gráfica no soportado: {formato}")
+        self.preset = preset
+        self.formato = formato
+        self._plantillas = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ajustes(self):
+        # Forman parte de la clave de cada gráfica
+        return {"preset": self.preset, **PRESETS_GRAFICA[self.preset], "formato": self.formato}
+
+    @property
+    def extension(self):
+        return FORMATOS_GRAFICA[self.formato]["extension"]
+
+    def _plantilla(self, tipo):
+        if tipo not in self._plantillas:
+            ajustes = PRESETS_GRAFICA[self.preset]
+            self._plantillas[tipo] = _Plantilla(tipo, ajustes["tamano"], ajustes["dpi"])
+        return self._plantillas[tipo]
+
+    def dibujar(self, tipo, series, titulo, destino, etiquetas=None):
+        """
+        Dibuja las series de datos_grafica (o (x, y) para "barrido") en la
+        plantilla del tipo y la guarda en destino (ruta o archivo).
+        Devuelve la métrica de la gráfica: segundos de renderizado y bytes.
+        """
+        inicio = time.perf_counter()
+        with self._lock:
+            plantilla = self._plantilla(tipo)
+            plantilla.actualizar(series, titulo, etiquetas)
+            plantilla.fig.savefig(
+                destino, format=FORMATOS_GRAFICA[self.formato]["extension"],
+                dpi=PRESETS_GRAFICA[self.preset]["dpi"], **FORMATOS_GRAFICA[self.formato]["opciones"]
+            )
+        if isinstance(destino, (str, os.PathLike)):
+            tamano = os.path.getsize(destino)
+        else:
+            tamano = destino.tell()
+        return {"tipo": tipo, "preset": self.preset, "formato": self.formato,
+                "segundos": time.perf_counter() - inicio, "bytes": tamano}
+
+    def precalentar(self):
+        """
+        Crea todas las plantillas y dibuja cada una en memoria: importa el
+        backend, carga las fuentes y el parser de mathtext antes de la primera petición.
+        """
+        x = np.linspace(0.0, 1.0, 8)
+        malla = (x, np.tile(x[:, None], (1, 8)), np.outer(x, x))
+        for tipo, series in (("simple", (x, x)), ("barrido", (x, x)), ("doble", malla), ("triple", malla)):
+            self.dibujar(tipo, series, r'$f(x) = \sin{\left(x \right)}$', io.BytesIO(), ("k", "I(k)"))
+
+
+class MetricasRender:
+    """
+    Tiempo de renderizado y tamaño de salida de cada gráfica, agregados por
+    (tipo, preset, formato). Vive en el proceso principal: los workers
+    devuelven la métrica con la gráfica y el endpoint la registra aquí.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._grupos = {}
+
+    def registrar(self, metrica):
+        if not metrica:
+            return
+        clave = f"{metrica['tipo']}/{metrica['preset']}/{metrica['formato']}"
+        with self._lock:
+            g = self._grupos.setdefault(clave, {"graficas": 0, "segundos": 0.0, "segundos_max": 0.0, "bytes": 0})
+            g["graficas"] += 1
+            g["segundos"] += metrica["segundos"]
+            g["segundos_max"] = max(g["segundos_max"], metrica["segundos"])
+            g["bytes"] += metrica["bytes"]
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                clave: {
+                    "graficas": g["graficas"],
+                    "segundos_medio": g["segundos"] / g["graficas"],
+                    "segundos_max": g["segundos_max"],
+                    "bytes_medio": g["bytes"] / g["graficas"],
+                }
+                for clave, g in self._grupos.items()
+            }
+
+
+_renderizador = None
+_lock_renderizador = threading.Lock()
+
+
+def renderizador():
+    """Renderizador del proceso, creado en el primer uso."""
+    global _renderizador
+    with _lock_renderizador:
+        if _renderizador is None:
+            _renderizador = Renderizador()
+        return _renderizador
+
+
+metricas_render = MetricasRender()
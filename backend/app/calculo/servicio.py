@@ -0,0 +1,174 @@
+import logging
+import math
+
+import numpy as np
+import sympy as sp
+
+from app.calculo.integrales import (
+    calcular_integral, CalculoCancelado, parse_limit_string, get_limit_func, _evalua_limite,
+    simpson_simple_lote, simpson_doble_parametrico, simpson_triple_parametrico, N_SIMPLE, N_DOBLE, N_TRIPLE
+)
+from app.calculo.graficas import generar_grafica_barrido, generar_grafica_medida
+from app.calculo.cuadraturas import integrar_simple_lote, integrar_multiple_lote
+from app.calculo.adaptativa import RTOL, ATOL
+from app.calculo.singularidades import puntos_singulares, puede_ser_singular
+from app.utils.math_parser import obtener_expresion, compilar_numerica
+
+log = logging.getLogger(__name__)
+
+
+def resolver_integral(tipo: str, expresion: str, limites: dict, limites_grafica: dict, opciones: dict,
+                      graficar: bool = True):
+    """
+    Cálculo completo de una integral: cuadratura y, si el valor es finito y
+    graficar es True, la gráfica.
+    Es la unidad de trabajo que los endpoints envían al pool de procesos,
+    por eso solo recibe y devuelve datos serializables.
+    """
+    resultado = calcular_integral(tipo, expresion, limites, **opciones)
+    if "error" in resultado:
+        return resultado
+    valor = resultado.get("valor", None)
+    if valor is None or not math.isfinite(valor) or not graficar:
+        return resultado
+    try:
+        grafica, metrica = generar_grafica_medida(tipo, expresion, limites_grafica)
+    except Exception as e:
+        log.exception("Error al graficar %s", tipo)
+        grafica, metrica = "", None
+    resultado["grafica"] = grafica or None
+    if metrica is not None:
+        resultado["metricas_grafica"] = metrica
+    return resultado
+
+
+def resolver_progresivo(tipo: str, expresion: str, limites: dict, opciones: dict, cola, cancelado):
+    """
+    Cálculo sin gráfica que publica en cola cada estimación intermedia.
+    Entre refinamientos consulta cancelado (un Event) y, si está activo,
+    abandona el cálculo para liberar el worker.
+    """
+    def progreso(estimacion):
+        if cancelado.is_set():
+            raise CalculoCancelado()
+        cola.put(estimacion)
+
+    if cancelado.is_set():
+        return {"error": "Cálculo cancelado.", "cancelado": True}
+    return calcular_integral(tipo, expresion, limites, **opciones, progreso=progreso)
+
+
+def resolver_lote(tipo: str, expresion: str, lista_limites: list, opciones: dict):
+    """
+    Calcula varias integrales del mismo integrando (sin gráficas).
+    La expresión se parsea y compila una sola vez; en modo fijo (método auto
+    o simpson) y sin vía simbólica, las integrales se evalúan en una sola
+    pasada vectorizada: las simples todas juntas y las dobles y triples por
+    grupos con los mismos límites interiores, con los intervalos en x como
+    arreglos (como en resolver_barrido). Las que tienen puntos singulares o
+    no se resuelven en la pasada vectorizada se calculan una a una.
+    Devuelve un resultado por cada elemento de lista_limites, en el mismo orden.
+    """
+    metodo = opciones.get("metodo", "auto")
+    dim = {"simple": 1, "doble": 2, "triple": 3}.get(tipo)
+    if (dim is None or opciones.get("modo", "fijo") != "fijo" or opciones.get("simbolico")
+            or metodo not in ("auto", "simpson")):
+        return [calcular_integral(tipo, expresion, limites, **opciones) for limites in lista_limites]
+
+    resultados = [None] * len(lista_limites)
+    variables = sp.symbols("x y z")[:dim]
+    x = variables[0]
+    try:
+        f = compilar_numerica(expresion, variables)
+        expr = obtener_expresion(expresion) if puede_ser_singular(f) else None
+    except Exception as e:
+        return [{"error": f"Error interno al calcular la integral: {e}"}] * len(lista_limites)
+
+    # Límites interiores (c, d[, e, f]) -> (índices, a, b)
+    grupos = {}
+    for i, limites in enumerate(lista_limites):
+        try:
+            a = parse_limit_string(limites["a"])
+            b = parse_limit_string(limites["b"])
+            interiores = tuple(limites[k] for k in "cdef"[:2 * (dim - 1)])
+        except Exception as e:
+            resultados[i] = {"error": str(e)}
+            continue
+        if expr is not None and puntos_singulares(expr, x, a, b):
+            # Con puntos singulares va por tramos, fuera de la pasada vectorizada
+            resultados[i] = calcular_integral(tipo, expresion, limites, **opciones)
+            continue
+        indices, a_vals, b_vals = grupos.setdefault(interiores, ([], [], []))
+        indices.append(i)
+        a_vals.append(a)
+        b_vals.append(b)
+
+    rtol, atol = opciones.get("rtol", RTOL), opciones.get("atol", ATOL)
+    for interiores, (indices, a_vals, b_vals) in grupos.items():
+        if tipo == "simple":
+            valores, metodos = integrar_simple_lote(metodo, f, a_vals, b_vals, rtol, atol)
+        else:
+            try:
+                limites_interiores = [(get_limit_func(interiores[0], (x,)), get_limit_func(interiores[1], (x,)))]
+                if dim == 3:
+                    limites_interiores.append(
+                        (get_limit_func(interiores[2], variables[:2]), get_limit_func(interiores[3], variables[:2]))
+                    )
+                valores, metodos = integrar_multiple_lote(metodo, f, a_vals, b_vals, limites_interiores, rtol, atol)
+            except Exception:
+                log.exception("Falló la pasada vectorizada del lote %s de %s", tipo, expresion)
+                valores, metodos = [math.nan] * len(indices), [None] * len(indices)
+        for i, valor, usado in zip(indices, valores, metodos):
+            if usado is None:
+                resultados[i] = calcular_integral(tipo, expresion, lista_limites[i], **opciones)
+            elif math.isfinite(valor):
+                resultados[i] = {"valor": float(valor), "metodo": usado}
+            else:
+                resultados[i] = {"error": "La función tiene valores infinitos o indefinidos en el intervalo."}
+    return resultados
+
+
+def resolver_barrido(tipo: str, expresion: str, parametro: str, valores_parametro: list, limites: dict,
+                     graficar: bool = False):
+    """
+    Integra expresion para todos los valores del parámetro en una sola pasada:
+    la expresión y los límites se compilan una vez con el parámetro como
+    argumento extra y la cuadratura se evalúa sobre la malla (valores x nodos).
+    Los límites pueden depender del parámetro. Devuelve los resultados (None
+    donde no son finitos) y, si se pide, la curva resultado-parámetro.
+    """
+    x, y, z = sp.symbols('x y z')
+    k = sp.Symbol(parametro)
+    K = np.asarray(valores_parametro, dtype=float)
+    try:
+        a = _evalua_limite(get_limit_func(limites["a"], (k,)), K)
+        b = _evalua_limite(get_limit_func(limites["b"], (k,)), K)
+        if tipo == "simple":
+            f = compilar_numerica(expresion, (x, k))
+            valores = simpson_simple_lote(f, a, b, n=N_SIMPLE, params=(K,))
+        elif tipo == "doble":
+            f = compilar_numerica(expresion, (x, y, k))
+            valores = simpson_doble_parametrico(
+                f, a, b, get_limit_func(limites["c"], (x, k)), get_limit_func(limites["d"], (x, k)),
+                (K,), N_DOBLE, N_DOBLE
+            )
+        elif tipo == "triple":
+            f = compilar_numerica(expresion, (x, y, z, k))
+            valores = simpson_triple_parametrico(
+                f, a, b, get_limit_func(limites["c"], (x, k)), get_limit_func(limites["d"], (x, k)),
+                get_limit_func(limites["e"], (x, y, k)), get_limit_func(limites["f"], (x, y, k)),
+                (K,), N_TRIPLE, N_TRIPLE, N_TRIPLE
+            )
+        else:
+            return {"error": f"Tipo de integral no soportada: {tipo}"}
+    except Exception as e:
+        return {"error": f"Error interno al calcular el barrido: {e}"}
+
+    resultados = [float(v) if math.isfinite(v) else None for v in np.ravel(valores)]
+    respuesta = {"resultados": resultados}
+    if graficar:
+        grafica, metrica = generar_grafica_barrido(expresion, parametro, K.tolist(), resultados, tipo)
+        respuesta["grafica"] = grafica or None
+        if metrica is not None:
+            respuesta["metricas_grafica"] = metrica
+    return respuesta
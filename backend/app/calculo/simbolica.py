@@ -0,0 +1,128 @@
+import logging
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+import sympy as sp
+
+from app.utils.cache import CacheLRU
+
+log = logging.getLogger(__name__)
+
+# Vía simbólica: se intenta una primitiva exacta con SymPy antes de la cuadratura numérica.
+# SIMBOLICA_TIMEOUT: segundos máximos para integrar y evaluar la primitiva
+# SIMBOLICA_MAX_OPS: integrandos con más operaciones que esto van directo a la vía numérica
+SIMBOLICA_TIMEOUT = float(os.environ.get("SIMBOLICA_TIMEOUT", 2.0))
+SIMBOLICA_MAX_OPS = int(os.environ.get("SIMBOLICA_MAX_OPS", 60))
+SIMBOLICA_CACHE_TAMANO = int(os.environ.get("SIMBOLICA_CACHE_TAMANO", 512))
+# Discrepancia relativa máxima con la estimación numérica gruesa antes de descartar el resultado
+SIMBOLICA_TOLERANCIA = float(os.environ.get("SIMBOLICA_TOLERANCIA", 1e-3))
+
+# (integrando canónico, variable) -> primitiva, o _SIN_PRIMITIVA si SymPy no la encontró a tiempo
+_cache_primitivas = CacheLRU(SIMBOLICA_CACHE_TAMANO)
+_SIN_PRIMITIVA = "sin_primitiva"
+
+
+class SimbolicaAgotada(BaseException):
+    # Como TiempoAgotado: que los `except Exception` de SymPy y del cálculo no la absorban
+    pass
+
+
+@contextmanager
+def limite_tiempo(segundos):
+    """
+    Corta el bloque con SimbolicaAgotada al pasar `segundos`, con SIGALRM.
+    Respeta la alarma del ejecutor si ya hay una armada: al salir la vuelve a
+    programar con el tiempo que le quedaba, de modo que el tiempo máximo del
+    trabajo completo se sigue cumpliendo.
+    """
+    anterior = signal.getsignal(signal.SIGALRM)
+    restante, _ = signal.getitimer(signal.ITIMER_REAL)
+
+    def _alarma(signum, frame):
+        raise SimbolicaAgotada()
+
+    inicio = time.monotonic()
+    signal.signal(signal.SIGALRM, _alarma)
+    signal.setitimer(signal.ITIMER_REAL, min(segundos, restante) if restante else segundos)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, anterior)
+        if restante:
+            signal.setitimer(signal.ITIMER_REAL, max(restante - (time.monotonic() - inicio), 1e-3))
+
+
+def disponible():
+    # Sin alarma no hay forma segura de cortar SymPy: solo el hilo principal
+    # de un proceso (los workers del ejecutor) puede usar la vía simbólica
+    return (SIMBOLICA_TIMEOUT > 0 and hasattr(signal, "SIGALRM")
+            and threading.current_thread() is threading.main_thread())
+
+
+def primitiva(expr, variable):
+    """
+    Primitiva de expr respecto a variable, o None si SymPy no da una forma cerrada.
+    Se guarda por integrando canónico, incluidos los fallos, para no repetir
+    integraciones caras. Debe llamarse dentro de limite_tiempo.
+    """
+    clave = (sp.srepr(expr), str(variable))
+    guardada = _cache_primitivas.get(clave)
+    if guardada is not None:
+        return None if guardada is _SIN_PRIMITIVA else guardada
+    try:
+        F = sp.integrate(expr, variable)
+    except SimbolicaAgotada:
+        _cache_primitivas.set(clave, _SIN_PRIMITIVA)
+        raise
+    except Exception:
+        F = None
+    if F is None or F.has(sp.Integral):
+        _cache_primitivas.set(clave, _SIN_PRIMITIVA)
+        return None
+    _cache_primitivas.set(clave, F)
+    return F
+
+
+def integral_simbolica(expr, limites, timeout=SIMBOLICA_TIMEOUT):
+    """
+    Integral definida exacta por primitivas sucesivas.
+    limites: [(variable, inferior, superior), ...] de la más externa a la más
+    interna; los límites son expresiones SymPy de las variables externas.
+    Devuelve la expresión exacta del valor, o None si no hay forma cerrada,
+    se agota el tiempo o el valor no es finito.
+    """
+    if not disponible() or sp.count_ops(expr) > SIMBOLICA_MAX_OPS:
+        return None
+    try:
+        with limite_tiempo(timeout):
+            g = expr
+            for variable, inferior, superior in reversed(limites):
+                F = primitiva(g, variable)
+                if F is None:
+                    return None
+                g = F.subs(variable, superior) - F.subs(variable, inferior)
+            g = sp.simplify(g)
+            if g.free_symbols or g.has(sp.zoo, sp.oo, -sp.oo, sp.nan):
+                return None
+            valor = complex(g.evalf())
+    except SimbolicaAgotada:
+        log.info("La vía simbólica superó el tiempo máximo; se usa la cuadratura numérica.")
+        return None
+    except Exception as e:
+        log.info("No se pudo integrar simbólicamente: %s", e)
+        return None
+    if abs(valor.imag) > 1e-12 * max(abs(valor.real), 1.0) or valor.real != valor.real:
+        return None
+    return g
+
+
+def coincide(exacto: float, estimacion: float, tolerancia=SIMBOLICA_TOLERANCIA):
+    """
+    Compara el valor exacto con una estimación numérica gruesa. Detecta
+    primitivas con saltos (p. ej. ramas de atan) que darían un valor falso.
+    """
+    return abs(exacto - estimacion) <= tolerancia * max(abs(exacto), abs(estimacion), 1.0)
@@ -0,0 +1,149 @@
+import os
+
+import numpy as np
+import sympy as sp
+
+from app.utils.cache import CacheLRU
+from app.calculo.simbolica import SimbolicaAgotada, limite_tiempo, disponible
+
+# Análisis de singularidades: puntos de [a, b] donde el integrando puede no
+# estar definido o no ser acotado. La cuadratura corta el intervalo en ellos y
+# usa reglas que no evalúan los extremos en cada tramo.
+# SINGULARIDADES_TIMEOUT: segundos máximos para resolver cada ecuación con SymPy
+# SINGULARIDADES_MUESTRAS: puntos del muestreo con el que se buscan ceros si SymPy no los da
+SINGULARIDADES_TIMEOUT = float(os.environ.get("SINGULARIDADES_TIMEOUT", 1.0))
+SINGULARIDADES_MUESTRAS = int(os.environ.get("SINGULARIDADES_MUESTRAS", 4001))
+SINGULARIDADES_CACHE_TAMANO = int(os.environ.get("SINGULARIDADES_CACHE_TAMANO", 512))
+
+# (integrando canónico, variable) -> [(expresión crítica, función NumPy)]
+_cache_criticas = CacheLRU(SINGULARIDADES_CACHE_TAMANO)
+# (integrando canónico, variable, a, b) -> puntos singulares
+_cache_puntos = CacheLRU(SINGULARIDADES_CACHE_TAMANO)
+
+
+def _criticas_sin_cache(expr, variable):
+    criticas = set()
+    for sub in sp.preorder_traversal(expr):
+        if sub.is_Pow:
+            base, exponente = sub.args
+            # Denominadores (1/g) y raíces o potencias fraccionarias (dominio g >= 0)
+            if exponente.is_negative or (exponente.is_Rational and not exponente.is_integer):
+                criticas.add(base)
+        elif isinstance(sub, (sp.tan, sp.sec)):
+            criticas.add(sp.cos(sub.args[0]))
+        elif isinstance(sub, (sp.cot, sp.csc)):
+            criticas.add(sp.sin(sub.args[0]))
+        elif isinstance(sub, sp.log):
+            criticas.add(sub.args[0])
+        elif isinstance(sub, (sp.asin, sp.acos)):
+            criticas.update((sub.args[0] - 1, sub.args[0] + 1))
+    return [
+        (g, sp.lambdify(variable, g, modules=["numpy"]))
+        for g in sorted(criticas, key=sp.default_sort_key)
+        if g.free_symbols == {variable}
+    ]
+
+
+def expresiones_criticas(expr, variable):
+    """
+    Subexpresiones de una sola variable cuyos ceros son puntos singulares:
+    denominadores, cos en tan/sec, sin en cot/csc, argumentos de log y de
+    potencias fraccionarias (sqrt) y arg ± 1 en asin/acos. Las que dependen de
+    otras variables se ignoran. Se guardan por integrando.
+    """
+    clave = (sp.srepr(expr), str(variable))
+    return _cache_criticas.obtener_o_calcular(clave, lambda: _criticas_sin_cache(expr, variable))
+
+
+def _ceros_simbolicos(g, variable, a, b):
+    if not disponible():
+        return None
+    try:
+        with limite_tiempo(SINGULARIDADES_TIMEOUT):
+            soluciones = sp.solveset(g, variable, sp.Interval(a, b))
+            if not isinstance(soluciones, sp.FiniteSet):
+                return None
+            return [float(s) for s in soluciones if s.is_real]
+    except SimbolicaAgotada:
+        return None
+    except Exception:
+        return None
+
+
+def _ceros_numericos(g, a, b):
+    # Cambios de signo y ceros exactos en un muestreo, refinados con brentq
+    # (scipy.optimize se importa aquí: pocas expresiones llegan a necesitarlo)
+    from scipy.optimize import brentq
+
+    t = np.linspace(a, b, SINGULARIDADES_MUESTRAS)
+    with np.errstate(all="ignore"):
+        v = np.broadcast_to(np.asarray(g(t), dtype=complex), t.shape)
+    v = np.where(np.abs(v.imag) <= 1e-12 * np.maximum(np.abs(v.real), 1.0), v.real, np.nan)
+    ceros = list(t[v == 0.0])
+    escala = np.nanmax(np.abs(v)) if np.any(np.isfinite(v)) else 1.0
+    for i in np.nonzero(np.sign(v[:-1]) * np.sign(v[1:]) < 0)[0]:
+        try:
+            raiz = brentq(lambda s: float(np.real(g(s))), t[i], t[i + 1])
+        except Exception:
+            continue
+        # Un cambio de signo a través de un polo de g no es un cero
+        if abs(float(np.real(g(raiz)))) <= 1e-8 * max(escala, 1.0):
+            ceros.append(raiz)
+    return ceros
+
+
+def _puntos_sin_cache(expr, variable, a, b):
+    puntos = []
+    for g, g_num in expresiones_criticas(expr, variable):
+        ceros = _ceros_simbolicos(g, variable, a, b)
+        if ceros is None:
+            ceros = _ceros_numericos(g_num, a, b)
+        puntos.extend(c for c in ceros if a <= c <= b)
+    puntos.sort()
+    unicos = []
+    separacion = 1e-12 * max(abs(a), abs(b), 1.0)
+    for p in puntos:
+        if not unicos or p - unicos[-1] > separacion:
+            unicos.append(p)
+    return unicos
+
+
+def puntos_singulares(expr, variable, a, b):
+    """
+    Puntos de [min(a, b), max(a, b)] (extremos incluidos) donde expr puede ser
+    singular o dejar de estar definida como función de `variable`, ordenados.
+    Primero intenta resolver cada ecuación con SymPy con tiempo acotado; si no,
+    busca los ceros numéricamente.
+    """
+    a, b = sorted((float(a), float(b)))
+    clave = (sp.srepr(expr), str(variable), repr(a), repr(b))
+    return list(_cache_puntos.obtener_o_calcular(clave, lambda: _puntos_sin_cache(expr, variable, a, b)))
+
+
+_FUNCIONES_SINGULARES = {"log", "sqrt", "tan", "sec", "cot", "csc", "asin", "acos"}
+
+
+def _nodo_singular(nodo):
+    tipo = nodo[0]
+    if tipo in ("num", "var"):
+        return False
+    if tipo == "neg":
+        return _nodo_singular(nodo[1])
+    if tipo == "fun":
+        return nodo[1] in _FUNCIONES_SINGULARES or _nodo_singular(nodo[2])
+    operador, a, b = nodo[1:]
+    if operador == "/" and b[0] != "num":
+        return True
+    if operador == "**" and not (b[0] == "num" and b[1] >= 0 and float(b[1]).is_integer()):
+        return True
+    return _nodo_singular(a) or _nodo_singular(b)
+
+
+def puede_ser_singular(f):
+    """
+    Descarta sin SymPy los integrandos del compilador restringido sin divisiones,
+    potencias negativas o fraccionarias ni funciones con polos o dominio
+    restringido. Si f no trae su árbol, hay que hacer el análisis completo.
+    """
+    nodo = getattr(f, "nodo", None)
+    return True if nodo is None else _nodo_singular(nodo)
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from app.calculo.render import metricas_render
+from app.utils.ejecutor import ejecutor, EjecutorSaturado, TiempoAgotado
+from app.utils.vuelo_unico import vuelo_unico
+
+log = logging.getLogger(__name__)
+
+# Número máximo de trabajos de gráfica recordados (los más antiguos se olvidan)
+GRAFICAS_TRABAJOS_MAX = int(os.environ.get("GRAFICAS_TRABAJOS_MAX", 2000))
+
+PENDIENTE = "pendiente"
+LISTA = "lista"
+ERROR = "error"
+
+
+async def renderizar_grafica(tipo: str, expresion: str, limites_grafica: dict, clave: str = None):
+    """
+    Renderiza la gráfica en el pool y registra su métrica; devuelve la ruta.
+    Con clave, las peticiones que piden la misma gráfica mientras se renderiza
+    esperan ese renderizado en lugar de escribir otra vez el mismo archivo.
+    """
+    # Import local: graficas carga SymPy, que el proceso principal importa al precalentar
+    from app.calculo.graficas import generar_grafica_medida
+
+    async def renderizar():
+        ruta, metrica = await ejecutor.ejecutar(generar_grafica_medida, tipo, expresion, limites_grafica)
+        metricas_render.registrar(metrica)
+        return ruta
+
+    if clave is None:
+        return await renderizar()
+    return await vuelo_unico.ejecutar(clave, renderizar)
+
+
+class TrabajosGraficas:
+    """
+    Registro de gráficas que se renderizan en segundo plano en el pool de procesos.
+    Cada trabajo tiene un id que el cliente consulta en GET /graficas/{id}.
+    """
+    def __init__(self, max_trabajos=GRAFICAS_TRABAJOS_MAX):
+        self.max_trabajos = max_trabajos
+        self._trabajos = OrderedDict()
+        self._lock = threading.Lock()
+        self._tareas = set()
+
+    def crear(self, tipo: str, expresion: str, limites_grafica: dict, al_terminar=None, clave: str = None) -> str:
+        """
+        Registra el trabajo y lanza el renderizado sin esperar a que termine.
+        al_terminar(ruta) se llama cuando la gráfica queda lista.
+        Los trabajos con la misma clave comparten el renderizado (ver renderizar_grafica).
+        Debe llamarse desde el event loop.
+        """
+        id_trabajo = uuid.uuid4().hex
+        with self._lock:
+            self._trabajos[id_trabajo] = {"estado": PENDIENTE, "ruta": None, "error": None, "creado": time.time()}
+            while len(self._trabajos) > self.max_trabajos:
+                self._trabajos.popitem(last=False)
+        tarea = asyncio.get_running_loop().create_task(
+            self._renderizar(id_trabajo, tipo, expresion, limites_grafica, al_terminar, clave)
+        )
+        # Se guarda una referencia para que la tarea no sea recolectada antes de terminar
+        self._tareas.add(tarea)
+        tarea.add_done_callback(self._tareas.discard)
+        return id_trabajo
+
+    def _actualizar(self, id_trabajo, **cambios):
+        with self._lock:
+            trabajo = self._trabajos.get(id_trabajo)
+            if trabajo is not None:
+                trabajo.update(cambios)
+
+    async def _renderizar(self, id_trabajo, tipo, expresion, limites_grafica, al_terminar, clave):
+        try:
+            ruta = await renderizar_grafica(tipo, expresion, limites_grafica, clave)
+        except (EjecutorSaturado, TiempoAgotado) as e:
+            self._actualizar(id_trabajo, estado=ERROR, error=str(e))
+            return
+        except Exception as e:
+            log.exception("Error al graficar en segundo plano")
+            self._actualizar(id_trabajo, estado=ERROR, error=f"No se pudo graficar: {e}")
+            return
+        if not ruta:
+            self._actualizar(id_trabajo, estado=ERROR, error="No se pudo graficar la función en el rango dado.")
+            return
+        self._actualizar(id_trabajo, estado=LISTA, ruta=ruta)
+        if al_terminar is not None:
+            al_terminar(ruta)
+
+    def obtener(self, id_trabajo):
+        with self._lock:
+            trabajo = self._trabajos.get(id_trabajo)
+            return dict(trabajo) if trabajo is not None else None
+
+    def estadisticas(self):
+        with self._lock:
+            estados = [t["estado"] for t in self._trabajos.values()]
+        return {e: estados.count(e) for e in (PENDIENTE, LISTA, ERROR)}
+
+
+trabajos_graficas = TrabajosGraficas()
@@ -1,15 +1,86 @@
+import time
+# Duración de la importación de este módulo, que se informa en /salud
+_inicio_importacion = time.perf_counter()
+
 import os
 import math
-from fastapi import FastAPI
+import json
+import asyncio
+import logging
+import numpy as np
+import queue
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
 from pydantic import BaseModel
 
-from app.calculo.integrales import calcular_integral, parse_limit_string
-from app.calculo.graficas import generar_grafica
-from app.utils.math_parser import validar_expr_con_variables, parse_math_expr, preprocess_math_expr
+# Los módulos que cargan SymPy (parser, integrales, servicio, gráficas) se
+# importan dentro de las funciones que los usan: el proceso arranca y responde
+# /salud sin cargarlos, y el precalentado los importa antes de declararse listo.
+from app.calculo.adaptativa import RTOL, ATOL, MAX_EVAL
+from app.calculo.cache_resultados import cache_resultados, clave_integral
+from app.calculo.render import metricas_render, tipo_mime
+from app.calculo.trabajos_graficas import trabajos_graficas, renderizar_grafica, PENDIENTE, ERROR
+from app.utils.ejecutor import ejecutor, EjecutorSaturado, TiempoAgotado, PRECALENTAR_EXPRESIONES
+from app.utils.almacen_graficas import barredor
+from app.utils import bitacora
+from app.utils.metricas import registro, etapa, observar
+from app.utils.vuelo_unico import vuelo_unico
+from app.utils.captura_trafico import CapturaTrafico, EscritorCaptura, campos_modelo, CAPTURA_TRAFICO
+from typing import Optional
+
+bitacora.configurar()
+log = logging.getLogger(__name__)
+
+# PRECALENTAR_ESPERAR=1: el servidor no acepta conexiones hasta terminar el
+# precalentado. Por defecto precalienta en segundo plano y /salud/listo
+# responde 503 mientras tanto.
+PRECALENTAR_ESPERAR = os.environ.get("PRECALENTAR_ESPERAR", "0") != "0"
+
+# Duraciones del arranque en segundos y si el proceso ya está listo
+estado_arranque = {"listo": False, "importacion": None, "precalentado": {}, "workers": {}, "total": None}
+
+async def precalentar_servicio():
+    """
+    Precalienta este proceso (importaciones y parser; sin pool, también las
+    cuadraturas y el renderizador) mientras el pool arranca sus workers, que
+    se precalientan en su inicializador. Al terminar marca el servicio listo.
+    """
+    from app.calculo.precalentado import precalentar
+    try:
+        # En un hilo: el event loop sigue respondiendo /salud mientras tanto
+        segundos, workers = await asyncio.gather(
+            asyncio.to_thread(precalentar, PRECALENTAR_EXPRESIONES, ejecutor.procesos <= 0),
+            ejecutor.arrancar(),
+        )
+        estado_arranque["precalentado"] = segundos
+        estado_arranque["workers"] = {str(pid): s for pid, s in workers.items()}
+    except Exception:
+        log.exception("Falló el precalentado; el servicio arranca sin él")
+    estado_arranque["total"] = time.perf_counter() - _inicio_importacion
+    estado_arranque["listo"] = True
+    log.info("Servicio listo en %.2f s: importación %.2f s, precalentado %.2f s, %d workers",
+             estado_arranque["total"], estado_arranque["importacion"],
+             estado_arranque["precalentado"].get("total", 0.0), len(estado_arranque["workers"]),
+             extra={"muestrear": False})
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    barredor.iniciar()
+    precalentado = asyncio.ensure_future(precalentar_servicio())
+    if PRECALENTAR_ESPERAR:
+        await precalentado
+    try:
+        yield
+    finally:
+        precalentado.cancel()
+        barredor.detener()
+        ejecutor.apagar()
+        if captura is not None:
+            captura.detener()
 
-app = FastAPI()
+app = FastAPI(lifespan=ciclo_de_vida)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,22 +90,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def medir_peticion(request: Request, call_next):
+    # Latencia hasta que la respuesta está lista (en los streams, hasta las cabeceras).
+    # La ruta es la plantilla (/graficas/{id_trabajo}), no la URL, para no crear una serie por id
+    inicio = time.perf_counter()
+    estado = 500
+    try:
+        respuesta = await call_next(request)
+        estado = respuesta.status_code
+        return respuesta
+    finally:
+        ruta = getattr(request.scope.get("route"), "path", "sin_ruta")
+        observar("integrales_http_segundos", time.perf_counter() - inicio, ruta=ruta, estado=estado)
+
 if not os.path.exists("static"):
     os.makedirs("static")
 
-class SimpleIntegralRequest(BaseModel):
+class OpcionesCalculo(BaseModel):
+    # "fijo": la cuadratura de metodo con resolución fija (con "auto", Gauss–Legendre si
+    # converge y, si no, Simpson, QMC o tanh-sinh); "adaptativo": Gauss–Kronrod con control de error
+    modo: str = "fijo"
+    rtol: float = RTOL
+    atol: float = ATOL
+    max_eval: int = MAX_EVAL
+    # "sincrona": la gráfica viene en la respuesta; "asincrona": se devuelve
+    # grafica_id y la imagen se pide luego en /graficas/{id}; "datos": en lugar de
+    # la imagen viene grafica_datos (mallas float32 para dibujar en el cliente);
+    # "ninguna": sin gráfica
+    modo_grafica: str = "sincrona"
+    # Cuadratura: "auto" o uno de app.calculo.cuadraturas.METODOS
+    # (simpson, gauss_legendre, gauss_kronrod, tanh_sinh, monte_carlo, qmc)
+    metodo: str = "auto"
+    # Semilla de los métodos aleatorios (monte_carlo, qmc): misma semilla, mismo resultado
+    semilla: int = 0
+    # Intenta antes una primitiva exacta con SymPy; si no hay forma cerrada a tiempo, vía numérica
+    simbolico: bool = False
+
+class SimpleIntegralRequest(OpcionesCalculo):
     expresion: str
     limite_inf: str
     limite_sup: str
 
-class DobleIntegralRequest(BaseModel):
+class DobleIntegralRequest(OpcionesCalculo):
     expresion: str
     x_inf: str
     x_sup: str
     y_inf: str
     y_sup: str
 
-class TripleIntegralRequest(BaseModel):
+class TripleIntegralRequest(OpcionesCalculo):
     expresion: str
     x_inf: str
     x_sup: str
@@ -43,170 +148,749 @@ class TripleIntegralRequest(BaseModel):
     z_inf: str
     z_sup: str
 
+# Captura opcional del tráfico real para benchmarks.carga (ver utils.captura_trafico)
+captura = EscritorCaptura(CAPTURA_TRAFICO) if CAPTURA_TRAFICO else None
+if captura is not None:
+    app.add_middleware(CapturaTrafico, escritor=captura, campos={
+        "/simple": campos_modelo(SimpleIntegralRequest),
+        "/doble": campos_modelo(DobleIntegralRequest),
+        "/triple": campos_modelo(TripleIntegralRequest),
+    })
+
 def parse_limite(valor):
+    from app.utils.math_parser import parse_math_expr, normalizar_numerica
     # Intenta convertir a float, si no se puede, es una expresión de variable
     try:
         return float(valor)
     except Exception:
-        # Preprocesa cualquier string de función antes de parsear
+        # Texto canónico del compilador restringido; SymPy solo si este no la acepta
+        texto = normalizar_numerica(valor, ("x", "y"))
+        if isinstance(texto, str):
+            return texto
         return str(parse_math_expr(valor))
 
-@app.post("/simple")
-def integral_simple(req: SimpleIntegralRequest):
-    try:
-        a = parse_limit_string(req.limite_inf)
-        b = parse_limit_string(req.limite_sup)
-        if a == b:
-            return JSONResponse(status_code=400, content={"detail": "Los límites superior e inferior de integración son iguales."})
-        if a > b:
-            return JSONResponse(status_code=400, content={"detail": "El límite inferior es mayor que el superior. Por favor invierte los límites."})
+def opciones_calculo(req: OpcionesCalculo):
+    return {"modo": req.modo, "rtol": req.rtol, "atol": req.atol, "max_eval": req.max_eval,
+            "simbolico": req.simbolico, "metodo": req.metodo, "semilla": req.semilla}
 
-        try:
-            # Preprocesamiento explícito aquí también
-            expr = validar_expr_con_variables(preprocess_math_expr(req.expresion), {"x"})
-        except Exception as e:
-            return JSONResponse(status_code=400, content={"detail": f"Error en la expresión ingresada. Revisa paréntesis y sintaxis. Detalle: {e}"})
+def info_cuadratura(resultado: dict):
+    # Datos de control de error del modo adaptativo, valor exacto de la vía simbólica
+    # (o aviso de que no estaba disponible) y puntos donde se cortó el intervalo por singularidades
+    claves = ("error_estimado", "evaluaciones", "convergio", "exacto", "latex", "simbolico", "metodo",
+              "puntos_singulares")
+    return {k: resultado[k] for k in claves if k in resultado}
+
+async def resolver(tipo: str, expr, limites: dict, limites_grafica: dict, opciones: dict, clave: str,
+                   modo_grafica: str = "sincrona"):
+    """
+    Parte común de /simple, /doble y /triple una vez validada la entrada:
+    consulta la caché de resultados, envía el cálculo al pool de procesos
+    y traduce los errores a respuestas HTTP. La gráfica se genera según modo_grafica.
+    Cada paso (cálculo, gráfica, mallas) pasa por vuelo_unico con la clave
+    canónica: las peticiones idénticas simultáneas comparten un solo trabajo.
+    """
+    from app.calculo.servicio import resolver_integral
+    from app.calculo.graficas import datos_grafica_compactos
+    if modo_grafica not in ("sincrona", "asincrona", "datos", "ninguna"):
+        return JSONResponse(status_code=400, content={"detail": f"Modo de gráfica no soportado: {modo_grafica}"})
+    graficar = modo_grafica == "sincrona"
 
-        limites = {
-            "a": req.limite_inf,
-            "b": req.limite_sup
-        }
-        resultado = calcular_integral("simple", str(expr), limites)
+    async def calcular():
+        resultado = await ejecutor.ejecutar(
+            resolver_integral, tipo, str(expr), limites, limites_grafica, opciones, graficar
+        )
         if "error" in resultado:
-            print("Error en el cálculo simple:", resultado["error"])
-            return JSONResponse(status_code=400, content={"detail": f"Error en la expresión: {resultado['error']}"})
+            log.info("Error en el cálculo %s: %s", tipo, resultado["error"])
+            raise EntradaInvalida(f"Error en la expresión: {resultado['error']}")
         valor = resultado.get("valor", None)
         if valor is not None and not math.isfinite(valor):
-            return JSONResponse(status_code=400, content={
-                "detail": "El resultado de la integral es infinito o indefinido. Cambia los límites o la función."
-            })
-        try:
-            limites_grafica = {
-                "a": float(a),
-                "b": float(b)
-            }
-            grafica = generar_grafica("simple", str(expr), limites_grafica)
-        except Exception as e:
-            print("Error al graficar:", e)
-            grafica = ""
-        if isinstance(grafica, str) and (grafica.endswith(".png") or grafica.startswith("http")):
-            grafica_out = grafica
-        else:
-            grafica_out = None
-        return {"valor": valor, "grafica": grafica_out}
+            raise EntradaInvalida("El resultado de la integral es infinito o indefinido. Cambia los límites o la función.")
+        metricas_render.registrar(resultado.get("metricas_grafica"))
+        guardado = {"valor": valor, **info_cuadratura(resultado)}
+        if "grafica" in resultado:
+            guardado["grafica"] = resultado["grafica"]
+        # Se espera a que esté en disco (sin bloquear el loop): al soltar el
+        # cerrojo de vuelo_unico, los otros procesos ya la encuentran
+        await asyncio.wrap_future(cache_resultados.set(clave, guardado))
+        return guardado
+
+    def consultar():
+        # Tras esperar a otro proceso: su resultado, si ya está en la caché compartida
+        guardado = cache_resultados.get(clave)
+        if guardado is None or (graficar and "grafica" not in guardado):
+            return None
+        return guardado
+
+    # La entrada en caché tiene la clave "grafica" solo si ya se intentó graficar
+    guardado = cache_resultados.get(clave)
+    try:
+        if guardado is None:
+            guardado = dict(await vuelo_unico.ejecutar(f"{clave}:con_grafica" if graficar else clave, calcular, consultar))
+
+        respuesta = {"grafica": None, **guardado}
+        respuesta.pop("grafica_datos", None)
+        if modo_grafica == "ninguna":
+            respuesta["grafica"] = None
+            return respuesta
+        if modo_grafica == "datos":
+            # Sin matplotlib: solo las mallas, que el cliente dibuja
+            respuesta["grafica"] = None
+            if "grafica_datos" not in guardado:
+                async def mallas():
+                    datos = await ejecutor.ejecutar(datos_grafica_compactos, tipo, str(expr), limites_grafica)
+                    cache_resultados.set(clave, {**guardado, "grafica_datos": datos})
+                    return datos
+                guardado["grafica_datos"] = await vuelo_unico.ejecutar(
+                    f"{clave}:datos", mallas, lambda: (cache_resultados.get(clave) or {}).get("grafica_datos")
+                )
+            respuesta["grafica_datos"] = guardado["grafica_datos"]
+            return respuesta
+        if "grafica" in guardado:
+            return respuesta
+
+        # La misma clave de renderizado en los modos síncrono y asíncrono: comparten el trabajo
+        clave_render = f"{clave}:render"
+        if modo_grafica == "sincrona":
+            ruta = await renderizar_grafica(tipo, str(expr), limites_grafica, clave_render)
+            guardado["grafica"] = respuesta["grafica"] = ruta or None
+            cache_resultados.set(clave, guardado)
+            return respuesta
+
+        def al_terminar(ruta):
+            cache_resultados.set(clave, {**guardado, "grafica": ruta})
+
+        id_trabajo = trabajos_graficas.crear(tipo, str(expr), limites_grafica, al_terminar, clave_render)
+        respuesta["grafica_id"] = id_trabajo
+        respuesta["grafica_url"] = f"/graficas/{id_trabajo}"
+        return respuesta
+    except EjecutorSaturado as e:
+        return JSONResponse(status_code=503, content={"detail": str(e)}, headers={"Retry-After": str(e.retry_after)})
+    except TiempoAgotado as e:
+        return JSONResponse(status_code=504, content={"detail": f"{e} Prueba con límites más pequeños o con modo adaptativo."})
+    except EntradaInvalida as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+
+class EntradaInvalida(Exception):
+    """Error de validación de la entrada; su mensaje se devuelve tal cual con un 400."""
+
+def _limites_x(inf, sup, variable=None):
+    from app.calculo.integrales import parse_limit_string
+    a = parse_limit_string(inf)
+    b = parse_limit_string(sup)
+    if a == b:
+        para = f" para {variable}" if variable else ""
+        raise EntradaInvalida(f"Los límites superior e inferior de integración{para} son iguales.")
+    if a > b:
+        de = f" de {variable}" if variable else ""
+        raise EntradaInvalida(f"El límite inferior{de} es mayor que el superior. Por favor invierte los límites.")
+    return a, b
+
+def preparar_simple(req: SimpleIntegralRequest):
+    """
+    Valida una integral simple y devuelve (expr, limites, limites_grafica, limites_clave).
+    Lanza EntradaInvalida con el mensaje para el usuario.
+    """
+    from app.utils.math_parser import validar_expr_con_variables
+    a, b = _limites_x(req.limite_inf, req.limite_sup)
+    try:
+        expr = validar_expr_con_variables(req.expresion, {"x"})
+    except Exception as e:
+        raise EntradaInvalida(f"Error en la expresión ingresada. Revisa paréntesis y sintaxis. Detalle: {e}")
+    limites = {
+        "a": req.limite_inf,
+        "b": req.limite_sup
+    }
+    limites_grafica = {
+        "a": float(a),
+        "b": float(b)
+    }
+    return expr, limites, limites_grafica, {"a": a, "b": b}
+
+def preparar_doble(req: DobleIntegralRequest):
+    from app.utils.math_parser import validar_expr_con_variables
+    a, b = _limites_x(req.x_inf, req.x_sup, "x")
+    try:
+        expr = validar_expr_con_variables(req.expresion, {"x", "y"})
+        y_inf_expr = parse_limite(req.y_inf)
+        y_sup_expr = parse_limite(req.y_sup)
+    except Exception as e:
+        raise EntradaInvalida(f"Error en la expresión ingresada o en los límites de y. Revisa paréntesis y sintaxis. Detalle: {e}")
+    limites = {
+        "a": req.x_inf,
+        "b": req.x_sup,
+        "c": y_inf_expr,
+        "d": y_sup_expr
+    }
+    limites_grafica = {
+        "a": float(a),
+        "b": float(b),
+        "c": y_inf_expr,
+        "d": y_sup_expr
+    }
+    return expr, limites, limites_grafica, {"a": a, "b": b, "c": y_inf_expr, "d": y_sup_expr}
+
+def preparar_triple(req: TripleIntegralRequest):
+    from app.utils.math_parser import validar_expr_con_variables
+    a, b = _limites_x(req.x_inf, req.x_sup, "x")
+    try:
+        expr = validar_expr_con_variables(req.expresion, {"x", "y", "z"})
+        y_inf_expr = parse_limite(req.y_inf)
+        y_sup_expr = parse_limite(req.y_sup)
+        z_inf_expr = parse_limite(req.z_inf)
+        z_sup_expr = parse_limite(req.z_sup)
+    except Exception as e:
+        raise EntradaInvalida(f"Error en la expresión ingresada o en los límites de y/z. Revisa paréntesis y sintaxis. Detalle: {e}")
+    limites = {
+        "a": req.x_inf,
+        "b": req.x_sup,
+        "c": y_inf_expr,
+        "d": y_sup_expr,
+        "e": z_inf_expr,
+        "f": z_sup_expr
+    }
+    limites_grafica = {
+        "a": float(a),
+        "b": float(b),
+        "c": y_inf_expr,
+        "d": y_sup_expr,
+        "e": z_inf_expr,
+        "f": z_sup_expr
+    }
+    limites_clave = {"a": a, "b": b, "c": y_inf_expr, "d": y_sup_expr, "e": z_inf_expr, "f": z_sup_expr}
+    return expr, limites, limites_grafica, limites_clave
+
+MODELOS = {"simple": SimpleIntegralRequest, "doble": DobleIntegralRequest, "triple": TripleIntegralRequest}
+PREPARADORES = {"simple": preparar_simple, "doble": preparar_doble, "triple": preparar_triple}
+
+async def endpoint_integral(tipo: str, req: OpcionesCalculo):
+    try:
+        with etapa("validacion", tipo=tipo):
+            expr, limites, limites_grafica, limites_clave = PREPARADORES[tipo](req)
+        opciones = opciones_calculo(req)
+        clave = clave_integral(tipo, expr, limites_clave, opciones)
+        return await resolver(tipo, expr, limites, limites_grafica, opciones, clave, req.modo_grafica)
+    except EntradaInvalida as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
     except Exception as e:
-        print("Error en el endpoint simple:", e)
+        log.exception("Error inesperado en el endpoint %s", tipo)
         return JSONResponse(status_code=400, content={"detail": f"Error inesperado: {e}"})
 
+@app.post("/simple")
+async def integral_simple(req: SimpleIntegralRequest):
+    return await endpoint_integral("simple", req)
+
 @app.post("/doble")
-def integral_doble(req: DobleIntegralRequest):
+async def integral_doble(req: DobleIntegralRequest):
+    return await endpoint_integral("doble", req)
+
+@app.post("/triple")
+async def integral_triple(req: TripleIntegralRequest):
+    return await endpoint_integral("triple", req)
+
+# ==== Progreso en vivo (SSE y WebSocket) ====
+# Cada mensaje es ("progreso" | "resultado" | "error", datos). Si el cliente
+# se desconecta o cancela, se activa la bandera de cancelación y el worker
+# abandona el cálculo en el siguiente refinamiento.
+
+async def _eventos_integral(tipo: str, req: OpcionesCalculo, cancelado=None):
+    from app.calculo.servicio import resolver_progresivo
     try:
-        a = parse_limit_string(req.x_inf)
-        b = parse_limit_string(req.x_sup)
-        if a == b:
-            return JSONResponse(status_code=400, content={"detail": "Los límites superior e inferior de integración para x son iguales."})
-        if a > b:
-            return JSONResponse(status_code=400, content={"detail": "El límite inferior de x es mayor que el superior. Por favor invierte los límites."})
+        expr, limites, _, limites_clave = PREPARADORES[tipo](req)
+    except EntradaInvalida as e:
+        yield "error", {"detail": str(e)}
+        return
+    opciones = opciones_calculo(req)
+    guardado = cache_resultados.get(clave_integral(tipo, expr, limites_clave, opciones))
+    if guardado is not None:
+        yield "resultado", {k: v for k, v in guardado.items() if k != "grafica"}
+        return
 
+    cola, bandera = ejecutor.canal()
+    tarea = asyncio.ensure_future(
+        ejecutor.ejecutar(resolver_progresivo, tipo, str(expr), limites, opciones, cola, bandera)
+    )
+    try:
+        while True:
+            terminado = tarea.done()
+            try:
+                # Espera corta en un hilo: la cola puede ser un proxy de Manager (bloqueante)
+                estimacion = await asyncio.to_thread(cola.get, True, 0.1)
+            except queue.Empty:
+                if terminado:
+                    break
+                if cancelado is not None and cancelado.is_set():
+                    bandera.set()
+                continue
+            yield "progreso", estimacion
         try:
-            expr = validar_expr_con_variables(preprocess_math_expr(req.expresion), {"x", "y"})
-            y_inf_expr = parse_limite(req.y_inf)
-            y_sup_expr = parse_limite(req.y_sup)
-        except Exception as e:
-            return JSONResponse(status_code=400, content={"detail": f"Error en la expresión ingresada o en los límites de y. Revisa paréntesis y sintaxis. Detalle: {e}"})
-
-        limites = {
-            "a": req.x_inf,
-            "b": req.x_sup,
-            "c": y_inf_expr,
-            "d": y_sup_expr
-        }
-        resultado = calcular_integral("doble", str(expr), limites)
+            resultado = tarea.result()
+        except EjecutorSaturado as e:
+            yield "error", {"detail": str(e), "retry_after": e.retry_after}
+            return
+        except TiempoAgotado as e:
+            yield "error", {"detail": str(e)}
+            return
         if "error" in resultado:
-            print("Error en el cálculo doble:", resultado["error"])
-            return JSONResponse(status_code=400, content={"detail": f"Error en la expresión: {resultado['error']}"})
-        valor = resultado.get("valor", None)
-        if valor is not None and not math.isfinite(valor):
-            return JSONResponse(status_code=400, content={
-                "detail": "El resultado de la integral es infinito o indefinido. Cambia los límites o la función."
-            })
+            yield "error", {"detail": resultado["error"], "cancelado": resultado.get("cancelado", False)}
+            return
+        valor = resultado.get("valor")
+        if valor is None or not math.isfinite(valor):
+            yield "error", {"detail": "El resultado de la integral es infinito o indefinido. Cambia los límites o la función."}
+            return
+        yield "resultado", {"valor": valor, **info_cuadratura(resultado)}
+    finally:
+        # Cliente desconectado o flujo terminado: que el worker no siga calculando
+        bandera.set()
+        tarea.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+def _sse(evento: str, datos: dict) -> str:
+    return f"event: {evento}\ndata: {json.dumps(datos)}\n\n"
+
+async def endpoint_progreso(tipo: str, req: OpcionesCalculo):
+    """
+    Versión en vivo de /simple, /doble y /triple: text/event-stream con un evento
+    "progreso" por refinamiento (valor, error_estimado, evaluaciones, metodo) y un
+    evento final "resultado" o "error". Cerrar la conexión cancela el cálculo.
+    """
+    async def cuerpo():
+        async for evento, datos in _eventos_integral(tipo, req):
+            yield _sse(evento, datos)
+    return StreamingResponse(cuerpo(), media_type="text/event-stream", headers={"Cache-Control": "no-store"})
+
+@app.post("/simple/progreso")
+async def integral_simple_progreso(req: SimpleIntegralRequest):
+    return await endpoint_progreso("simple", req)
+
+@app.post("/doble/progreso")
+async def integral_doble_progreso(req: DobleIntegralRequest):
+    return await endpoint_progreso("doble", req)
+
+@app.post("/triple/progreso")
+async def integral_triple_progreso(req: TripleIntegralRequest):
+    return await endpoint_progreso("triple", req)
+
+@app.websocket("/ws/integral")
+async def integral_websocket(ws: WebSocket):
+    """
+    El cliente envía {"tipo": "simple"|"doble"|"triple", ...campos de la petición}
+    y recibe {"evento": ..., ...datos} por cada mensaje. Enviar {"accion": "cancelar"}
+    o cerrar el socket detiene el cálculo.
+    """
+    await ws.accept()
+    try:
+        peticion = await ws.receive_json()
+        tipo = peticion.pop("tipo", None)
+        if tipo not in MODELOS:
+            await ws.send_json({"evento": "error", "detail": f"Tipo de integral no soportada: {tipo}"})
+            return
         try:
-            limites_grafica = {
-                "a": float(a),
-                "b": float(b),
-                "c": y_inf_expr,
-                "d": y_sup_expr
-            }
-            grafica = generar_grafica("doble", str(expr), limites_grafica)
+            req = MODELOS[tipo](**peticion)
         except Exception as e:
-            print("Error al graficar doble:", e)
-            grafica = ""
-        if isinstance(grafica, str) and (grafica.endswith(".png") or grafica.startswith("http")):
-            grafica_out = grafica
-        else:
-            grafica_out = None
-        return {"valor": valor, "grafica": grafica_out}
-    except Exception as e:
-        print("Error inesperado en el endpoint doble:", e)
-        return JSONResponse(status_code=400, content={"detail": f"Error inesperado: {e}"})
+            await ws.send_json({"evento": "error", "detail": f"Petición inválida: {e}"})
+            return
 
-@app.post("/triple")
-def integral_triple(req: TripleIntegralRequest):
-    try:
-        a = parse_limit_string(req.x_inf)
-        b = parse_limit_string(req.x_sup)
-        if a == b:
-            return JSONResponse(status_code=400, content={"detail": "Los límites superior e inferior de integración para x son iguales."})
-        if a > b:
-            return JSONResponse(status_code=400, content={"detail": "El límite inferior de x es mayor que el superior. Por favor invierte los límites."})
+        cancelado = asyncio.Event()
+
+        async def escuchar():
+            try:
+                while True:
+                    mensaje = await ws.receive_json()
+                    if mensaje.get("accion") == "cancelar":
+                        cancelado.set()
+                        return
+            except (WebSocketDisconnect, RuntimeError):
+                cancelado.set()
+
+        escucha = asyncio.ensure_future(escuchar())
+        try:
+            async for evento, datos in _eventos_integral(tipo, req, cancelado):
+                await ws.send_json({"evento": evento, **datos})
+        finally:
+            escucha.cancel()
+        await ws.close()
+    except WebSocketDisconnect:
+        pass
+
+# Límites del endpoint /batch
+LOTE_MAX_ITEMS = int(os.environ.get("LOTE_MAX_ITEMS", 5000))
+# Integrales del mismo integrando que se envían juntas en un solo trabajo del pool
+LOTE_TAMANO_GRUPO = int(os.environ.get("LOTE_TAMANO_GRUPO", 256))
+
+def _leer_items(cuerpo: bytes, content_type: str):
+    """
+    Acepta {"items": [...]} / una lista JSON, o NDJSON (un item por línea).
+    """
+    texto = cuerpo.decode("utf-8")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        return [json.loads(linea) for linea in texto.splitlines() if linea.strip()]
+    datos = json.loads(texto)
+    if isinstance(datos, dict):
+        datos = datos.get("items")
+    if not isinstance(datos, list):
+        raise EntradaInvalida('El cuerpo debe ser una lista de integrales, {"items": [...]} o NDJSON.')
+    return datos
+
+def _respuesta_item(indice: int, resultado: dict):
+    if "error" in resultado:
+        return {"indice": indice, "error": resultado["error"]}
+    valor = resultado.get("valor", None)
+    if valor is None or not math.isfinite(valor):
+        return {"indice": indice, "error": "El resultado de la integral es infinito o indefinido. Cambia los límites o la función."}
+    return {"indice": indice, "valor": valor, **info_cuadratura(resultado)}
 
+def _agrupar_lote(items: list):
+    """
+    Valida cada item y agrupa los que comparten tipo, integrando y opciones.
+    Devuelve (listos, grupos): listos son respuestas ya resueltas (errores de
+    validación o aciertos de caché) y grupos son trabajos para el pool.
+    """
+    listos = {}
+    grupos = {}
+    for i, item in enumerate(items):
         try:
-            expr = validar_expr_con_variables(preprocess_math_expr(req.expresion), {"x", "y", "z"})
-            y_inf_expr = parse_limite(req.y_inf)
-            y_sup_expr = parse_limite(req.y_sup)
-            z_inf_expr = parse_limite(req.z_inf)
-            z_sup_expr = parse_limite(req.z_sup)
+            if not isinstance(item, dict) or item.get("tipo") not in MODELOS:
+                raise EntradaInvalida('Cada integral debe tener "tipo": "simple", "doble" o "triple".')
+            tipo = item["tipo"]
+            req = MODELOS[tipo](**{k: v for k, v in item.items() if k != "tipo"})
+            expr, limites, _, limites_clave = PREPARADORES[tipo](req)
+            opciones = opciones_calculo(req)
+            clave = clave_integral(tipo, expr, limites_clave, opciones)
+        except EntradaInvalida as e:
+            listos[i] = {"indice": i, "error": str(e)}
+            continue
         except Exception as e:
-            return JSONResponse(status_code=400, content={"detail": f"Error en la expresión ingresada o en los límites de y/z. Revisa paréntesis y sintaxis. Detalle: {e}"})
-
-        limites = {
-            "a": req.x_inf,
-            "b": req.x_sup,
-            "c": y_inf_expr,
-            "d": y_sup_expr,
-            "e": z_inf_expr,
-            "f": z_sup_expr
-        }
-        resultado = calcular_integral("triple", str(expr), limites)
-        if "error" in resultado:
-            print("Error en el cálculo triple:", resultado["error"])
-            return JSONResponse(status_code=400, content={"detail": f"Error en la expresión: {resultado['error']}"})
-        valor = resultado.get("valor", None)
-        if valor is not None and not math.isfinite(valor):
-            return JSONResponse(status_code=400, content={
-                "detail": "El resultado de la integral es infinito o indefinido. Cambia los límites o la función."
-            })
+            listos[i] = {"indice": i, "error": f"Integral inválida: {e}"}
+            continue
+        guardado = cache_resultados.get(clave)
+        if guardado is not None:
+            listos[i] = _respuesta_item(i, guardado)
+            continue
+        grupo = grupos.setdefault((tipo, str(expr), json.dumps(opciones, sort_keys=True)), [])
+        grupo.append((i, limites, clave))
+    trabajos = []
+    for (tipo, expresion, opciones), miembros in grupos.items():
+        for inicio in range(0, len(miembros), LOTE_TAMANO_GRUPO):
+            trabajos.append((tipo, expresion, json.loads(opciones), miembros[inicio:inicio + LOTE_TAMANO_GRUPO]))
+    return listos, trabajos
+
+async def _ejecutar_grupo(semaforo, tipo, expresion, opciones, miembros):
+    from app.calculo.servicio import resolver_lote
+    async with semaforo:
         try:
-            limites_grafica = {
-                "a": float(a),
-                "b": float(b),
-                "c": y_inf_expr,
-                "d": y_sup_expr,
-                "e": z_inf_expr,
-                "f": z_sup_expr
-            }
-            grafica = generar_grafica("triple", str(expr), limites_grafica)
+            resultados = await ejecutor.ejecutar(
+                resolver_lote, tipo, expresion, [limites for _, limites, _ in miembros], opciones
+            )
+        except (EjecutorSaturado, TiempoAgotado) as e:
+            resultados = [{"error": str(e)}] * len(miembros)
         except Exception as e:
-            print("Error al graficar triple:", e)
-            grafica = ""
-        if isinstance(grafica, str) and (grafica.endswith(".png") or grafica.startswith("http")):
-            grafica_out = grafica
-        else:
-            grafica_out = None
-        return {"valor": valor, "grafica": grafica_out}
+            resultados = [{"error": f"Error inesperado: {e}"}] * len(miembros)
+    salida = {}
+    for (i, _, clave), resultado in zip(miembros, resultados):
+        salida[i] = _respuesta_item(i, resultado)
+        if "valor" in salida[i]:
+            cache_resultados.set(clave, {k: v for k, v in salida[i].items() if k != "indice"})
+    return salida
+
+async def _resultados_en_orden(total: int, listos: dict, trabajos: list):
+    """
+    Lanza los grupos en el pool (sin superar el número de workers, para no
+    saturar la cola) y va entregando las respuestas en el orden original.
+    """
+    semaforo = asyncio.Semaphore(max(ejecutor.procesos, 1))
+    pendientes = {
+        asyncio.ensure_future(_ejecutar_grupo(semaforo, tipo, expresion, opciones, miembros))
+        for tipo, expresion, opciones, miembros in trabajos
+    }
+    siguiente = 0
+    try:
+        while siguiente < total:
+            while siguiente in listos:
+                yield listos.pop(siguiente)
+                siguiente += 1
+            if siguiente >= total:
+                break
+            terminados, pendientes = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+            for tarea in terminados:
+                listos.update(tarea.result())
+    finally:
+        for tarea in pendientes:
+            tarea.cancel()
+
+@app.post("/batch")
+async def integral_lote(request: Request, stream: bool = False):
+    """
+    Calcula muchas integrales en una sola petición. Cada item lleva "tipo" y los
+    mismos campos que /simple, /doble o /triple (las gráficas no se generan).
+    Los items con el mismo integrando se parsean y compilan una sola vez.
+    Con ?stream=true la salida es NDJSON, una línea por item en el orden de entrada.
+    """
+    try:
+        items = _leer_items(await request.body(), request.headers.get("content-type", ""))
+    except EntradaInvalida as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
     except Exception as e:
-        print("Error inesperado en el endpoint triple:", e)
+        return JSONResponse(status_code=400, content={"detail": f"No se pudo leer el lote: {e}"})
+    if len(items) > LOTE_MAX_ITEMS:
+        return JSONResponse(status_code=400, content={"detail": f"El lote supera el máximo de {LOTE_MAX_ITEMS} integrales."})
+
+    listos, trabajos = _agrupar_lote(items)
+    if stream:
+        async def lineas():
+            async for respuesta in _resultados_en_orden(len(items), listos, trabajos):
+                yield json.dumps(respuesta, ensure_ascii=False) + "\n"
+        return StreamingResponse(lineas(), media_type="application/x-ndjson")
+    return {"resultados": [r async for r in _resultados_en_orden(len(items), listos, trabajos)]}
+
+# Máximo de valores del parámetro en un barrido
+BARRIDO_MAX_PASOS = int(os.environ.get("BARRIDO_MAX_PASOS", 2000))
+
+class BarridoRequest(OpcionesCalculo):
+    tipo: str = "simple"
+    expresion: str
+    parametro: str = "k"
+    inicio: str
+    fin: str
+    pasos: int = 50
+    x_inf: str
+    x_sup: str
+    y_inf: Optional[str] = None
+    y_sup: Optional[str] = None
+    z_inf: Optional[str] = None
+    z_sup: Optional[str] = None
+    graficar: bool = False
+
+def _limite_barrido(texto, permitidas: set, nombre: str):
+    """
+    Valida un límite de barrido: un número o una expresión en las variables permitidas.
+    Devuelve el float o la expresión canónica como texto.
+    """
+    from app.utils.math_parser import obtener_expresion, normalizar_numerica
+    if texto is None or str(texto).strip() == "":
+        raise EntradaInvalida(f"Falta el límite {nombre}.")
+    normalizado = normalizar_numerica(texto, sorted(permitidas))
+    if normalizado is not None:
+        return normalizado
+    try:
+        expr = obtener_expresion(texto)
+    except Exception as e:
+        raise EntradaInvalida(f"Límite {nombre} inválido: {e}")
+    no_permitidas = {str(s) for s in expr.free_symbols} - permitidas
+    if no_permitidas:
+        raise EntradaInvalida(f"Variables no permitidas en el límite {nombre}: {', '.join(sorted(no_permitidas))}")
+    if not expr.free_symbols:
+        return float(expr.evalf())
+    return str(expr)
+
+def preparar_barrido(req: BarridoRequest):
+    from app.calculo.integrales import parse_limit_string
+    from app.utils.math_parser import validar_expr_con_variables, sympy_func_dict
+    variables = {"simple": ["x"], "doble": ["x", "y"], "triple": ["x", "y", "z"]}.get(req.tipo)
+    if variables is None:
+        raise EntradaInvalida(f"Tipo de integral no soportada: {req.tipo}")
+    k = req.parametro
+    if not k.isidentifier() or k in ("x", "y", "z") or k in sympy_func_dict:
+        raise EntradaInvalida(f"Nombre de parámetro inválido: {k}")
+    if req.modo != "fijo" or req.simbolico or req.metodo not in ("auto", "simpson"):
+        raise EntradaInvalida("El barrido solo admite modo fijo con Simpson, sin vía simbólica.")
+    if not 1 <= req.pasos <= BARRIDO_MAX_PASOS:
+        raise EntradaInvalida(f"El número de pasos debe estar entre 1 y {BARRIDO_MAX_PASOS}.")
+    try:
+        inicio = parse_limit_string(req.inicio)
+        fin = parse_limit_string(req.fin)
+    except Exception as e:
+        raise EntradaInvalida(str(e))
+    try:
+        expr = validar_expr_con_variables(req.expresion, set(variables) | {k})
+    except Exception as e:
+        raise EntradaInvalida(f"Error en la expresión ingresada. Revisa paréntesis y sintaxis. Detalle: {e}")
+
+    limites = {
+        "a": _limite_barrido(req.x_inf, {k}, "inferior de x"),
+        "b": _limite_barrido(req.x_sup, {k}, "superior de x"),
+    }
+    if req.tipo in ("doble", "triple"):
+        limites["c"] = _limite_barrido(req.y_inf, {"x", k}, "inferior de y")
+        limites["d"] = _limite_barrido(req.y_sup, {"x", k}, "superior de y")
+    if req.tipo == "triple":
+        limites["e"] = _limite_barrido(req.z_inf, {"x", "y", k}, "inferior de z")
+        limites["f"] = _limite_barrido(req.z_sup, {"x", "y", k}, "superior de z")
+    return expr, inicio, fin, limites
+
+@app.post("/barrido")
+async def integral_barrido(req: BarridoRequest):
+    """
+    Integra la expresión para `pasos` valores de un parámetro libre entre
+    inicio y fin, en una sola evaluación vectorizada. La expresión y los
+    límites pueden depender del parámetro.
+    """
+    from app.calculo.servicio import resolver_barrido
+    try:
+        expr, inicio, fin, limites = preparar_barrido(req)
+    except EntradaInvalida as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+    except Exception as e:
+        log.exception("Error inesperado en el endpoint barrido")
         return JSONResponse(status_code=400, content={"detail": f"Error inesperado: {e}"})
 
+    valores_parametro = [float(v) for v in np.linspace(inicio, fin, req.pasos)]
+    clave = clave_integral(
+        f"barrido_{req.tipo}", expr,
+        {**limites, "parametro": req.parametro, "inicio": inicio, "fin": fin, "pasos": req.pasos},
+        {"graficar": req.graficar},
+    )
+    guardado = cache_resultados.get(clave)
+    if guardado is not None:
+        return guardado
+    try:
+        resultado = await ejecutor.ejecutar(
+            resolver_barrido, req.tipo, str(expr), req.parametro, valores_parametro, limites, req.graficar
+        )
+    except EjecutorSaturado as e:
+        return JSONResponse(status_code=503, content={"detail": str(e)}, headers={"Retry-After": str(e.retry_after)})
+    except TiempoAgotado as e:
+        return JSONResponse(status_code=504, content={"detail": f"{e} Prueba con menos pasos."})
+    if "error" in resultado:
+        return JSONResponse(status_code=400, content={"detail": resultado["error"]})
+    metricas_render.registrar(resultado.get("metricas_grafica"))
+    respuesta = {
+        "parametro": req.parametro,
+        "valores_parametro": valores_parametro,
+        "resultados": resultado["resultados"],
+        "grafica": resultado.get("grafica"),
+    }
+    cache_resultados.set(clave, respuesta)
+    return respuesta
+
+@app.get("/graficas/{id_trabajo}")
+def obtener_grafica(id_trabajo: str):
+    """
+    Devuelve la imagen de una gráfica pedida con modo_grafica="asincrona".
+    Mientras se renderiza responde 202; el cliente debe volver a consultar.
+    """
+    trabajo = trabajos_graficas.obtener(id_trabajo)
+    if trabajo is None:
+        return JSONResponse(status_code=404, content={"detail": "No existe una gráfica con ese identificador."})
+    if trabajo["estado"] == PENDIENTE:
+        return JSONResponse(status_code=202, content={"estado": PENDIENTE}, headers={"Retry-After": "1"})
+    if trabajo["estado"] == ERROR:
+        return JSONResponse(status_code=422, content={"estado": ERROR, "detail": trabajo["error"]})
+    if not os.path.exists(trabajo["ruta"]):
+        return JSONResponse(status_code=404, content={"detail": "La gráfica ya no está disponible."})
+    return FileResponse(trabajo["ruta"], media_type=tipo_mime(trabajo["ruta"]),
+                        headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+@app.get("/ejecutor")
+def estadisticas_ejecutor():
+    return {**ejecutor.estadisticas(), "graficas": trabajos_graficas.estadisticas(), "render": metricas_render.estadisticas(),
+            "vuelo_unico": vuelo_unico.estadisticas()}
+
+@app.get("/cache")
+def estadisticas_cache():
+    from app.utils.math_parser import estadisticas_cache_expresiones
+    return {
+        "expresiones": estadisticas_cache_expresiones(),
+        "resultados": cache_resultados.estadisticas(),
+    }
+
+@registro.colector
+def _metricas_servicio():
+    """
+    Valores del proceso principal que ya llevan su propia cuenta: cachés,
+    pool, gráficas y registro. Las cachés de expresiones son las de este
+    proceso; el coste de sus fallos en los workers está en las etapas
+    preproceso, parseo, lambdify y compilacion.
+    """
+    from app.utils.math_parser import estadisticas_cache_expresiones
+    caches = dict(estadisticas_cache_expresiones())
+    resultados = cache_resultados.estadisticas()
+    caches["resultados_memoria"] = resultados["memoria"]
+    caches["resultados_disco"] = resultados["disco"]
+    pool = ejecutor.estadisticas()
+    render = metricas_render.estadisticas()
+    grupos = [(dict(zip(("tipo", "preset", "formato"), clave.split("/"))), g) for clave, g in render.items()]
+    return [
+        ("integrales_cache_aciertos_total", "counter", "Aciertos de cada caché.",
+         [({"cache": c}, e["aciertos"]) for c, e in caches.items()]),
+        ("integrales_cache_fallos_total", "counter", "Fallos de cada caché.",
+         [({"cache": c}, e["fallos"]) for c, e in caches.items()]),
+        ("integrales_cache_entradas", "gauge", "Entradas en cada caché en memoria.",
+         [({"cache": c}, e["tamano"]) for c, e in caches.items() if "tamano" in e]),
+        ("integrales_pool_trabajos", "gauge", "Trabajos del pool en ejecución y en cola.",
+         [({"estado": "ocupados"}, pool["ocupados"]), ({"estado": "en_cola"}, pool["en_cola"])]),
+        ("integrales_pool_utilizacion", "gauge", "Fracción del tiempo con los workers ocupados.",
+         [({}, pool["utilizacion"])]),
+        ("integrales_pool_trabajos_total", "counter", "Trabajos del pool terminados por resultado.",
+         [({"resultado": r}, pool[r]) for r in ("completados", "fallidos", "rechazados", "tiempo_agotado")]),
+        ("integrales_pool_reinicios_total", "counter", "Reinicios del pool de procesos.", [({}, pool["reinicios"])]),
+        ("integrales_pool_reintentos_total", "counter", "Trabajos reenviados al reiniciarse su pool.",
+         [({}, pool["reintentos"])]),
+        ("integrales_graficas_total", "counter", "Gráficas renderizadas.",
+         [(etiquetas, g["graficas"]) for etiquetas, g in grupos]),
+        ("integrales_graficas_bytes_total", "counter", "Bytes de las gráficas renderizadas.",
+         [(etiquetas, round(g["bytes_medio"] * g["graficas"])) for etiquetas, g in grupos]),
+        ("integrales_graficas_trabajos", "gauge", "Trabajos de gráfica en segundo plano por estado.",
+         [({"estado": e}, n) for e, n in trabajos_graficas.estadisticas().items()]),
+        ("integrales_log_descartados_total", "counter", "Mensajes de registro descartados con la cola llena.",
+         [({}, bitacora.descartados())]),
+        ("integrales_captura_total", "counter", "Peticiones capturadas (CAPTURA_TRAFICO) por resultado.",
+         [({"resultado": r}, captura.estadisticas()[r]) for r in ("escritas", "descartadas")] if captura else []),
+        ("integrales_vuelos_en_curso", "gauge", "Cálculos distintos en curso con peticiones esperándolos.",
+         [({}, vuelo_unico.estadisticas()["en_curso"])]),
+        ("integrales_arranque_segundos", "gauge", "Duración de cada fase del arranque de este proceso.",
+         [({"fase": f}, s) for f, s in _fases_arranque().items()]),
+        ("integrales_listo", "gauge", "1 si el precalentado terminó y el servicio está listo.",
+         [({}, int(estado_arranque["listo"]))]),
+    ]
+
+def _fases_arranque():
+    fases = {"importacion": estado_arranque["importacion"]}
+    fases.update({f"precalentado_{f}": s for f, s in estado_arranque["precalentado"].items()})
+    # El worker más lento es el que marca cuándo el pool está listo
+    workers = [s.get("total", 0.0) for s in estado_arranque["workers"].values()]
+    if workers:
+        fases["workers"] = max(workers)
+    if estado_arranque["total"] is not None:
+        fases["total"] = estado_arranque["total"]
+    return fases
+
+@app.get("/salud")
+def salud():
+    """Siempre 200 mientras el proceso responde (liveness), con las duraciones del arranque."""
+    return {"estado": "ok", **estado_arranque}
+
+@app.get("/salud/listo")
+def salud_listo():
+    """Readiness: 503 hasta que termina el precalentado."""
+    if not estado_arranque["listo"]:
+        return JSONResponse(status_code=503, content={"listo": False, "detail": "Precalentando."},
+                            headers={"Retry-After": "1"})
+    return {"listo": True}
+
+@app.get("/metrics")
+def metricas_prometheus():
+    """
+    Métricas en formato de texto de Prometheus: duración de cada etapa
+    (integrales_etapa_segundos), latencia HTTP, evaluaciones, errores por clase,
+    aciertos de las cachés y estado del pool.
+    """
+    return Response(registro.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 from fastapi.staticfiles import StaticFiles
-app.mount("/static", StaticFiles(directory="static"), name="static")
\ No newline at end of file
+
+class StaticFilesCacheables(StaticFiles):
+    """
+    StaticFiles con Cache-Control. Las gráficas tienen nombre por contenido,
+    así que nunca cambian y el navegador puede guardarlas indefinidamente.
+    Starlette ya añade ETag y Last-Modified a cada archivo.
+    """
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        respuesta = super().file_response(full_path, stat_result, scope, status_code)
+        if os.path.basename(os.path.dirname(full_path)) == "graficas":
+            respuesta.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            respuesta.headers["Cache-Control"] = "public, max-age=3600"
+        return respuesta
+
+app.mount("/static", StaticFilesCacheables(directory="static"), name="static")
+
+estado_arranque["importacion"] = time.perf_counter() - _inicio_importacion
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Directorio de las gráficas y política de desalojo
+DIRECTORIO_GRAFICAS = "static/graficas"
+GRAFICAS_MAX_BYTES = int(os.environ.get("GRAFICAS_MAX_BYTES", 500 * 1024 * 1024))
+GRAFICAS_MAX_EDAD = float(os.environ.get("GRAFICAS_MAX_EDAD", 7 * 24 * 3600))
+GRAFICAS_BARRIDO_INTERVALO = float(os.environ.get("GRAFICAS_BARRIDO_INTERVALO", 600))
+
+# Cambiar esta versión cuando cambie el aspecto de las gráficas para no servir imágenes viejas
+VERSION_RENDER = 2
+# Nombres que genera ruta_grafica: el barrido no toca ningún otro archivo del directorio
+_NOMBRE_GRAFICA = re.compile(r"integral_[a-z_]+_[0-9a-f]{64}\.[a-z0-9]+")
+
+
+def clave_grafica(tipo: str, expresion: str, limites: dict, ajustes: dict) -> str:
+    """
+    SHA-256 del spec canónico de la gráfica (tipo, expresión, límites y ajustes
+    de renderizado). A diferencia de hash(), es estable entre procesos y reinicios.
+    """
+    spec = {
+        "version": VERSION_RENDER,
+        "tipo": tipo,
+        "expresion": str(expresion),
+        "limites": {k: repr(v) if isinstance(v, float) else str(v) for k, v in sorted(limites.items())},
+        "ajustes": ajustes,
+    }
+    texto = json.dumps(spec, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def ruta_grafica(tipo: str, expresion: str, limites: dict, ajustes: dict, extension: str = "png") -> str:
+    clave = clave_grafica(tipo, expresion, limites, ajustes)
+    return f"{DIRECTORIO_GRAFICAS}/integral_{tipo}_{clave}.{extension}"
+
+
+def grafica_existente(ruta: str) -> bool:
+    """
+    Indica si la gráfica ya está en disco. Si existe, actualiza su fecha de
+    modificación para que el barrido la trate como usada recientemente.
+    """
+    try:
+        os.utime(ruta)
+        return True
+    except OSError:
+        return False
+
+
+def guardar_atomico(guardar, ruta: str):
+    """
+    Escribe el archivo a través de un temporal y lo renombra, para que dos
+    workers que rinden la misma gráfica no dejen un archivo a medio escribir.
+    guardar(ruta_temporal) debe escribir el contenido.
+    """
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        guardar(temporal)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def barrer(directorio=DIRECTORIO_GRAFICAS, max_bytes=GRAFICAS_MAX_BYTES, max_edad=GRAFICAS_MAX_EDAD):
+    """
+    Borra las gráficas más antiguas que max_edad y, si el directorio sigue
+    ocupando más de max_bytes, las menos usadas recientemente hasta bajar del límite.
+    Solo cuenta y borra los archivos con nombre de ruta_grafica
+    (integral_<tipo>_<sha256>.<ext>). Devuelve el número de archivos borrados.
+    """
+    try:
+        entradas = [e for e in os.scandir(directorio) if e.is_file() and _NOMBRE_GRAFICA.fullmatch(e.name)]
+    except FileNotFoundError:
+        return 0
+    ahora = time.time()
+    archivos = []
+    for e in entradas:
+        try:
+            st = e.stat()
+        except OSError:
+            continue
+        archivos.append((st.st_mtime, st.st_size, e.path))
+    archivos.sort()
+
+    borrados = 0
+    total = sum(a[1] for a in archivos)
+    for mtime, tamano, ruta in archivos:
+        if ahora - mtime <= max_edad and total <= max_bytes:
+            break
+        try:
+            os.remove(ruta)
+            borrados += 1
+            total -= tamano
+        except OSError:
+            pass
+    return borrados
+
+
+class Barredor:
+    """
+    Hilo en segundo plano que llama a barrer() cada GRAFICAS_BARRIDO_INTERVALO segundos.
+    """
+    def __init__(self, intervalo=GRAFICAS_BARRIDO_INTERVALO):
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._hilo = None
+        self.borrados = 0
+
+    def iniciar(self):
+        if self._hilo is None and self.intervalo > 0:
+            self._hilo = threading.Thread(target=self._bucle, name="barredor-graficas", daemon=True)
+            self._hilo.start()
+
+    def _bucle(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.borrados += barrer()
+            except Exception as e:
+                log.exception("Error al barrer las gráficas")
+
+    def detener(self):
+        self._parar.set()
+
+
+barredor = Barredor()
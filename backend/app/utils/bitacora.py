@@ -0,0 +1,83 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+
+# Registro de la aplicación (loggers "app.*") por una cola: quien registra solo
+# encola el mensaje y un hilo aparte lo escribe en stderr, así el cálculo no
+# espera a la E/S. Los mensajes por debajo de WARNING se muestrean.
+# LOG_NIVEL: nivel mínimo (DEBUG muestra los datos de cada integral)
+# LOG_MUESTREO: fracción (0 a 1) de los mensajes DEBUG/INFO que se escriben
+# LOG_COLA_MAX: mensajes pendientes como máximo; con la cola llena se descartan
+LOG_NIVEL = os.environ.get("LOG_NIVEL", "INFO").upper()
+LOG_MUESTREO = float(os.environ.get("LOG_MUESTREO", 0.1))
+LOG_COLA_MAX = int(os.environ.get("LOG_COLA_MAX", 10000))
+
+
+class FiltroMuestreo(logging.Filter):
+    """
+    Deja pasar todos los WARNING o superiores y una fracción `tasa` del resto.
+    Un registro con extra={"muestrear": False} pasa siempre.
+    """
+    def __init__(self, tasa=LOG_MUESTREO):
+        super().__init__()
+        self.tasa = tasa
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not getattr(record, "muestrear", True):
+            return True
+        return self.tasa >= 1.0 or random.random() < self.tasa
+
+
+class ColaNoBloqueante(logging.handlers.QueueHandler):
+    """
+    QueueHandler que descarta (y cuenta) el mensaje si la cola está llena en
+    lugar de bloquear al hilo que registra.
+    """
+    def __init__(self, cola):
+        super().__init__(cola)
+        self.descartados = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+_manejador = None
+_oyente = None
+_lock = threading.Lock()
+
+
+def configurar(nivel=LOG_NIVEL, tasa=LOG_MUESTREO, cola_max=LOG_COLA_MAX):
+    """
+    Conecta el logger "app" a la cola y arranca el hilo que escribe. Se llama
+    una vez por proceso (el principal y cada worker del pool); las siguientes
+    llamadas no hacen nada.
+    """
+    global _manejador, _oyente
+    with _lock:
+        if _manejador is not None:
+            return
+        cola = queue.Queue(cola_max)
+        salida = logging.StreamHandler(sys.stderr)
+        salida.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(process)d] %(message)s"))
+        _manejador = ColaNoBloqueante(cola)
+        _manejador.addFilter(FiltroMuestreo(tasa))
+        _oyente = logging.handlers.QueueListener(cola, salida)
+        _oyente.start()
+        logger = logging.getLogger("app")
+        logger.setLevel(nivel)
+        logger.addHandler(_manejador)
+        logger.propagate = False
+        # Al salir, escribe lo que quede en la cola
+        atexit.register(_oyente.stop)
+
+
+def descartados() -> int:
+    return _manejador.descartados if _manejador is not None else 0
@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """
+    Caché LRU segura para hilos con expiración opcional por tiempo (TTL).
+    Lleva contadores de aciertos, fallos y desalojos.
+    """
+    def __init__(self, max_tamano=256, ttl=None):
+        self.max_tamano = max_tamano
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def _expirado(self, instante):
+        return self.ttl is not None and time.monotonic() - instante > self.ttl
+
+    def get(self, clave, default=None):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return default
+            valor, instante = entrada
+            if self._expirado(instante):
+                del self._datos[clave]
+                self.desalojos += 1
+                self.fallos += 1
+                return default
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def set(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic())
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_tamano:
+                self._datos.popitem(last=False)
+                self.desalojos += 1
+
+    def obtener_o_calcular(self, clave, calcular):
+        """
+        Devuelve el valor cacheado para clave o lo calcula con calcular() y lo guarda.
+        El cálculo se hace fuera del lock; dos hilos pueden calcular la misma clave a la vez.
+        """
+        faltante = object()
+        valor = self.get(clave, faltante)
+        if valor is faltante:
+            valor = calcular()
+            self.set(clave, valor)
+        return valor
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "tamano": len(self._datos),
+                "max_tamano": self.max_tamano,
+                "ttl": self.ttl,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "desalojos": self.desalojos,
+                "tasa_aciertos": self.aciertos / total if total else 0.0,
+            }
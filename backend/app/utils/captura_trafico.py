@@ -0,0 +1,155 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Captura del tráfico real de /simple, /doble y /triple para repetirlo con
+# benchmarks.carga. Con CAPTURA_TRAFICO=<archivo.jsonl> se añade una línea por
+# petición: {"t": llegada (epoch), "ruta", "cuerpo", "estado", "ms"}.
+# El cuerpo se sanea: solo los campos del modelo de la petición, con los textos
+# recortados a CAPTURA_MAX_TEXTO caracteres; lo que no es un objeto JSON no se guarda.
+# Un hilo aparte escribe desde una cola acotada; con la cola llena la línea se
+# descarta (y se cuenta), igual que en el registro.
+# CAPTURA_MUESTREO: fracción (0 a 1) de las peticiones que se capturan
+CAPTURA_TRAFICO = os.environ.get("CAPTURA_TRAFICO", "")
+CAPTURA_MUESTREO = float(os.environ.get("CAPTURA_MUESTREO", 1.0))
+CAPTURA_MAX_TEXTO = int(os.environ.get("CAPTURA_MAX_TEXTO", 500))
+CAPTURA_COLA_MAX = int(os.environ.get("CAPTURA_COLA_MAX", 10000))
+# Cuerpos más grandes no se capturan (ninguna petición válida se acerca)
+_MAX_CUERPO = 64 * 1024
+
+
+def campos_modelo(modelo) -> set:
+    # Nombres de campo de un modelo de pydantic (v2 o v1)
+    return set(getattr(modelo, "model_fields", None) or modelo.__fields__)
+
+
+def sanear(cuerpo: bytes, campos: set):
+    """Devuelve el cuerpo JSON reducido a `campos`, o None si no es un objeto JSON."""
+    try:
+        datos = json.loads(cuerpo)
+    except ValueError:
+        return None
+    if not isinstance(datos, dict):
+        return None
+    limpio = {}
+    for campo, valor in datos.items():
+        if campo not in campos:
+            continue
+        if isinstance(valor, str):
+            valor = valor[:CAPTURA_MAX_TEXTO]
+        elif valor is not None and not isinstance(valor, (bool, int, float)):
+            continue
+        limpio[campo] = valor
+    return limpio
+
+
+class EscritorCaptura:
+    """Añade líneas JSON a un archivo desde un hilo propio, sin bloquear a quien escribe."""
+    def __init__(self, ruta, cola_max=CAPTURA_COLA_MAX):
+        self.ruta = ruta
+        self._cola = queue.Queue(cola_max)
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.escritas = 0
+        self.descartadas = 0
+
+    def escribir(self, registro: dict):
+        if self._hilo is None:
+            self._iniciar()
+        try:
+            self._cola.put_nowait(registro)
+        except queue.Full:
+            self.descartadas += 1
+
+    def _iniciar(self):
+        with self._lock:
+            if self._hilo is not None:
+                return
+            directorio = os.path.dirname(self.ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            self._hilo = threading.Thread(target=self._bucle, name="captura-trafico", daemon=True)
+            self._hilo.start()
+            atexit.register(self.detener)
+
+    def _bucle(self):
+        with open(self.ruta, "a", encoding="utf-8") as archivo:
+            while True:
+                registro = self._cola.get()
+                if registro is None:
+                    return
+                try:
+                    archivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                    self.escritas += 1
+                except (TypeError, ValueError, OSError) as e:
+                    log.warning("No se pudo escribir la captura de tráfico: %s", e)
+                if self._cola.empty():
+                    archivo.flush()
+
+    def detener(self):
+        # Escribe lo pendiente y cierra el archivo
+        if self._hilo is not None and self._hilo.is_alive():
+            self._cola.put(None)
+            self._hilo.join(timeout=5)
+
+    def estadisticas(self):
+        return {"ruta": self.ruta, "escritas": self.escritas, "descartadas": self.descartadas}
+
+
+class CapturaTrafico:
+    """
+    Middleware ASGI que copia el cuerpo de los POST a las rutas de `campos`
+    (ruta -> campos admitidos) en `escritor`, con el código y la duración de
+    la respuesta. No modifica la petición ni la respuesta.
+    """
+    def __init__(self, app, escritor: EscritorCaptura, campos: dict, muestreo=CAPTURA_MUESTREO):
+        self.app = app
+        self.escritor = escritor
+        self.campos = campos
+        self.muestreo = muestreo
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.campos
+                or random.random() >= self.muestreo):
+            await self.app(scope, receive, send)
+            return
+        llegada = time.time()
+        inicio = time.perf_counter()
+        partes = []
+        tamano = 0
+        estado = 500
+
+        async def recibir():
+            nonlocal tamano
+            mensaje = await receive()
+            if mensaje["type"] == "http.request" and tamano <= _MAX_CUERPO:
+                cuerpo = mensaje.get("body", b"")
+                tamano += len(cuerpo)
+                partes.append(cuerpo)
+            return mensaje
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, recibir, enviar)
+        finally:
+            cuerpo = sanear(b"".join(partes), self.campos[scope["path"]]) if tamano <= _MAX_CUERPO else None
+            if cuerpo is not None:
+                self.escritor.escribir({
+                    "t": round(llegada, 6),
+                    "ruta": scope["path"],
+                    "cuerpo": cuerpo,
+                    "estado": estado,
+                    "ms": round((time.perf_counter() - inicio) * 1e3, 3),
+                })
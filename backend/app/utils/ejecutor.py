@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.utils import bitacora
+from app.utils.metricas import registro, capturar, observar
+
+log = logging.getLogger(__name__)
+
+# Configuración del pool de procesos para el cálculo pesado (SymPy, NumPy, matplotlib).
+# EJECUTOR_PROCESOS=0 ejecuta los trabajos en hilos del propio proceso (útil en desarrollo).
+EJECUTOR_PROCESOS = int(os.environ.get("EJECUTOR_PROCESOS", os.cpu_count() or 1))
+# Trabajos admitidos a la vez (en ejecución + en cola); por encima se responde 503
+EJECUTOR_COLA_MAX = int(os.environ.get("EJECUTOR_COLA_MAX", 4 * max(EJECUTOR_PROCESOS, 1)))
+# Tiempo máximo por trabajo, en segundos
+EJECUTOR_TIMEOUT = float(os.environ.get("EJECUTOR_TIMEOUT", 30))
+EJECUTOR_RETRY_AFTER = int(os.environ.get("EJECUTOR_RETRY_AFTER", 2))
+# Veces que se reenvía un trabajo cuyo pool se rompió (p. ej. porque se mató
+# para cortar el trabajo de otro que no respondía)
+EJECUTOR_REINTENTOS = int(os.environ.get("EJECUTOR_REINTENTOS", 1))
+# Expresiones que cada worker compila al arrancar, separadas por ';'
+EJECUTOR_PRECALENTAR = os.environ.get("EJECUTOR_PRECALENTAR", "x**2;sin(x);x*y;x*y*z")
+PRECALENTAR_EXPRESIONES = [e for e in EJECUTOR_PRECALENTAR.split(";") if e.strip()]
+
+
+class EjecutorSaturado(Exception):
+    def __init__(self, retry_after=EJECUTOR_RETRY_AFTER):
+        super().__init__("El servidor está saturado. Intenta de nuevo en unos segundos.")
+        self.retry_after = retry_after
+
+
+class TiempoAgotado(BaseException):
+    # Hereda de BaseException para que los `except Exception` del cálculo no la absorban
+    def __init__(self, timeout=None):
+        super().__init__(f"El cálculo superó el tiempo máximo de {timeout} s.")
+        self.timeout = timeout
+
+    def __reduce__(self):
+        return (TiempoAgotado, (self.timeout,))
+
+
+def _inicializar_worker(expresiones):
+    """
+    Se ejecuta una vez en cada proceso del pool: importa los módulos de cálculo,
+    prepara las figuras del renderizador y deja compiladas en la caché del
+    worker las expresiones más habituales (ver precalentado.precalentar).
+    """
+    bitacora.configurar()
+    from app.calculo.precalentado import precalentar
+    segundos = precalentar(expresiones)
+    log.info("Worker precalentado en %.2f s: %s", segundos["total"],
+             ", ".join(f"{fase} {s:.2f} s" for fase, s in segundos.items() if fase != "total"),
+             extra={"muestrear": False})
+
+
+def _estado_worker():
+    # Trabajo vacío para arrancar(): el pid y las duraciones del precalentado del worker
+    from app.calculo.precalentado import duraciones
+    time.sleep(0.05)
+    return os.getpid(), dict(duraciones)
+
+
+def _ejecutar_con_limite(fn, args, timeout):
+    """
+    Corre fn(*args) dentro del worker con una alarma de tiempo real: si se
+    excede timeout, se interrumpe el cálculo sin matar el proceso. Sin SIGALRM
+    (Windows) o fuera del hilo principal no hay alarma y solo actúa el tiempo
+    máximo del proceso principal (ver Ejecutor.ejecutar).
+    Devuelve (resultado, medidas): las métricas registradas durante el trabajo,
+    que el proceso principal suma a su registro.
+    """
+    usar_alarma = (bool(timeout) and hasattr(signal, "SIGALRM")
+                   and threading.current_thread() is threading.main_thread())
+    if usar_alarma:
+        def _alarma(signum, frame):
+            raise TiempoAgotado(timeout)
+        signal.signal(signal.SIGALRM, _alarma)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        with capturar() as medidas:
+            return fn(*args), medidas
+    finally:
+        if usar_alarma:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+class Ejecutor:
+    """
+    Pool de procesos con cola acotada, contrapresión y tiempo máximo por trabajo.
+    Los endpoints hacen `await ejecutor.ejecutar(fn, *args)`.
+    """
+    def __init__(self, procesos=EJECUTOR_PROCESOS, cola_max=EJECUTOR_COLA_MAX, timeout=EJECUTOR_TIMEOUT):
+        self.procesos = procesos
+        self.cola_max = cola_max
+        self.timeout = timeout
+        self._pool = None
+        self._manager = None
+        self._lock = threading.Lock()
+        self.en_vuelo = 0
+        self.completados = 0
+        self.fallidos = 0
+        self.rechazados = 0
+        self.agotados = 0
+        self.reinicios = 0
+        self.reintentos = 0
+        self.tiempo_ocupado = 0.0
+        self._inicio = time.monotonic()
+
+    def _obtener_pool(self):
+        with self._lock:
+            if self._pool is None:
+                if self.procesos > 0:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.procesos,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_inicializar_worker,
+                        initargs=(PRECALENTAR_EXPRESIONES,),
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=max(self.cola_max, 1))
+            return self._pool
+
+    def _reiniciar_pool(self, pool):
+        """
+        Mata los procesos de `pool` (p. ej. un cálculo que no respondió a la
+        alarma) y deja que el siguiente trabajo cree uno nuevo; si ya se
+        reemplazó, no hace nada. Un ProcessPoolExecutor no deja matar un solo
+        worker: los demás trabajos de ese pool, en curso o en cola, terminan
+        con BrokenProcessPool y ejecutar() los reenvía al pool nuevo.
+        """
+        with self._lock:
+            if pool is None or self._pool is not pool:
+                return
+            self._pool = None
+            self.reinicios += 1
+        for proceso in list(getattr(pool, "_processes", {}).values()):
+            proceso.terminate()
+        pool.shutdown(wait=False)
+
+    async def arrancar(self, timeout=120):
+        """
+        Crea el pool y espera a que todos los workers hayan terminado de
+        precalentarse. Devuelve las duraciones del precalentado de cada worker
+        ({pid: {fase: segundos}}); con hilos no hay nada que arrancar.
+        """
+        if self.procesos <= 0:
+            return {}
+        loop = asyncio.get_running_loop()
+        workers = {}
+        limite = time.monotonic() + timeout
+        # Cada ronda ocupa a todos los workers a la vez; el pool los crea al
+        # recibir los trabajos y cada uno se precalienta antes de tomar el suyo
+        while len(workers) < self.procesos and time.monotonic() < limite:
+            pool = self._obtener_pool()
+            ronda = [loop.run_in_executor(pool, _estado_worker) for _ in range(self.procesos)]
+            workers.update(await asyncio.gather(*ronda))
+        return workers
+
+    def canal(self):
+        """
+        Devuelve (cola, cancelado): una cola para que el trabajo publique su
+        progreso y una bandera para pedirle que se detenga. Con procesos son
+        proxies de un Manager, que se pueden pasar como argumentos al worker.
+        """
+        if self.procesos <= 0:
+            return queue.Queue(), threading.Event()
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context("spawn").Manager()
+            return self._manager.Queue(), self._manager.Event()
+
+    async def ejecutar(self, fn, *args, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            if self.en_vuelo >= self.cola_max:
+                self.rechazados += 1
+                raise EjecutorSaturado()
+            self.en_vuelo += 1
+        inicio = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            intentos = 0
+            while True:
+                # Cada envío dispone del tiempo completo: el reenviado no tiene la culpa del reinicio
+                pool = self._obtener_pool()
+                futuro = loop.run_in_executor(pool, _ejecutar_con_limite, fn, args, timeout)
+                try:
+                    # Margen para que la alarma del worker actúe antes de matar el proceso
+                    resultado, medidas = await asyncio.wait_for(futuro, timeout + 5 if timeout else None)
+                    break
+                except asyncio.TimeoutError:
+                    self._reiniciar_pool(pool)
+                    raise
+                except BrokenProcessPool:
+                    self._reiniciar_pool(pool)
+                    if intentos >= EJECUTOR_REINTENTOS:
+                        raise
+                    intentos += 1
+                    self.reintentos += 1
+                    log.warning("Se reenvía %s: su pool de procesos se reinició", getattr(fn, "__name__", "trabajo"))
+            registro.incorporar(medidas)
+            self.completados += 1
+            return resultado
+        except asyncio.TimeoutError:
+            self.agotados += 1
+            raise TiempoAgotado(timeout)
+        except TiempoAgotado:
+            self.agotados += 1
+            raise
+        except BrokenProcessPool:
+            self.fallidos += 1
+            raise
+        except Exception:
+            self.fallidos += 1
+            raise
+        finally:
+            duracion = time.monotonic() - inicio
+            self.tiempo_ocupado += duracion
+            # Incluye la espera en la cola del pool
+            observar("integrales_trabajo_segundos", duracion, funcion=getattr(fn, "__name__", "trabajo"))
+            with self._lock:
+                self.en_vuelo -= 1
+
+    def apagar(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+            manager, self._manager = self._manager, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if manager is not None:
+            manager.shutdown()
+
+    def estadisticas(self):
+        trabajadores = max(self.procesos, 1)
+        transcurrido = max(time.monotonic() - self._inicio, 1e-9)
+        return {
+            "procesos": self.procesos,
+            "cola_max": self.cola_max,
+            "timeout": self.timeout,
+            "en_vuelo": self.en_vuelo,
+            "ocupados": min(self.en_vuelo, trabajadores),
+            "en_cola": max(self.en_vuelo - trabajadores, 0),
+            "utilizacion": min(self.tiempo_ocupado / (transcurrido * trabajadores), 1.0),
+            "completados": self.completados,
+            "fallidos": self.fallidos,
+            "rechazados": self.rechazados,
+            "tiempo_agotado": self.agotados,
+            "reinicios": self.reinicios,
+            "reintentos": self.reintentos,
+        }
+
+
+ejecutor = Ejecutor()
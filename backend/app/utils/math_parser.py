@@ -1,9 +1,15 @@
+import operator
+import os
 import re
 from sympy.parsing.sympy_parser import (
     parse_expr, standard_transformations, implicit_multiplication_application, convert_xor
 )
+import numpy as np
 import sympy
 
+from app.utils.cache import CacheLRU
+from app.utils.metricas import etapa
+
 # Diccionario extendido para funciones matemáticas
 sympy_func_dict = {
     "sin": sympy.sin, "cos": sympy.cos, "tan": sympy.tan,
@@ -20,28 +26,418 @@ TRANSFORM = (
     (implicit_multiplication_application, convert_xor)
 )
 
+# Tablas del tokenizador, construidas una sola vez al importar.
+# _TOKEN: una sola expresión regular con un grupo por clase de token; se recorre
+# el texto de izquierda a derecha en una pasada con finditer.
+_TOKEN = re.compile(r"""
+    (?P<numero>(?:\d+\.\d*|\.\d+)(?:[eE][+-]?\d+)?|\d+(?:[eE]\d+)?)
+  | (?P<nombre>[^\W\d]\w*)
+  | (?P<potencia>\*\*|\^)
+  | (?P<espacio>\s+)
+  | (?P<otro>.)
+""", re.VERBOSE)
+_PARTES_NOMBRE = re.compile(r"\d+|\D")
+# Nombres conocidos sin distinguir mayúsculas: sin/SIN/Sin -> sin, PI -> pi, ABS -> Abs
+_NOMBRES = {nombre.lower(): ("Abs" if nombre == "abs" else nombre) for nombre in sympy_func_dict}
+_CONSTANTES = {"pi", "e"}
+# Nombres que SymPy no separa en letras (funciones y constantes propias, p. ej. ln, gamma)
+_NOMBRES_SYMPY = frozenset(n for n in dir(sympy) if not n.startswith("_"))
+_FUNCIONES_SYMPY = frozenset(n for n in _NOMBRES_SYMPY if isinstance(getattr(sympy, n), type) or n == "ln")
+_LETRAS_GRIEGAS = frozenset((
+    "alpha beta gamma delta epsilon zeta eta theta iota kappa lamda lambda mu nu xi omicron pi rho "
+    "sigma tau upsilon phi chi psi omega"
+).split())
+
+def _tokens(expr_str: str):
+    """
+    Una sola pasada sobre el texto: devuelve [(clase, texto)] con clase en
+    numero, simbolo, funcion u op. Normaliza nombres de funciones y constantes,
+    π -> pi, ^ -> ** y separa nombres compuestos en letras (xy -> x, y).
+    """
+    tokens = []
+    for m in _TOKEN.finditer(expr_str.replace("π", " pi ")):
+        clase = m.lastgroup
+        texto = m.group()
+        if clase == "espacio":
+            continue
+        if clase == "potencia":
+            tokens.append(("op", "**"))
+        elif clase == "numero":
+            tokens.append(("numero", texto))
+        elif clase == "nombre":
+            conocido = _NOMBRES.get(texto.lower())
+            if conocido is not None:
+                tokens.append(("simbolo" if conocido in _CONSTANTES else "funcion", conocido))
+            elif texto in _NOMBRES_SYMPY or "_" in texto or texto in _LETRAS_GRIEGAS or len(texto) == 1:
+                tokens.append(("funcion" if texto in _FUNCIONES_SYMPY else "simbolo", texto))
+            else:
+                # Como split_symbols de SymPy: cada letra es un símbolo y los dígitos un número
+                for parte in _PARTES_NOMBRE.findall(texto):
+                    if parte.isdigit():
+                        tokens.append(("numero", parte))
+                    else:
+                        tokens.append(("simbolo", _NOMBRES.get(parte.lower(), parte) if parte in "eE" else parte))
+        else:
+            tokens.append(("op", texto))
+    return tokens
+
+def _tokens_normalizados(expr_str: str):
+    """
+    Devuelve (tokens, aplicacion_implicita): los tokens con todas las
+    multiplicaciones implícitas escritas (2x -> 2*x, x(x+1) -> x*(x+1),
+    (a)(b) -> (a)*(b)) y si alguna función se aplica sin paréntesis (sin x),
+    que es lo único que todavía necesita las transformaciones de SymPy.
+    """
+    salida = []
+    aplicacion_implicita = False
+    anterior = None
+    for token in _tokens(expr_str):
+        clase, texto = token
+        empieza = clase in ("numero", "simbolo", "funcion") or texto == "("
+        if anterior is not None:
+            clase_ant, texto_ant = anterior
+            if clase_ant == "funcion":
+                if texto != "(":
+                    aplicacion_implicita = True
+            elif empieza and (clase_ant in ("numero", "simbolo") or texto_ant == ")"):
+                salida.append(("op", "*"))
+        salida.append(token)
+        anterior = token
+    return salida, aplicacion_implicita
+
+def _texto_normalizado(expr_str: str):
+    """
+    Devuelve (texto, aplicacion_implicita) con el texto canónico de _tokens_normalizados.
+    """
+    tokens, aplicacion_implicita = _tokens_normalizados(expr_str)
+    partes = []
+    for _, texto in tokens:
+        if partes and texto[0].isalnum() and partes[-1][-1].isalnum():
+            partes.append(" ")
+        partes.append(texto)
+    return "".join(partes), aplicacion_implicita
+
 def preprocess_math_expr(expr_str: str):
     """
-    Preprocesa la expresión matemática:
-    - Corrige nombres de funciones trigonométricas a minúscula (sec, csc, cot, etc).
-    - Reemplaza abs( por Abs(
-    - Soporta 'π' como 'pi'
-    - Soporta PI/E en cualquier capitalización
-    - Inserta * entre número y pi o e, por ejemplo 2pi -> 2*pi
-    """
-    expr_str = re.sub(r'\bSEC\b', 'sec', expr_str, flags=re.IGNORECASE)
-    expr_str = re.sub(r'\bCSC\b', 'csc', expr_str, flags=re.IGNORECASE)
-    expr_str = re.sub(r'\bCOT\b', 'cot', expr_str, flags=re.IGNORECASE)
-    expr_str = re.sub(r'\bSIN\b', 'sin', expr_str, flags=re.IGNORECASE)
-    expr_str = re.sub(r'\bCOS\b', 'cos', expr_str, flags=re.IGNORECASE)
-    expr_str = re.sub(r'\bTAN\b', 'tan', expr_str, flags=re.IGNORECASE)
-    expr_str = re.sub(r'\bABS\s*\(', 'Abs(', expr_str, flags=re.IGNORECASE)
-    expr_str = expr_str.replace('π', 'pi')
-    expr_str = re.sub(r'\bPI\b', 'pi', expr_str, flags=re.IGNORECASE)
-    expr_str = re.sub(r'\bE\b', 'e', expr_str, flags=re.IGNORECASE)
-    # Inserta * entre número y pi o e (por ejemplo 2pi -> 2*pi, 3e -> 3*e)
-    expr_str = re.sub(r'(\d)(pi|e)\b', r'\1*\2', expr_str)
-    return expr_str
+    Normaliza la expresión matemática en una sola pasada (ver _tokens):
+    - Nombres de funciones en cualquier capitalización (SIN, Sec, ABS -> sin, sec, Abs)
+    - 'π', PI y E en cualquier capitalización
+    - Multiplicación implícita explícita: 2x, 2pi, xy, x(x+1), (x+1)(x-1)
+    - ^ como potencia
+    """
+    return _texto_normalizado(expr_str)[0]
+
+# Compilador numérico restringido: convierte los tokens normalizados en un árbol
+# pequeño y de ahí en funciones NumPy, sin pasar por parse_expr (que hace eval de
+# código generado) ni por lambdify. Solo acepta números, las variables pedidas,
+# pi, e y las funciones de esta tabla; cualquier otra cosa es ExpresionNoSoportada
+# y se compila por la vía de SymPy.
+_FUNCIONES_NUMPY = {
+    "sin": np.sin, "cos": np.cos, "tan": np.tan,
+    "log": np.log, "exp": np.exp, "sqrt": np.sqrt,
+    "sec": lambda v: 1.0 / np.cos(v), "csc": lambda v: 1.0 / np.sin(v), "cot": lambda v: 1.0 / np.tan(v),
+    "asin": np.arcsin, "acos": np.arccos, "atan": np.arctan,
+    "Abs": np.abs,
+}
+_CONSTANTES_NUMPY = {"pi": np.pi, "e": np.e}
+# Exponentes constantes con ufunc propia, bastante más rápida que np.power
+_POTENCIAS_RAPIDAS = {2.0: np.square, 0.5: np.sqrt, -1.0: lambda v: 1.0 / v}
+# Los operadores de Python (y no np.add, np.multiply...) dejan que NumPy reutilice
+# los temporales intermedios; la potencia general sigue con np.power para que un
+# escalar negativo con exponente fraccionario dé nan y no un complejo
+_OPERADORES = {"+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv, "**": np.power}
+
+
+class ExpresionNoSoportada(ValueError):
+    pass
+
+
+class _Analizador:
+    """
+    Descenso recursivo sobre los tokens de _tokens_normalizados:
+        suma     := producto (('+' | '-') producto)*
+        producto := unario (('*' | '/') unario)*
+        unario   := ('+' | '-') unario | potencia
+        potencia := atomo ('**' unario)?
+        atomo    := numero | simbolo | funcion '(' suma ')' | '(' suma ')'
+    Nodos: ("num", valor), ("var", indice), ("neg", a), ("op", operador, a, b)
+    y ("fun", nombre, a). Las subexpresiones constantes se evalúan al analizar.
+    """
+
+    def __init__(self, tokens, variables):
+        self.tokens = tokens
+        self.pos = 0
+        self.indices = {nombre: i for i, nombre in enumerate(variables)}
+
+    def _actual(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _espera(self, texto):
+        if self._actual() != ("op", texto):
+            raise ExpresionNoSoportada(f"Se esperaba '{texto}'")
+        self.pos += 1
+
+    def analizar(self):
+        nodo = self._suma()
+        if self.pos != len(self.tokens):
+            raise ExpresionNoSoportada(f"Token inesperado: {self._actual()[1]}")
+        return nodo
+
+    def _binario(self, operador, a, b):
+        if a[0] == "num" and b[0] == "num":
+            with np.errstate(all="ignore"):
+                return ("num", float(_OPERADORES[operador](a[1], b[1])))
+        return ("op", operador, a, b)
+
+    def _suma(self):
+        nodo = self._producto()
+        while self._actual() in (("op", "+"), ("op", "-")):
+            self.pos += 1
+            nodo = self._binario(self.tokens[self.pos - 1][1], nodo, self._producto())
+        return nodo
+
+    def _producto(self):
+        nodo = self._unario()
+        while self._actual() in (("op", "*"), ("op", "/")):
+            self.pos += 1
+            nodo = self._binario(self.tokens[self.pos - 1][1], nodo, self._unario())
+        return nodo
+
+    def _unario(self):
+        actual = self._actual()
+        if actual in (("op", "+"), ("op", "-")):
+            self.pos += 1
+            nodo = self._unario()
+            if actual[1] == "+":
+                return nodo
+            return ("num", -nodo[1]) if nodo[0] == "num" else ("neg", nodo)
+        return self._potencia()
+
+    def _potencia(self):
+        base = self._atomo()
+        if self._actual() == ("op", "**"):
+            self.pos += 1
+            return self._binario("**", base, self._unario())
+        return base
+
+    def _atomo(self):
+        clase, texto = self._actual()
+        self.pos += 1
+        if clase == "numero":
+            return ("num", float(texto))
+        if clase == "simbolo":
+            if texto in self.indices:
+                return ("var", self.indices[texto])
+            if texto in _CONSTANTES_NUMPY:
+                return ("num", _CONSTANTES_NUMPY[texto])
+            raise ExpresionNoSoportada(f"Símbolo no permitido: {texto}")
+        if clase == "funcion" and texto in _FUNCIONES_NUMPY:
+            self._espera("(")
+            argumento = self._suma()
+            self._espera(")")
+            if argumento[0] == "num":
+                with np.errstate(all="ignore"):
+                    return ("num", float(_FUNCIONES_NUMPY[texto](argumento[1])))
+            return ("fun", texto, argumento)
+        if (clase, texto) == ("op", "("):
+            nodo = self._suma()
+            self._espera(")")
+            return nodo
+        raise ExpresionNoSoportada(f"Token no soportado: {texto}")
+
+
+def _emitir(nodo):
+    # Cierre que evalúa el nodo sobre la tupla de argumentos
+    tipo = nodo[0]
+    if tipo == "num":
+        valor = nodo[1]
+        return lambda args: valor
+    if tipo == "var":
+        indice = nodo[1]
+        return lambda args: args[indice]
+    if tipo == "neg":
+        a = _emitir(nodo[1])
+        return lambda args: -a(args)
+    if tipo == "fun":
+        g, a = _FUNCIONES_NUMPY[nodo[1]], _emitir(nodo[2])
+        return lambda args: g(a(args))
+    if nodo[1] == "**" and nodo[3][0] == "num" and nodo[3][1] in _POTENCIAS_RAPIDAS:
+        g, a = _POTENCIAS_RAPIDAS[nodo[3][1]], _emitir(nodo[2])
+        return lambda args: g(a(args))
+    operador, a, b = _OPERADORES[nodo[1]], _emitir(nodo[2]), _emitir(nodo[3])
+    return lambda args: operador(a(args), b(args))
+
+
+def analizar_numerica(expr_str: str, variables):
+    """
+    Árbol de la expresión para el compilador restringido.
+    Lanza ExpresionNoSoportada si usa algo fuera de la lista blanca.
+    """
+    tokens, aplicacion_implicita = _tokens_normalizados(str(expr_str))
+    if aplicacion_implicita:
+        raise ExpresionNoSoportada("Función aplicada sin paréntesis")
+    if not tokens:
+        raise ExpresionNoSoportada("La expresión está vacía.")
+    return _Analizador(tokens, [str(v) for v in variables]).analizar()
+
+def normalizar_numerica(expr_str: str, variables):
+    """
+    Valida una expresión de usuario con el compilador restringido, sin SymPy.
+    Devuelve su valor (float) si no depende de las variables, su texto canónico
+    (ver preprocess_math_expr) si depende de ellas, o None si necesita la vía de
+    SymPy: funciones o símbolos fuera de la lista blanca, o un valor no finito.
+    """
+    try:
+        nodo = analizar_numerica(expr_str, variables)
+    except (ExpresionNoSoportada, ArithmeticError):
+        return None
+    if nodo[0] == "num":
+        return nodo[1] if np.isfinite(nodo[1]) else None
+    return preprocess_math_expr(expr_str)
+
+# Cachés de expresiones compartidas por los endpoints y los módulos de cálculo.
+# _cache_expresiones: texto de usuario -> expresión SymPy ya parseada
+# _cache_funciones: (texto, variables) -> función NumPy generada con lambdify
+EXPRESIONES_CACHE_TAMANO = int(os.environ.get("EXPRESIONES_CACHE_TAMANO", 512))
+EXPRESIONES_CACHE_TTL = float(os.environ.get("EXPRESIONES_CACHE_TTL", 3600))
+_cache_expresiones = CacheLRU(EXPRESIONES_CACHE_TAMANO, EXPRESIONES_CACHE_TTL)
+_cache_funciones = CacheLRU(EXPRESIONES_CACHE_TAMANO, EXPRESIONES_CACHE_TTL)
+# _cache_numericas: (texto, variables) -> función NumPy del compilador restringido
+_cache_numericas = CacheLRU(EXPRESIONES_CACHE_TAMANO, EXPRESIONES_CACHE_TTL)
+# _cache_limites: (límite, variables) -> FuncionLimite, compartida por integrales y gráficas
+_cache_limites = CacheLRU(EXPRESIONES_CACHE_TAMANO, EXPRESIONES_CACHE_TTL)
+
+# Las funciones *_sin_cache solo corren en un fallo de caché: sus etapas
+# (preproceso, parseo, lambdify, compilacion) miden el coste real de cada una.
+def _parse_sin_cache(expr_str: str):
+    with etapa("preproceso"):
+        expr_str = preprocess_math_expr(expr_str)
+        expr_str = expr_str.replace("^", "**")  # Compatibilidad con ^ como potencia
+    with etapa("parseo"):
+        return parse_expr(
+            expr_str,
+            transformations=TRANSFORM,
+            local_dict=sympy_func_dict
+        )
+
+def _lambdify_sin_cache(expr, variables):
+    with etapa("lambdify"):
+        return sympy.lambdify(tuple(variables), expr, modules=["numpy"])
+
+def obtener_expresion(expr_str: str):
+    """
+    Devuelve la expresión SymPy de un texto de usuario, usando la caché compartida.
+    A diferencia de parse_math_expr, acepta expresiones que son solo un número
+    (útil para límites de integración).
+    """
+    if expr_str is None or str(expr_str).strip() == "":
+        raise ValueError("La expresión está vacía.")
+    expr_str = str(expr_str)
+    return _cache_expresiones.obtener_o_calcular(expr_str, lambda: _parse_sin_cache(expr_str))
+
+def compilar_expresion(expr_str: str, variables):
+    """
+    Devuelve (expr, f): la expresión SymPy y su función NumPy en las variables dadas.
+    Ambas se guardan en la caché compartida, con clave (texto, nombres de variables).
+    """
+    expr = obtener_expresion(expr_str)
+    clave = (str(expr_str), tuple(str(v) for v in variables))
+    f = _cache_funciones.obtener_o_calcular(clave, lambda: _lambdify_sin_cache(expr, variables))
+    return expr, f
+
+class FuncionNumerica:
+    """
+    Función NumPy del compilador restringido. Guarda el árbol (`nodo`) y el
+    número de variables para que otras etapas (p. ej. el JIT) puedan volver a
+    compilarla sin reparsear el texto.
+    """
+    __slots__ = ("nodo", "aridad", "_raiz")
+
+    def __init__(self, nodo, aridad):
+        self.nodo = nodo
+        self.aridad = aridad
+        self._raiz = _emitir(nodo)
+
+    def __call__(self, *args):
+        return self._raiz(args)
+
+def _compilar_numerica_sin_cache(expr_str: str, variables):
+    try:
+        with etapa("compilacion"):
+            return FuncionNumerica(analizar_numerica(expr_str, variables), len(variables))
+    except ExpresionNoSoportada:
+        return compilar_expresion(expr_str, variables)[1]
+
+def compilar_numerica(expr_str: str, variables):
+    """
+    Devuelve solo la función NumPy de la expresión en las variables dadas.
+    Usa el compilador restringido, sin SymPy; si la expresión necesita algo que
+    este no conoce (otras funciones, sin x), usa compilar_expresion.
+    Para títulos LaTeX o análisis simbólico hace falta compilar_expresion.
+    """
+    clave = (str(expr_str), tuple(str(v) for v in variables))
+    return _cache_numericas.obtener_o_calcular(clave, lambda: _compilar_numerica_sin_cache(expr_str, variables))
+
+class FuncionLimite:
+    """
+    Límite de integración compilado una sola vez y evaluable sobre arreglos.
+    Con argumentos escalares devuelve un float; con arreglos devuelve un arreglo
+    con la forma común de los argumentos (los límites constantes se expanden
+    por broadcast, sin copiar). `constante` es el valor del límite si no depende
+    de las variables, o None.
+    """
+    __slots__ = ("constante", "_f")
+
+    def __init__(self, constante=None, f=None):
+        self.constante = constante
+        self._f = f
+
+    def __call__(self, *args):
+        if self.constante is not None:
+            vals = self.constante
+        else:
+            with np.errstate(all="ignore"):
+                vals = self._f(*args)
+        if all(np.ndim(a) == 0 for a in args):
+            return float(vals)
+        forma = np.broadcast_shapes(*(np.shape(a) for a in args))
+        return np.broadcast_to(np.asarray(vals, dtype=float), forma)
+
+
+def _compilar_limite_sin_cache(valor, variables):
+    if isinstance(valor, (float, int)):
+        return FuncionLimite(float(valor))
+    texto = str(valor)
+    try:
+        nodo = analizar_numerica(texto, variables)
+    except ExpresionNoSoportada:
+        expr = obtener_expresion(texto)
+        if not expr.free_symbols:
+            return FuncionLimite(float(expr.evalf()))
+        return FuncionLimite(None, compilar_expresion(texto, variables)[1])
+    if nodo[0] == "num":
+        if not np.isfinite(nodo[1]):
+            raise ValueError(f"Límite no finito: {texto}")
+        return FuncionLimite(nodo[1])
+    raiz = _emitir(nodo)
+    return FuncionLimite(None, lambda *args: raiz(args))
+
+def compilar_limite(valor, variables):
+    """
+    Devuelve la FuncionLimite de un límite (número o texto) en las variables dadas.
+    Se parsea y compila una vez por (límite, variables); las llamadas siguientes,
+    desde el cálculo o desde las gráficas, reutilizan la misma función.
+    """
+    clave = (repr(valor) if isinstance(valor, float) else str(valor), tuple(str(v) for v in variables))
+    return _cache_limites.obtener_o_calcular(clave, lambda: _compilar_limite_sin_cache(valor, variables))
+
+def estadisticas_cache_expresiones():
+    return {
+        "expresiones": _cache_expresiones.estadisticas(),
+        "funciones": _cache_funciones.estadisticas(),
+        "numericas": _cache_numericas.estadisticas(),
+        "limites": _cache_limites.estadisticas(),
+    }
 
 def parse_math_expr(expr_str: str):
     """
@@ -51,14 +447,8 @@ def parse_math_expr(expr_str: str):
     """
     if expr_str is None or expr_str.strip() == "":
         raise ValueError("La expresión está vacía.")
-    expr_str = preprocess_math_expr(expr_str)
-    expr_str = expr_str.replace("^", "**")  # Compatibilidad con ^ como potencia
     try:
-        expr = parse_expr(
-            expr_str,
-            transformations=TRANSFORM,
-            local_dict=sympy_func_dict
-        )
+        expr = obtener_expresion(expr_str)
         # Validación: no aceptar expresiones vacías ni solo números
         if expr is None or (expr.is_Number and expr.free_symbols == set()):
             raise ValueError("La expresión no es válida o es solo un número.")
@@ -68,12 +458,25 @@ def parse_math_expr(expr_str: str):
 
 def validar_expr_con_variables(expr_str: str, variables_permitidas: set):
     """
-    Valida que una expresión solo contenga variables permitidas.
-    Lanza excepción si no se cumple.
+    Valida que una expresión solo contenga variables permitidas y devuelve su
+    texto canónico. Las variables se comprueban en el árbol del compilador
+    restringido; SymPy (parse_expr) solo se usa si este no acepta la expresión
+    o si es constante (ver parse_math_expr). Lanza excepción si no se cumple.
     """
-    expr = parse_math_expr(expr_str)
-    usadas = {str(s) for s in expr.free_symbols}
-    no_permitidas = usadas - set(variables_permitidas)
+    if expr_str is None or expr_str.strip() == "":
+        raise ValueError("La expresión está vacía.")
+    texto = normalizar_numerica(expr_str, sorted(variables_permitidas))
+    if isinstance(texto, str):
+        return texto
+    # Los símbolos que SymPy no conoce serían variables libres: se rechazan sin parsear
+    no_permitidas = {
+        nombre for clase, nombre in _tokens(expr_str)
+        if clase == "simbolo" and nombre not in variables_permitidas
+        and nombre not in _CONSTANTES and nombre not in _NOMBRES_SYMPY
+    }
+    if not no_permitidas:
+        expr = parse_math_expr(expr_str)
+        no_permitidas = {str(s) for s in expr.free_symbols} - set(variables_permitidas)
     if no_permitidas:
-        raise ValueError(f"Variables no permitidas: {', '.join(no_permitidas)}")
-    return expr
\ No newline at end of file
+        raise ValueError(f"Variables no permitidas: {', '.join(sorted(no_permitidas))}")
+    return str(expr)
\ No newline at end of file
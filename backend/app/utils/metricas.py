@@ -0,0 +1,170 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Métricas del servicio en formato de texto de Prometheus (GET /metrics).
+# Los contadores e histogramas viven en memoria del proceso principal. Lo que
+# se mide dentro de un worker del pool se acumula durante el trabajo (ver
+# capturar) y vuelve al proceso principal junto con el resultado, igual que
+# la métrica de cada gráfica.
+
+# Límites superiores (segundos) de los buckets de los histogramas de duración
+BUCKETS_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _etiquetas(etiquetas: dict):
+    return tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+def _texto_etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ""
+    escapar = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escapar(v)}"' for k, v in pares) + "}"
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Registro:
+    """
+    Contadores e histogramas con etiquetas, seguros entre hilos. Los valores
+    calculados al vuelo (tamaño de las cachés, trabajos en vuelo) se añaden con
+    colectores: funciones que devuelven [(nombre, tipo, ayuda, [(etiquetas, valor)])].
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores = {}
+        self._histogramas = {}
+        self._ayudas = {}
+        self._colectores = []
+
+    def describir(self, nombre, ayuda):
+        self._ayudas[nombre] = ayuda
+
+    def colector(self, funcion):
+        self._colectores.append(funcion)
+        return funcion
+
+    def _contar(self, nombre, etiquetas, valor):
+        with self._lock:
+            clave = (nombre, etiquetas)
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+
+    def _observar(self, nombre, etiquetas, valor):
+        with self._lock:
+            clave = (nombre, etiquetas)
+            h = self._histogramas.get(clave)
+            if h is None:
+                h = self._histogramas[clave] = [0] * len(BUCKETS_SEGUNDOS) + [0.0, 0]
+            for i, limite in enumerate(BUCKETS_SEGUNDOS):
+                if valor <= limite:
+                    h[i] += 1
+                    break
+            h[-2] += valor
+            h[-1] += 1
+
+    def incorporar(self, medidas):
+        """Suma las medidas capturadas en un worker (ver capturar)."""
+        for clase, nombre, etiquetas, valor in medidas or ():
+            if clase == "contador":
+                self._contar(nombre, etiquetas, valor)
+            else:
+                self._observar(nombre, etiquetas, valor)
+
+    def exportar(self) -> str:
+        with self._lock:
+            contadores = dict(self._contadores)
+            histogramas = {clave: list(h) for clave, h in self._histogramas.items()}
+        lineas = []
+
+        def cabecera(nombre, tipo, ayuda=None):
+            lineas.append(f"# HELP {nombre} {ayuda or self._ayudas.get(nombre, nombre)}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+
+        for nombre in sorted({n for n, _ in contadores}):
+            cabecera(nombre, "counter")
+            for (n, etiquetas), valor in sorted(contadores.items()):
+                if n == nombre:
+                    lineas.append(f"{nombre}{_texto_etiquetas(etiquetas)} {_numero(valor)}")
+        for nombre in sorted({n for n, _ in histogramas}):
+            cabecera(nombre, "histogram")
+            for (n, etiquetas), h in sorted(histogramas.items()):
+                if n != nombre:
+                    continue
+                acumulado = 0
+                for limite, cuenta in zip(BUCKETS_SEGUNDOS, h):
+                    acumulado += cuenta
+                    lineas.append(f"{nombre}_bucket{_texto_etiquetas(etiquetas, (('le', _numero(limite)),))} {acumulado}")
+                lineas.append(f"{nombre}_bucket{_texto_etiquetas(etiquetas, (('le', '+Inf'),))} {h[-1]}")
+                lineas.append(f"{nombre}_sum{_texto_etiquetas(etiquetas)} {_numero(h[-2])}")
+                lineas.append(f"{nombre}_count{_texto_etiquetas(etiquetas)} {h[-1]}")
+        for colector in self._colectores:
+            for nombre, tipo, ayuda, muestras in colector():
+                cabecera(nombre, tipo, ayuda)
+                for etiquetas, valor in muestras:
+                    lineas.append(f"{nombre}{_texto_etiquetas(_etiquetas(etiquetas))} {_numero(valor)}")
+        return "\n".join(lineas) + "\n"
+
+
+registro = Registro()
+registro.describir("integrales_etapa_segundos", "Duración de cada etapa del cálculo y de las gráficas.")
+registro.describir("integrales_errores_total", "Errores por etapa y clase de excepción.")
+registro.describir("integrales_calculos_total", "Integrales calculadas por tipo, método y resultado.")
+registro.describir("integrales_evaluaciones_total", "Evaluaciones del integrando por tipo y método.")
+registro.describir("integrales_trabajo_segundos", "Duración de los trabajos del pool, espera en cola incluida.")
+registro.describir("integrales_http_segundos", "Latencia de las peticiones HTTP por ruta y código de estado.")
+registro.describir("integrales_coalescidas_total",
+                   "Peticiones que esperaron un cálculo idéntico en curso, en este proceso (local) o en otro (proceso).")
+
+# Medidas pendientes del trabajo que corre en este hilo; None fuera de capturar()
+_local = threading.local()
+
+
+def contar(nombre, valor=1, **etiquetas):
+    medidas = getattr(_local, "medidas", None)
+    if medidas is not None:
+        medidas.append(("contador", nombre, _etiquetas(etiquetas), valor))
+    else:
+        registro._contar(nombre, _etiquetas(etiquetas), valor)
+
+
+def observar(nombre, valor, **etiquetas):
+    medidas = getattr(_local, "medidas", None)
+    if medidas is not None:
+        medidas.append(("histograma", nombre, _etiquetas(etiquetas), valor))
+    else:
+        registro._observar(nombre, _etiquetas(etiquetas), valor)
+
+
+@contextmanager
+def capturar():
+    """
+    Acumula en una lista las medidas del hilo en lugar de registrarlas, para
+    devolverlas con el resultado de un trabajo del pool.
+    """
+    anteriores = getattr(_local, "medidas", None)
+    _local.medidas = medidas = []
+    try:
+        yield medidas
+    finally:
+        _local.medidas = anteriores
+
+
+@contextmanager
+def etapa(nombre, **etiquetas):
+    """
+    Mide la duración del bloque en integrales_etapa_segundos{etapa=nombre}.
+    Si el bloque lanza una excepción, la cuenta en integrales_errores_total
+    con su clase y la deja pasar.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        contar("integrales_errores_total", etapa=nombre, clase=type(e).__name__)
+        raise
+    finally:
+        observar("integrales_etapa_segundos", time.perf_counter() - inicio, etapa=nombre, **etiquetas)
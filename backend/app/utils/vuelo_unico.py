@@ -0,0 +1,126 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin coordinación entre procesos
+    fcntl = None
+
+from app.utils.metricas import contar
+
+log = logging.getLogger(__name__)
+
+# Un solo cálculo en curso por clave ("single-flight"): las peticiones idénticas
+# que llegan mientras se calcula esperan ese cálculo en lugar de lanzar otro.
+# Dentro de un proceso basta un futuro por clave. El pool de procesos solo
+# recibe trabajo del proceso principal, así que tampoco ahí se duplica. Entre
+# procesos del servidor en la misma máquina (uvicorn --workers N), quien
+# calcula tiene un flock sobre VUELO_UNICO_DIR/<clave>.lock; los demás esperan
+# a que lo suelte y leen el resultado de la caché compartida (SQLite).
+# VUELO_UNICO_DIR vacío desactiva la coordinación entre procesos.
+VUELO_UNICO_DIR = os.environ.get("VUELO_UNICO_DIR", "cache/vuelos")
+# Espera máxima (segundos) al cálculo de otro proceso antes de calcular por cuenta propia
+VUELO_UNICO_ESPERA = float(os.environ.get("VUELO_UNICO_ESPERA", 60))
+# Cada cuánto se reintenta el flock mientras otro proceso calcula
+_INTERVALO_CERROJO = 0.05
+
+
+class VueloUnico:
+    def __init__(self, directorio=VUELO_UNICO_DIR, espera=VUELO_UNICO_ESPERA):
+        self.directorio = directorio if directorio and fcntl is not None else None
+        self.espera = espera
+        self._lock = threading.Lock()
+        self._en_vuelo = {}
+        self.calculos = 0
+        self.coalescidas = {"local": 0, "proceso": 0}
+
+    async def ejecutar(self, clave: str, calcular, consultar=None):
+        """
+        Devuelve await calcular(), con un solo cálculo por clave a la vez: las
+        llamadas con la misma clave que llegan mientras tanto, desde cualquier
+        hilo del proceso, reciben el mismo resultado o la misma excepción.
+        Si otro proceso está calculando la clave, espera a que termine y
+        devuelve consultar() si no es None. Cancelar una espera no cancela el cálculo.
+        """
+        with self._lock:
+            futuro = self._en_vuelo.get(clave)
+            lider = futuro is None
+            if lider:
+                futuro = self._en_vuelo[clave] = concurrent.futures.Future()
+        if not lider:
+            self._coalescida("local")
+            return await asyncio.shield(asyncio.wrap_future(futuro))
+
+        tarea = asyncio.ensure_future(self._calcular(clave, calcular, consultar))
+        tarea.add_done_callback(lambda t: self._terminar(clave, futuro, t))
+        return await asyncio.shield(tarea)
+
+    def _terminar(self, clave, futuro, tarea):
+        # Se quita antes de publicar el resultado: quien llegue después ya lo encuentra en caché
+        with self._lock:
+            self._en_vuelo.pop(clave, None)
+        if tarea.cancelled():
+            futuro.cancel()
+        elif tarea.exception() is not None:
+            futuro.set_exception(tarea.exception())
+        else:
+            futuro.set_result(tarea.result())
+
+    def _coalescida(self, origen):
+        with self._lock:
+            self.coalescidas[origen] += 1
+        contar("integrales_coalescidas_total", origen=origen)
+
+    async def _calcular_aqui(self, calcular):
+        with self._lock:
+            self.calculos += 1
+        return await calcular()
+
+    async def _calcular(self, clave, calcular, consultar):
+        if self.directorio is None:
+            return await self._calcular_aqui(calcular)
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = os.path.join(self.directorio, hashlib.sha256(clave.encode("utf-8")).hexdigest()[:32] + ".lock")
+        fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            # Sin bloquear el event loop: se reintenta el flock cada _INTERVALO_CERROJO
+            esperado = cerrojo = False
+            limite = time.monotonic() + self.espera
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    cerrojo = True
+                    break
+                except BlockingIOError:
+                    esperado = True
+                    if time.monotonic() > limite:
+                        log.warning("Otro proceso lleva más de %.0f s calculando %s; se calcula aquí también",
+                                    self.espera, clave)
+                        break
+                    await asyncio.sleep(_INTERVALO_CERROJO)
+            if esperado and consultar is not None:
+                valor = consultar()
+                if valor is not None:
+                    self._coalescida("proceso")
+                    return valor
+            return await self._calcular_aqui(calcular)
+        finally:
+            # Borra el archivo solo si tiene el cerrojo y sigue siendo el suyo (otro proceso pudo recrearlo)
+            try:
+                if cerrojo and os.stat(ruta).st_ino == os.fstat(fd).st_ino:
+                    os.unlink(ruta)
+            except OSError:
+                pass
+            os.close(fd)
+
+    def estadisticas(self):
+        with self._lock:
+            return {"en_curso": len(self._en_vuelo), "calculos": self.calculos, "coalescidas": dict(self.coalescidas)}
+
+
+vuelo_unico = VueloUnico()
@@ -0,0 +1,178 @@
+"""
+Generador de carga: repite contra un servidor en marcha el tráfico capturado
+con CAPTURA_TRAFICO (app.utils.captura_trafico) o cualquier JSONL con líneas
+{"t": segundos, "ruta": "/doble", "cuerpo": {...}}.
+
+Dos ritmos:
+  - original (por defecto): respeta los intervalos entre las marcas t,
+    acelerados por --velocidad (2 = el doble de rápido);
+  - --tasa N: N peticiones por segundo a intervalo fijo.
+Es de lazo abierto: cada petición sale a su hora aunque las anteriores no
+hayan respondido (hasta --concurrencia en vuelo) y la latencia se mide desde
+esa hora prevista, así que la espera en el propio cliente también cuenta. Si
+el cliente no llega a enviar a tiempo, lo indica el retraso máximo del informe.
+
+Informe: peticiones por segundo, latencias p50/p90/p99/máx, tasa de errores
+(respuestas no 2xx y fallos de conexión) y el mismo desglose por ruta.
+
+Uso, desde backend/, con el servidor arrancado (uvicorn app.main:app):
+    python -m benchmarks.carga captura.jsonl [--url http://127.0.0.1:8000]
+                               [--tasa 20 | --velocidad 1] [--limite N]
+                               [--concurrencia 256] [--timeout 60] [--salida informe.json]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import Counter
+
+
+def cargar(ruta, limite=None):
+    """Devuelve (peticiones ordenadas por t, líneas ignoradas)."""
+    peticiones, ignoradas = [], 0
+    with open(ruta, encoding="utf-8") as archivo:
+        for linea in archivo:
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                registro = json.loads(linea)
+            except ValueError:
+                ignoradas += 1
+                continue
+            if (not isinstance(registro, dict) or not isinstance(registro.get("ruta"), str)
+                    or not isinstance(registro.get("cuerpo"), (dict, list))):
+                ignoradas += 1
+                continue
+            peticiones.append(registro)
+    peticiones.sort(key=lambda p: p.get("t", 0))
+    return peticiones[:limite] if limite else peticiones, ignoradas
+
+
+def programa(peticiones, tasa=None, velocidad=1.0):
+    """Segundos desde el inicio a los que sale cada petición."""
+    if tasa:
+        return [i / tasa for i in range(len(peticiones))]
+    t0 = peticiones[0].get("t", 0) if peticiones else 0
+    return [(p.get("t", t0) - t0) / velocidad for p in peticiones]
+
+
+async def repetir(peticiones, horas, url, concurrencia=256, timeout=60.0):
+    """
+    Envía cada petición a su hora. Devuelve (medidas, duración, retraso máximo
+    del cliente), con medidas = [(ruta, estado o nombre del error, segundos)].
+    """
+    import httpx
+
+    semaforo = asyncio.Semaphore(concurrencia)
+    medidas = []
+    retraso = 0.0
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limites) as cliente:
+        inicio = time.perf_counter()
+
+        async def enviar(peticion, hora):
+            async with semaforo:
+                try:
+                    respuesta = await cliente.post(peticion["ruta"], json=peticion["cuerpo"])
+                    estado = respuesta.status_code
+                except httpx.HTTPError as e:
+                    estado = type(e).__name__
+            medidas.append((peticion["ruta"], estado, time.perf_counter() - (inicio + hora)))
+
+        tareas = []
+        for peticion, hora in zip(peticiones, horas):
+            espera = inicio + hora - time.perf_counter()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            else:
+                retraso = max(retraso, -espera)
+            tareas.append(asyncio.ensure_future(enviar(peticion, hora)))
+        await asyncio.gather(*tareas)
+        duracion = time.perf_counter() - inicio
+    return medidas, duracion, retraso
+
+
+def _percentil(ordenados, q):
+    return ordenados[min(int(q * len(ordenados)), len(ordenados) - 1)]
+
+
+def _resumen(medidas, duracion):
+    latencias = sorted(segundos for _, _, segundos in medidas)
+    estados = Counter(str(estado) for _, estado, _ in medidas)
+    errores = sum(n for estado, n in estados.items() if not estado.startswith("2"))
+    return {
+        "peticiones": len(medidas),
+        "por_segundo": len(medidas) / duracion if duracion > 0 else None,
+        "errores": errores,
+        "tasa_errores": errores / len(medidas),
+        "p50_ms": 1e3 * _percentil(latencias, 0.50),
+        "p90_ms": 1e3 * _percentil(latencias, 0.90),
+        "p99_ms": 1e3 * _percentil(latencias, 0.99),
+        "max_ms": 1e3 * latencias[-1],
+        "estados": dict(sorted(estados.items())),
+    }
+
+
+def informe(medidas, duracion, retraso):
+    rutas = sorted({ruta for ruta, _, _ in medidas})
+    return {
+        "duracion_s": duracion,
+        "retraso_cliente_max_ms": 1e3 * retraso,
+        "total": _resumen(medidas, duracion) if medidas else {"peticiones": 0},
+        "rutas": {ruta: _resumen([m for m in medidas if m[0] == ruta], duracion) for ruta in rutas},
+    }
+
+
+def _imprimir(datos):
+    print(f"Duración {datos['duracion_s']:.2f} s, retraso máximo del cliente {datos['retraso_cliente_max_ms']:.1f} ms")
+    print(f"  {'ruta':<12}{'peticiones':>11}{'pet/s':>9}{'errores':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'máx ms':>10}")
+    for nombre, r in [("total", datos["total"])] + list(datos["rutas"].items()):
+        if not r["peticiones"]:
+            continue
+        print(f"  {nombre:<12}{r['peticiones']:>11}{r['por_segundo']:>9.1f}{100 * r['tasa_errores']:>8.1f}%"
+              f"{r['p50_ms']:>10.1f}{r['p90_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}")
+    estados = datos["total"].get("estados", {})
+    if any(not e.startswith("2") for e in estados):
+        print("  Estados: " + ", ".join(f"{e}: {n}" for e, n in estados.items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("archivo", help="JSONL con las peticiones capturadas")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="servidor contra el que repetir")
+    ritmo = parser.add_mutually_exclusive_group()
+    ritmo.add_argument("--tasa", type=float, help="peticiones por segundo a intervalo fijo")
+    ritmo.add_argument("--velocidad", type=float, default=1.0, help="factor sobre el ritmo original")
+    parser.add_argument("--limite", type=int, help="repetir solo las N primeras peticiones")
+    parser.add_argument("--concurrencia", type=int, default=256, help="peticiones en vuelo como máximo")
+    parser.add_argument("--timeout", type=float, default=60.0, help="tiempo máximo por petición (s)")
+    parser.add_argument("--salida", help="archivo JSON donde guardar el informe")
+    args = parser.parse_args(argv)
+    if (args.tasa is not None and args.tasa <= 0) or args.velocidad <= 0:
+        parser.error("--tasa y --velocidad deben ser positivas")
+
+    peticiones, ignoradas = cargar(args.archivo, args.limite)
+    if ignoradas:
+        print(f"Aviso: {ignoradas} líneas sin ruta o cuerpo válidos se ignoran.", file=sys.stderr)
+    if not peticiones:
+        print("No hay peticiones que repetir.", file=sys.stderr)
+        return 1
+    horas = programa(peticiones, args.tasa, args.velocidad)
+    print(f"Repitiendo {len(peticiones)} peticiones en {horas[-1]:.1f} s contra {args.url}...", file=sys.stderr)
+
+    medidas, duracion, retraso = asyncio.run(
+        repetir(peticiones, horas, args.url, args.concurrencia, args.timeout)
+    )
+    datos = informe(medidas, duracion, retraso)
+    _imprimir(datos)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(datos, archivo, indent=2, ensure_ascii=False, sort_keys=True)
+            archivo.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Compara dos resultados de benchmarks.suite y marca las regresiones.
+
+Es regresión, para cada medida presente en las dos ejecuciones:
+  - evaluaciones o memoria_pico que crecen más que --umbral;
+  - error_abs que crece más de FACTOR_ERROR veces (y por encima de PISO_ERROR);
+  - un motor que convergía y deja de hacerlo, o que deja de dar resultado;
+  - un motor (o una variante de endpoint, fría o caliente) cuyo tiempo crece,
+    en media geométrica sobre todos sus casos, más que --umbral-tiempo.
+Sale con código 1 si hay alguna regresión.
+
+Uso, desde backend/:
+    python -m benchmarks.comparar benchmarks/baselines/referencia.json nuevo.json
+                                  [--umbral 0.1] [--umbral-tiempo 0.25] [--mejoras]
+
+Un tiempo suelto puede variar más de un 50 % entre dos ejecuciones en la misma
+máquina (frecuencia de la CPU, otros procesos), así que no se juzga caso a caso:
+una regresión real de un motor se nota en todos sus casos, el ruido no. Entre
+máquinas distintas solo son comparables las evaluaciones, la memoria y los errores.
+"""
+import argparse
+import json
+import math
+import sys
+
+# Diferencias de tiempo por debajo de esto (segundos) se consideran ruido
+RUIDO_TIEMPO = 1e-4
+# Memoria: diferencias por debajo de esto (bytes) se consideran ruido
+RUIDO_MEMORIA = 64 * 1024
+FACTOR_ERROR = 10.0
+PISO_ERROR = 1e-13
+
+# Medidas deterministas -> ruido absoluto
+MEDIDAS = {
+    "evaluaciones": 0,
+    "memoria_pico": RUIDO_MEMORIA,
+}
+# Medida de tiempo de cada sección -> escala a segundos
+TIEMPOS = {"motores": ("segundos", 1.0), "endpoints": ("p50_ms", 1e-3)}
+
+
+def _regresiones_medida(base, nuevo, umbral):
+    problemas = []
+    if "error" in nuevo and "error" not in base:
+        return [f"deja de dar resultado: {nuevo['error']}"]
+    for medida, ruido in MEDIDAS.items():
+        a, b = base.get(medida), nuevo.get(medida)
+        if a is None or b is None:
+            continue
+        if b > a * (1 + umbral) and b - a > ruido:
+            problemas.append(f"{medida} {a:.4g} -> {b:.4g} (+{(b / a - 1) * 100 if a else float('inf'):.0f}%)")
+    a, b = base.get("error_abs"), nuevo.get("error_abs")
+    if a is not None and (b is None or (b > FACTOR_ERROR * a and b > PISO_ERROR)):
+        problemas.append(f"error_abs {a:.2e} -> {b if b is None else format(b, '.2e')}")
+    if base.get("convergio") and nuevo.get("convergio") is False:
+        problemas.append("deja de converger")
+    return problemas
+
+
+def comparar(base, nuevo, umbral=0.1, umbral_tiempo=0.25):
+    """
+    Devuelve (regresiones, mejoras, ausentes): listas de (clave, detalle).
+    Los tiempos se agrupan por el último componente de la clave (el motor, con
+    todas las resoluciones de simpson_n juntas, o frio/caliente en los
+    endpoints); los casos por debajo de RUIDO_TIEMPO no
+    cuentan. Las mejoras son grupos cuyo tiempo baja más que umbral_tiempo.
+    """
+    regresiones, mejoras, ausentes = [], [], []
+    for seccion in ("motores", "endpoints"):
+        anteriores, actuales = base.get(seccion, {}), nuevo.get(seccion, {})
+        medida, escala = TIEMPOS[seccion]
+        razones = {}
+        for clave in sorted(anteriores):
+            if clave not in actuales:
+                if seccion in nuevo:
+                    ausentes.append((f"{seccion}/{clave}", "no está en la ejecución nueva"))
+                continue
+            a, b = anteriores[clave], actuales[clave]
+            for detalle in _regresiones_medida(a, b, umbral):
+                regresiones.append((f"{seccion}/{clave}", detalle))
+            if a.get(medida) and b.get(medida) and max(a[medida], b[medida]) * escala > RUIDO_TIEMPO:
+                razones.setdefault(clave.rsplit("/", 1)[-1].split("=")[0], []).append(b[medida] / a[medida])
+        for grupo, lista in sorted(razones.items()):
+            razon = math.exp(sum(math.log(r) for r in lista) / len(lista))
+            detalle = f"{medida} x{razon:.2f} (media geométrica de {len(lista)} casos)"
+            if razon > 1 + umbral_tiempo:
+                regresiones.append((f"{seccion}/*/{grupo}", detalle))
+            elif razon < 1 / (1 + umbral_tiempo):
+                mejoras.append((f"{seccion}/*/{grupo}", detalle))
+    return regresiones, mejoras, ausentes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base", help="JSON de la línea base")
+    parser.add_argument("nuevo", help="JSON de la ejecución a comparar")
+    parser.add_argument("--umbral", type=float, default=0.1,
+                        help="crecimiento relativo tolerado de evaluaciones y memoria (0.1 = 10%%)")
+    parser.add_argument("--umbral-tiempo", type=float, default=0.25,
+                        help="crecimiento relativo tolerado del tiempo de cada motor o variante de endpoint")
+    parser.add_argument("--mejoras", action="store_true", help="listar también los tiempos que mejoran")
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as archivo:
+        base = json.load(archivo)
+    with open(args.nuevo, encoding="utf-8") as archivo:
+        nuevo = json.load(archivo)
+    if base.get("entorno") != nuevo.get("entorno"):
+        print("Aviso: las dos ejecuciones son de entornos distintos; los tiempos no son comparables del todo.")
+
+    regresiones, mejoras, ausentes = comparar(base, nuevo, args.umbral, args.umbral_tiempo)
+    secciones = [("Regresiones", regresiones), ("Ausentes", ausentes)]
+    if args.mejoras:
+        secciones.append(("Mejoras", mejoras))
+    for titulo, filas in secciones:
+        if filas:
+            print(f"{titulo} ({len(filas)}):")
+            for clave, detalle in filas:
+                print(f"  {clave:<60}{detalle}")
+    if not args.mejoras and mejoras:
+        print(f"{len(mejoras)} grupos mejoran de tiempo (--mejoras para verlos).")
+    if not regresiones:
+        print("Sin regresiones.")
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
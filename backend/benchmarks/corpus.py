@@ -0,0 +1,53 @@
+"""
+Corpus de integrandos de los benchmarks, con su valor exacto.
+
+Cada caso tiene los límites con las claves que usa calcular_integral
+(a, b para x; c, d para y en función de x; e, f para z en función de x, y)
+y el valor exacto como expresión de SymPy, que se evalúa con 30 dígitos.
+"""
+import sympy as sp
+
+CORPUS = [
+    # Simples
+    {"nombre": "polinomio", "categoria": "polinomica", "tipo": "simple",
+     "expresion": "3*x**5 - 2*x**2 + 1", "limites": {"a": "0", "b": "2"}, "exacto": "86/3"},
+    {"nombre": "trigonometrica", "categoria": "trigonometrica", "tipo": "simple",
+     "expresion": "sin(x)**2*cos(x)", "limites": {"a": "0", "b": "pi/2"}, "exacto": "1/3"},
+    {"nombre": "gaussiana", "categoria": "suave", "tipo": "simple",
+     "expresion": "exp(-x**2)", "limites": {"a": "-2", "b": "2"}, "exacto": "sqrt(pi)*erf(2)"},
+    {"nombre": "oscilatoria", "categoria": "oscilatoria", "tipo": "simple",
+     "expresion": "cos(50*x)", "limites": {"a": "0", "b": "1"}, "exacto": "sin(50)/50"},
+    {"nombre": "oscilatoria_creciente", "categoria": "oscilatoria", "tipo": "simple",
+     "expresion": "x*sin(30*x)", "limites": {"a": "0", "b": "pi"}, "exacto": "-pi/30"},
+    {"nombre": "pico", "categoria": "casi_singular", "tipo": "simple",
+     "expresion": "1/(x**2 + 0.0001)", "limites": {"a": "-1", "b": "1"}, "exacto": "200*atan(100)"},
+    {"nombre": "raiz_extremo", "categoria": "casi_singular", "tipo": "simple",
+     "expresion": "1/sqrt(x)", "limites": {"a": "0", "b": "1"}, "exacto": "2"},
+    {"nombre": "logaritmo_extremo", "categoria": "casi_singular", "tipo": "simple",
+     "expresion": "log(x)", "limites": {"a": "0", "b": "1"}, "exacto": "-1"},
+    # Dobles
+    {"nombre": "triangulo", "categoria": "polinomica", "tipo": "doble",
+     "expresion": "x*y", "limites": {"a": "0", "b": "1", "c": "0", "d": "x"}, "exacto": "1/8"},
+    {"nombre": "seno_suma", "categoria": "trigonometrica", "tipo": "doble",
+     "expresion": "sin(x + y)", "limites": {"a": "0", "b": "pi/2", "c": "0", "d": "pi/2"}, "exacto": "2"},
+    {"nombre": "semiesfera", "categoria": "region_variable", "tipo": "doble",
+     "expresion": "sqrt(1 - x**2 - y**2)",
+     "limites": {"a": "-1", "b": "1", "c": "-sqrt(1 - x**2)", "d": "sqrt(1 - x**2)"}, "exacto": "2*pi/3"},
+    {"nombre": "oscilatoria_xy", "categoria": "oscilatoria", "tipo": "doble",
+     "expresion": "cos(10*x*y)", "limites": {"a": "0", "b": "1", "c": "0", "d": "1"}, "exacto": "Si(10)/10"},
+    # Triples
+    {"nombre": "simplex", "categoria": "polinomica", "tipo": "triple",
+     "expresion": "x*y*z", "limites": {"a": "0", "b": "1", "c": "0", "d": "x", "e": "0", "f": "y"},
+     "exacto": "1/48"},
+    {"nombre": "esfera", "categoria": "region_variable", "tipo": "triple",
+     "expresion": "1",
+     "limites": {"a": "-1", "b": "1", "c": "-sqrt(1 - x**2)", "d": "sqrt(1 - x**2)",
+                 "e": "-sqrt(1 - x**2 - y**2)", "f": "sqrt(1 - x**2 - y**2)"}, "exacto": "4*pi/3"},
+    {"nombre": "exponencial_cubo", "categoria": "suave", "tipo": "triple",
+     "expresion": "exp(-(x + y + z))",
+     "limites": {"a": "0", "b": "1", "c": "0", "d": "1", "e": "0", "f": "1"}, "exacto": "(1 - exp(-1))**3"},
+]
+
+
+def valor_exacto(caso):
+    return float(sp.sympify(caso["exacto"]).evalf(30))
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark del preprocesado de expresiones: tokenizador de una pasada
+(app.utils.math_parser) contra la cascada de expresiones regulares anterior.
+
+Uso, desde backend/:
+    python -m benchmarks.preprocesado [repeticiones]
+"""
+import re
+import sys
+import timeit
+
+from sympy.parsing.sympy_parser import parse_expr
+
+from app.utils.math_parser import (
+    TRANSFORM, sympy_func_dict, preprocess_math_expr, _parse_sin_cache
+)
+
+EXPRESIONES = [
+    "x^2", "2x + 3", "sin(x)^2 + cos(x)^2", "SIN(X)*exp(-x^2)", "sqrt(1-x^2-y^2)",
+    "2pi x", "x y z", "(x+1)(x-1)", "Abs(x - y) + z", "sin x", "e^(x*y)/(1 + x^2)",
+    "3xy^2 + 2x(y - 1)", "log(x)/x", "atan(y/x) + sec(x)^2",
+]
+
+
+def _preprocesado_anterior(expr_str):
+    # Cascada de re.sub de la versión anterior, más las tres sustituciones
+    # que get_limit_func hacía antes de volver a preprocesar
+    expr_str = expr_str.replace('^', '**')
+    expr_str = re.sub(r'([a-zA-Z])(\d)', r'\1*\2', expr_str)
+    expr_str = re.sub(r'(\d)([a-zA-Z])', r'\1*\2', expr_str)
+    expr_str = re.sub(r'\bSEC\b', 'sec', expr_str, flags=re.IGNORECASE)
+    expr_str = re.sub(r'\bCSC\b', 'csc', expr_str, flags=re.IGNORECASE)
+    expr_str = re.sub(r'\bCOT\b', 'cot', expr_str, flags=re.IGNORECASE)
+    expr_str = re.sub(r'\bSIN\b', 'sin', expr_str, flags=re.IGNORECASE)
+    expr_str = re.sub(r'\bCOS\b', 'cos', expr_str, flags=re.IGNORECASE)
+    expr_str = re.sub(r'\bTAN\b', 'tan', expr_str, flags=re.IGNORECASE)
+    expr_str = re.sub(r'\bABS\s*\(', 'Abs(', expr_str, flags=re.IGNORECASE)
+    expr_str = expr_str.replace('π', 'pi')
+    expr_str = re.sub(r'\bPI\b', 'pi', expr_str, flags=re.IGNORECASE)
+    expr_str = re.sub(r'\bE\b', 'e', expr_str, flags=re.IGNORECASE)
+    expr_str = re.sub(r'(\d)(pi|e)\b', r'\1*\2', expr_str)
+    return expr_str
+
+
+def _parse_anterior(expr_str):
+    return parse_expr(_preprocesado_anterior(expr_str), transformations=TRANSFORM, local_dict=sympy_func_dict)
+
+
+def _mide(funcion, repeticiones):
+    tiempo = timeit.timeit(lambda: [funcion(e) for e in EXPRESIONES], number=repeticiones)
+    return tiempo / (repeticiones * len(EXPRESIONES)) * 1e6
+
+
+def main(repeticiones=200):
+    filas = [
+        ("preprocesado", _preprocesado_anterior, preprocess_math_expr, repeticiones),
+        ("preprocesado + parse_expr", _parse_anterior, _parse_sin_cache, max(repeticiones // 20, 1)),
+    ]
+    print(f"{'etapa':<28}{'anterior (µs)':>15}{'nuevo (µs)':>13}{'aceleración':>13}")
+    for nombre, anterior, nuevo, n in filas:
+        t_anterior = _mide(anterior, n)
+        t_nuevo = _mide(nuevo, n)
+        print(f"{nombre:<28}{t_anterior:>15.1f}{t_nuevo:>13.1f}{t_anterior / t_nuevo:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
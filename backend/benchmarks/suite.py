@@ -0,0 +1,287 @@
+"""
+Benchmark de los motores de app.calculo y de los endpoints HTTP.
+
+Para cada caso del corpus (benchmarks.corpus) y cada motor mide el tiempo de
+pared (mínimo y mediana de varias repeticiones), las evaluaciones del
+integrando, el pico de memoria (tracemalloc) y el error absoluto frente al
+valor exacto. Los
+endpoints se miden en el mismo proceso con un cliente ASGI (httpx), sin red
+ni pool de procesos. El resultado es un JSON que sirve de línea base para
+benchmarks.comparar.
+
+Uso, desde backend/:
+    python -m benchmarks.suite [--salida benchmarks/baselines/actual.json]
+                               [--solo motores|endpoints] [--casos nombre,...] [--peticiones N]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.corpus import CORPUS, valor_exacto
+
+# Tiempo mínimo y límites de repeticiones por medición
+TIEMPO_MINIMO = 0.2
+REPETICIONES_MIN = 3
+REPETICIONES_MAX = 100
+
+# Motores vía calcular_integral: nombre -> opciones
+MOTORES = {
+    "auto": {"modo": "fijo", "metodo": "auto"},
+    "adaptativo": {"modo": "adaptativo"},
+    "simpson": {"metodo": "simpson"},
+    "gauss_legendre": {"metodo": "gauss_legendre"},
+    "gauss_kronrod@1e-6": {"metodo": "gauss_kronrod", "rtol": 1e-6, "atol": 1e-8},
+    "gauss_kronrod@1e-10": {"metodo": "gauss_kronrod", "rtol": 1e-10, "atol": 1e-12},
+    "tanh_sinh": {"metodo": "tanh_sinh"},
+    "qmc@1e-4": {"metodo": "qmc", "rtol": 1e-4, "atol": 1e-6},
+    "monte_carlo": {"metodo": "monte_carlo"},
+}
+# Núcleos de Simpson de resolución fija llamados directamente: subintervalos por eje
+RESOLUCIONES_SIMPSON = {"simple": (100, 1000, 10000), "doble": (50, 100, 200), "triple": (10, 20, 40)}
+
+
+def _silencio():
+    # El cálculo imprime trazas de depuración; no deben mezclarse con el informe
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _cronometra(funcion):
+    """
+    Tiempos de funcion(): (mínimo, mediana, último resultado). El mínimo es la
+    medida que se compara: es la menos afectada por el resto de la máquina.
+    """
+    tiempos = []
+    resultado = None
+    while len(tiempos) < REPETICIONES_MAX and (len(tiempos) < REPETICIONES_MIN or sum(tiempos) < TIEMPO_MINIMO):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), statistics.median(tiempos), resultado
+
+
+def _memoria_pico(funcion):
+    tracemalloc.start()
+    try:
+        funcion()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _via_calculo(caso, opciones):
+    from app.calculo.integrales import calcular_integral
+
+    def correr():
+        with _silencio():
+            res = calcular_integral(caso["tipo"], caso["expresion"], caso["limites"], **opciones)
+        if "error" in res:
+            raise ValueError(res["error"])
+        return res["valor"], res.get("evaluaciones"), res.get("convergio")
+    return correr
+
+
+def _nucleo_simpson(caso, n):
+    import sympy as sp
+    from app.calculo.integrales import (
+        parse_limit_string, get_limit_func, simpson_simple, simpson_doble_variable, simpson_triple_variable
+    )
+    from app.utils.math_parser import compilar_numerica
+
+    x, y, z = sp.symbols("x y z")
+    lim = caso["limites"]
+    a, b = parse_limit_string(lim["a"]), parse_limit_string(lim["b"])
+    if caso["tipo"] == "simple":
+        f = compilar_numerica(caso["expresion"], (x,))
+        return lambda: (simpson_simple(f, a, b, n=n), n + 1, None)
+    y_inf, y_sup = get_limit_func(lim["c"], (x,)), get_limit_func(lim["d"], (x,))
+    if caso["tipo"] == "doble":
+        f = compilar_numerica(caso["expresion"], (x, y))
+        return lambda: (simpson_doble_variable(f, a, b, y_inf, y_sup, nx=n, ny=n), (n + 1) ** 2, None)
+    f = compilar_numerica(caso["expresion"], (x, y, z))
+    z_inf, z_sup = get_limit_func(lim["e"], (x, y)), get_limit_func(lim["f"], (x, y))
+    return lambda: (
+        simpson_triple_variable(f, a, b, y_inf, y_sup, z_inf, z_sup, nx=n, ny=n, nz=n), (n + 1) ** 3, None
+    )
+
+
+def _mide_motor(correr, exacto):
+    try:
+        correr()  # Calienta las cachés de expresiones y kernels antes de medir
+        segundos, mediana, (valor, evaluaciones, convergio) = _cronometra(correr)
+        memoria = _memoria_pico(correr)
+    except Exception as e:
+        return {"error": str(e)}
+    medida = {
+        "segundos": segundos,
+        "segundos_mediana": mediana,
+        "evaluaciones": evaluaciones,
+        "memoria_pico": memoria,
+        "valor": valor,
+        "error_abs": abs(valor - exacto) if np.isfinite(valor) else None,
+    }
+    if convergio is not None:
+        medida["convergio"] = bool(convergio)
+    return medida
+
+
+def medir_motores(casos):
+    resultados = {}
+    for caso in casos:
+        exacto = valor_exacto(caso)
+        configuraciones = [(nombre, _via_calculo(caso, opciones)) for nombre, opciones in MOTORES.items()]
+        configuraciones += [
+            (f"simpson_n={n}", _nucleo_simpson(caso, n)) for n in RESOLUCIONES_SIMPSON[caso["tipo"]]
+        ]
+        for nombre, correr in configuraciones:
+            clave = f"{caso['tipo']}/{caso['nombre']}/{nombre}"
+            resultados[clave] = _mide_motor(correr, exacto)
+            print(f"  {clave:<55}{_resumen(resultados[clave])}", file=sys.stderr)
+    return resultados
+
+
+def _resumen(medida):
+    if "error" in medida:
+        return f"error: {medida['error'][:60]}"
+    error = "-" if medida["error_abs"] is None else f"{medida['error_abs']:.1e}"
+    return f"{medida['segundos'] * 1e3:9.2f} ms  err {error}"
+
+
+# Peticiones de los endpoints: nombre -> (ruta, cuerpo)
+PETICIONES = {
+    "simple": ("/simple", {"expresion": "x**2*sin(x)", "limite_inf": "0", "limite_sup": "pi", "modo_grafica": "ninguna"}),
+    "simple_adaptativo": ("/simple", {"expresion": "exp(-x**2)", "limite_inf": "-2", "limite_sup": "2",
+                                      "modo": "adaptativo", "modo_grafica": "ninguna"}),
+    "doble": ("/doble", {"expresion": "x*y", "x_inf": "0", "x_sup": "1", "y_inf": "0", "y_sup": "x",
+                         "modo_grafica": "ninguna"}),
+    "doble_datos": ("/doble", {"expresion": "sin(x + y)", "x_inf": "0", "x_sup": "pi/2", "y_inf": "0",
+                               "y_sup": "pi/2", "modo_grafica": "datos"}),
+    "doble_png": ("/doble", {"expresion": "sin(x + y)", "x_inf": "0", "x_sup": "pi/2", "y_inf": "0",
+                             "y_sup": "pi/2", "modo_grafica": "sincrona"}),
+    "triple": ("/triple", {"expresion": "x*y*z", "x_inf": "0", "x_sup": "1", "y_inf": "0", "y_sup": "x",
+                           "z_inf": "0", "z_sup": "y", "modo_grafica": "ninguna"}),
+    "batch": ("/batch", [{"tipo": "simple", "expresion": "sin(x)", "limite_inf": "0", "limite_sup": str(k / 10)}
+                         for k in range(1, 51)]),
+    "barrido": ("/barrido", {"expresion": "sin(k*x)", "inicio": "1", "fin": "5", "pasos": 50,
+                             "x_inf": "0", "x_sup": "pi"}),
+}
+
+
+async def _medir_endpoints(peticiones, n):
+    import httpx
+    from app.main import app
+    from app.calculo.cache_resultados import cache_resultados
+    from app.utils.almacen_graficas import DIRECTORIO_GRAFICAS
+
+    resultados = {}
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=120) as cliente:
+        for nombre, (ruta, cuerpo) in peticiones.items():
+            async def peticion():
+                with _silencio():
+                    respuesta = await cliente.post(ruta, json=cuerpo)
+                if respuesta.status_code != 200:
+                    raise ValueError(f"{respuesta.status_code}: {respuesta.text[:100]}")
+                return respuesta
+
+            for variante, limpiar in (("frio", True), ("caliente", False)):
+                clave = f"{nombre}/{variante}"
+                try:
+                    await peticion()
+                    tiempos = []
+                    for _ in range(n):
+                        # En frío cada petición recalcula y vuelve a dibujar
+                        # (las cachés de expresiones y las figuras siguen calientes)
+                        if limpiar:
+                            cache_resultados.memoria.limpiar()
+                            shutil.rmtree(DIRECTORIO_GRAFICAS, ignore_errors=True)
+                        inicio = time.perf_counter()
+                        await peticion()
+                        tiempos.append(time.perf_counter() - inicio)
+                    tiempos.sort()
+                    resultados[clave] = {
+                        "p50_ms": 1e3 * tiempos[len(tiempos) // 2],
+                        "p95_ms": 1e3 * tiempos[min(int(0.95 * len(tiempos)), len(tiempos) - 1)],
+                        "peticiones_por_segundo": len(tiempos) / sum(tiempos),
+                    }
+                    print(f"  {clave:<55}{resultados[clave]['p50_ms']:9.2f} ms (p50)", file=sys.stderr)
+                except Exception as e:
+                    resultados[clave] = {"error": str(e)}
+                    print(f"  {clave:<55}error: {str(e)[:60]}", file=sys.stderr)
+    return resultados
+
+
+def medir_endpoints(n):
+    return asyncio.run(_medir_endpoints(PETICIONES, n))
+
+
+def _entorno():
+    try:
+        import numba
+        version_numba = numba.__version__
+    except ImportError:
+        version_numba = None
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "numba": version_numba,
+        "plataforma": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--salida", help="archivo JSON de resultados (por defecto, a la salida estándar)")
+    parser.add_argument("--solo", choices=("motores", "endpoints"), help="medir solo una parte")
+    parser.add_argument("--casos", help="nombres de casos del corpus separados por comas")
+    parser.add_argument("--peticiones", type=int, default=20, help="peticiones por endpoint y variante")
+    args = parser.parse_args(argv)
+
+    salida = os.path.abspath(args.salida) if args.salida else None
+    casos = CORPUS
+    if args.casos:
+        nombres = set(args.casos.split(","))
+        casos = [c for c in CORPUS if c["nombre"] in nombres]
+
+    # Todo en este proceso y sin tocar las cachés, gráficas ni kernels del árbol de trabajo
+    os.environ.setdefault("EJECUTOR_PROCESOS", "0")
+    os.environ["RESULTADOS_CACHE_DISCO"] = ""
+    os.chdir(tempfile.mkdtemp(prefix="benchmarks_"))
+
+    informe = {
+        "version": 1,
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "entorno": _entorno(),
+    }
+    if args.solo != "endpoints":
+        print("Motores:", file=sys.stderr)
+        informe["motores"] = medir_motores(casos)
+    if args.solo != "motores":
+        print("Endpoints:", file=sys.stderr)
+        informe["endpoints"] = medir_endpoints(args.peticiones)
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False, sort_keys=True)
+    if salida:
+        os.makedirs(os.path.dirname(salida), exist_ok=True)
+        with open(salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# La configuración se lee al importar los módulos de app: se fija antes.
+# Los trabajos corren en hilos, sin caché en disco ni coordinación entre
+# procesos, y static/ y cache/ van a un directorio temporal.
+_TEMPORAL = tempfile.mkdtemp(prefix="integrales-tests-")
+os.environ.update({
+    "EJECUTOR_PROCESOS": "0",
+    "RESULTADOS_CACHE_DISCO": "",
+    "VUELO_UNICO_DIR": "",
+    "JIT_ACTIVO": "0",
+    "JIT_CACHE": os.path.join(_TEMPORAL, "jit"),
+    "EJECUTOR_PRECALENTAR": "",
+    "LOG_NIVEL": "WARNING",
+})
+os.chdir(_TEMPORAL)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_TEMPORAL, ignore_errors=True)
+
+
+@pytest.fixture
+def cliente():
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.calculo.cache_resultados import cache_resultados
+    cache_resultados.memoria.limpiar()
+    return TestClient(app)
@@ -0,0 +1,33 @@
+import os
+
+from app.utils.almacen_graficas import barrer, ruta_grafica
+
+
+def _archivo(ruta, edad, tamano=10):
+    with open(ruta, "wb") as archivo:
+        archivo.write(b"0" * tamano)
+    instante = os.path.getmtime(ruta) - edad
+    os.utime(ruta, (instante, instante))
+    return ruta
+
+
+def test_barrer_solo_toca_graficas_generadas(tmp_path):
+    nombre = os.path.basename(ruta_grafica("simple", "x**2", {"a": 0.0, "b": 1.0}, {}))
+    vieja = _archivo(tmp_path / nombre, edad=100)
+    ajenas = [
+        _archivo(tmp_path / "integral_simple_-5205391534396983211.png", edad=100),
+        _archivo(tmp_path / "leeme.txt", edad=100),
+        _archivo(tmp_path / f"{nombre}.123.456.tmp", edad=100),
+    ]
+    assert barrer(str(tmp_path), max_bytes=10 ** 6, max_edad=10) == 1
+    assert not os.path.exists(vieja)
+    assert all(os.path.exists(ruta) for ruta in ajenas)
+
+
+def test_barrer_por_tamano_borra_las_menos_usadas(tmp_path):
+    rutas = [
+        _archivo(tmp_path / os.path.basename(ruta_grafica("doble", f"x*y*{i}", {}, {})), edad=10 - i, tamano=100)
+        for i in range(5)
+    ]
+    assert barrer(str(tmp_path), max_bytes=250, max_edad=3600) == 3
+    assert [os.path.exists(ruta) for ruta in rutas] == [False, False, False, True, True]
@@ -0,0 +1,30 @@
+from app.calculo.cache_resultados import CacheResultados
+
+
+def test_disco_persiste_entre_instancias(tmp_path):
+    ruta = str(tmp_path / "resultados.sqlite")
+    cache = CacheResultados(ruta_disco=ruta)
+    assert cache.set("a", {"valor": 1.5}).result(timeout=5) is True
+    otra = CacheResultados(ruta_disco=ruta)
+    assert otra.get("a") == {"valor": 1.5}
+    assert otra.get("b") is None
+    assert otra.estadisticas()["disco"]["aciertos"] == 1
+    assert otra.estadisticas()["disco"]["fallos"] == 1
+
+
+def test_escrituras_agrupadas_en_lotes(tmp_path):
+    cache = CacheResultados(ruta_disco=str(tmp_path / "resultados.sqlite"))
+    for i in range(500):
+        cache.set(f"clave{i}", {"valor": float(i)})
+    cache.vaciar()
+    disco = cache.estadisticas()["disco"]
+    assert disco["escrituras"] == 500
+    assert disco["lotes"] < 500
+    cache.memoria.limpiar()
+    assert cache.get("clave499") == {"valor": 499.0}
+
+
+def test_sin_disco(tmp_path):
+    cache = CacheResultados(ruta_disco="")
+    assert cache.set("a", {"valor": 1.0}).result() is False
+    assert cache.get("a") == {"valor": 1.0}
@@ -0,0 +1,67 @@
+import math
+
+import pytest
+
+from app.calculo.integrales import calcular_integral
+
+INDEFINIDOS = "infinitos o indefinidos"
+
+# Integrandos con puntos fuera de su dominio dentro del intervalo: ningún
+# método puede devolver un valor (antes tanh-sinh tomaba esos nodos como 0)
+FUERA_DE_DOMINIO = [
+    ("simple", "sqrt(x)", {"a": "-1", "b": "0"}),
+    ("simple", "log(x)", {"a": "-2", "b": "-1"}),
+    ("simple", "sqrt(x)", {"a": "-1", "b": "1"}),
+    ("simple", "x^(1/3)", {"a": "-1", "b": "1"}),
+    ("simple", "asin(x)", {"a": "0", "b": "2"}),
+    ("simple", "sqrt(1-x^2)", {"a": "-2", "b": "2"}),
+    ("simple", "(-1)^x", {"a": "0", "b": "1"}),
+    ("doble", "sqrt(x-1)*y", {"a": "0", "b": "2", "c": "0", "d": "1"}),
+]
+
+SINGULARES_INTEGRABLES = [
+    ("1/sqrt(x)", "0", "1", 2.0),
+    ("log(x)", "0", "1", -1.0),
+    ("1/sqrt(abs(x))", "-1", "1", 4.0),
+    ("sqrt(1-x^2)", "-1", "1", math.pi / 2),
+    ("asin(x)", "0", "1", math.pi / 2 - 1),
+]
+
+
+@pytest.mark.parametrize("metodo", ["auto", "tanh_sinh"])
+@pytest.mark.parametrize("tipo, expresion, limites", FUERA_DE_DOMINIO)
+def test_fuera_de_dominio_es_error(tipo, expresion, limites, metodo):
+    res = calcular_integral(tipo, expresion, limites, metodo=metodo)
+    assert "valor" not in res
+    assert INDEFINIDOS in res["error"]
+
+
+@pytest.mark.parametrize("metodo", ["auto", "tanh_sinh"])
+@pytest.mark.parametrize("expresion, a, b, exacto", SINGULARES_INTEGRABLES)
+def test_singularidad_integrable(expresion, a, b, exacto, metodo):
+    res = calcular_integral("simple", expresion, {"a": a, "b": b}, metodo=metodo)
+    assert res["valor"] == pytest.approx(exacto, rel=1e-10, abs=1e-12)
+
+
+def test_singularidad_integrable_en_doble():
+    res = calcular_integral("doble", "y/sqrt(x)", {"a": "0", "b": "1", "c": "0", "d": "1"})
+    assert res["valor"] == pytest.approx(1.0, rel=1e-8)
+
+
+def test_cola_lenta_se_integra_sin_converger():
+    # x**-0.99: la masa por debajo del nodo más pequeño es del orden de 1e-3 (ver COLA_RELATIVA)
+    res = calcular_integral("simple", "x^(-0.99)", {"a": "0", "b": "1"})
+    assert res["valor"] == pytest.approx(100.0, rel=1e-3)
+    assert res["convergio"] is False
+
+
+@pytest.mark.parametrize("expresion", ["1/x", "x^(-0.999)", "1/x^2"])
+def test_divergente(expresion):
+    res = calcular_integral("simple", expresion, {"a": "0", "b": "1"})
+    assert "diverge" in res["error"]
+
+
+def test_singularidad_integrable_por_tramos():
+    res = calcular_integral("simple", "1/sqrt(abs(x))", {"a": "-1", "b": "1"})
+    assert res["valor"] == pytest.approx(4.0, rel=1e-10)
+    assert res["puntos_singulares"] == [0.0]
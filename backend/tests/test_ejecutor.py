@@ -0,0 +1,43 @@
+import asyncio
+import signal
+import time
+
+from app.utils.ejecutor import Ejecutor, TiempoAgotado, _ejecutar_con_limite
+
+
+def _atascado():
+    # Un cálculo que no responde a la alarma (p. ej. dentro de código nativo)
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, signal.SIG_IGN)
+    time.sleep(60)
+
+
+def _cuadrado(n):
+    return n * n
+
+
+def test_sin_sigalrm_no_usa_alarma(monkeypatch):
+    monkeypatch.delattr(signal, "SIGALRM", raising=False)
+    resultado, _ = _ejecutar_con_limite(_cuadrado, (3,), 1.0)
+    assert resultado == 9
+
+
+def test_reinicio_reenvia_los_demas_trabajos():
+    ejecutor = Ejecutor(procesos=1, cola_max=4, timeout=0.5)
+
+    async def lanzar():
+        atascado = asyncio.ensure_future(ejecutor.ejecutar(_atascado))
+        await asyncio.sleep(0.3)
+        # En cola detrás del atascado: cuando se mata el pool, se reenvía al nuevo
+        en_cola = asyncio.ensure_future(ejecutor.ejecutar(_cuadrado, 4))
+        return await asyncio.gather(atascado, en_cola, return_exceptions=True)
+
+    try:
+        atascado, en_cola = asyncio.run(lanzar())
+    finally:
+        ejecutor.apagar()
+    assert isinstance(atascado, TiempoAgotado)
+    assert en_cola == 16
+    estadisticas = ejecutor.estadisticas()
+    assert estadisticas["reinicios"] == 1
+    assert estadisticas["reintentos"] == 1
@@ -0,0 +1,136 @@
+import json
+
+import pytest
+
+
+def _eventos_sse(texto):
+    eventos = []
+    for bloque in texto.strip().split("\n\n"):
+        lineas = dict(linea.split(": ", 1) for linea in bloque.splitlines())
+        eventos.append((lineas["event"], json.loads(lineas["data"])))
+    return eventos
+
+
+def test_simple_sin_grafica(cliente):
+    r = cliente.post("/simple", json={"expresion": "x^2", "limite_inf": "0", "limite_sup": "3",
+                                      "modo_grafica": "ninguna"})
+    assert r.status_code == 200
+    datos = r.json()
+    assert datos["valor"] == pytest.approx(9.0)
+    assert datos["grafica"] is None
+    assert "metodo" in datos
+
+
+def test_simple_expresion_invalida(cliente):
+    r = cliente.post("/simple", json={"expresion": "x^^2", "limite_inf": "0", "limite_sup": "1",
+                                      "modo_grafica": "ninguna"})
+    assert r.status_code == 400
+    assert "detail" in r.json()
+
+
+def test_batch_json_en_orden(cliente):
+    items = [
+        {"tipo": "simple", "expresion": "x", "limite_inf": "0", "limite_sup": str(b)} for b in range(1, 4)
+    ] + [
+        {"tipo": "doble", "expresion": "x*y", "x_inf": "0", "x_sup": "1", "y_inf": "0", "y_sup": "x"},
+        {"tipo": "cuadruple", "expresion": "x"},
+        {"tipo": "simple", "expresion": "1/x", "limite_inf": "0", "limite_sup": "1"},
+    ]
+    r = cliente.post("/batch", json={"items": items})
+    assert r.status_code == 200
+    resultados = r.json()["resultados"]
+    assert [res["indice"] for res in resultados] == list(range(len(items)))
+    assert [res["valor"] for res in resultados[:3]] == pytest.approx([0.5, 2.0, 4.5])
+    assert resultados[3]["valor"] == pytest.approx(1 / 8)
+    assert "tipo" in resultados[4]["error"]
+    assert "diverge" in resultados[5]["error"]
+
+
+def test_batch_ndjson_stream(cliente):
+    lineas = "\n".join(json.dumps({"tipo": "simple", "expresion": "x^2", "limite_inf": "0", "limite_sup": str(b)})
+                       for b in (1, 2))
+    r = cliente.post("/batch?stream=true", content=lineas, headers={"content-type": "application/x-ndjson"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    respuestas = [json.loads(linea) for linea in r.text.splitlines()]
+    assert [res["indice"] for res in respuestas] == [0, 1]
+    assert [res["valor"] for res in respuestas] == pytest.approx([1 / 3, 8 / 3])
+
+
+def test_batch_cuerpo_invalido(cliente):
+    r = cliente.post("/batch", json={"sin_items": True})
+    assert r.status_code == 400
+
+
+def test_barrido(cliente):
+    r = cliente.post("/barrido", json={"expresion": "k*x", "inicio": "0", "fin": "2", "pasos": 3,
+                                       "x_inf": "0", "x_sup": "1"})
+    assert r.status_code == 200
+    datos = r.json()
+    assert datos["parametro"] == "k"
+    assert datos["valores_parametro"] == [0.0, 1.0, 2.0]
+    assert datos["resultados"] == pytest.approx([0.0, 0.5, 1.0])
+    assert datos["grafica"] is None
+
+
+def test_barrido_doble_con_limites_parametricos(cliente):
+    r = cliente.post("/barrido", json={"tipo": "doble", "expresion": "y", "inicio": "1", "fin": "2", "pasos": 2,
+                                       "x_inf": "0", "x_sup": "k", "y_inf": "0", "y_sup": "x"})
+    assert r.status_code == 200
+    assert r.json()["resultados"] == pytest.approx([1 / 6, 8 / 6])
+
+
+@pytest.mark.parametrize("cuerpo", [
+    {"expresion": "k*x", "inicio": "0", "fin": "1", "pasos": 0, "x_inf": "0", "x_sup": "1"},
+    {"expresion": "k*x", "parametro": "x", "inicio": "0", "fin": "1", "x_inf": "0", "x_sup": "1"},
+    {"expresion": "k*x", "inicio": "0", "fin": "1", "x_inf": "0", "x_sup": "1", "modo": "adaptativo"},
+])
+def test_barrido_entrada_invalida(cliente, cuerpo):
+    assert cliente.post("/barrido", json=cuerpo).status_code == 400
+
+
+def test_progreso_sse(cliente):
+    r = cliente.post("/simple/progreso", json={"expresion": "sin(x)", "limite_inf": "0", "limite_sup": "pi"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    eventos = _eventos_sse(r.text)
+    assert all(evento == "progreso" for evento, _ in eventos[:-1])
+    evento, datos = eventos[-1]
+    assert evento == "resultado"
+    assert datos["valor"] == pytest.approx(2.0)
+
+
+def test_progreso_sse_error(cliente):
+    r = cliente.post("/simple/progreso", json={"expresion": "1/x", "limite_inf": "0", "limite_sup": "1"})
+    evento, datos = _eventos_sse(r.text)[-1]
+    assert evento == "error"
+    assert "diverge" in datos["detail"]
+
+
+def test_websocket(cliente):
+    with cliente.websocket_connect("/ws/integral") as ws:
+        ws.send_json({"tipo": "doble", "expresion": "x*y", "x_inf": "0", "x_sup": "1", "y_inf": "0", "y_sup": "1"})
+        mensajes = []
+        while not mensajes or mensajes[-1]["evento"] == "progreso":
+            mensajes.append(ws.receive_json())
+    assert mensajes[-1]["evento"] == "resultado"
+    assert mensajes[-1]["valor"] == pytest.approx(0.25)
+
+
+def test_websocket_tipo_invalido(cliente):
+    with cliente.websocket_connect("/ws/integral") as ws:
+        ws.send_json({"tipo": "cuadruple"})
+        mensaje = ws.receive_json()
+    assert mensaje["evento"] == "error"
+
+
+def test_metrics(cliente):
+    cliente.post("/simple", json={"expresion": "x", "limite_inf": "0", "limite_sup": "1", "modo_grafica": "ninguna"})
+    r = cliente.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    texto = r.text
+    for nombre in ("integrales_etapa_segundos", "integrales_http_segundos", "integrales_pool_trabajos_total",
+                   "integrales_cache_aciertos_total"):
+        assert f"# TYPE {nombre} " in texto
+    assert 'integrales_calculos_total{' in texto
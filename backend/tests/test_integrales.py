@@ -0,0 +1,158 @@
+import math
+
+import numpy as np
+import pytest
+import sympy as sp
+
+from app.calculo.integrales import calcular_integral, N_SIMPLE, N_DOBLE, N_TRIPLE
+from app.utils.math_parser import obtener_expresion
+
+x, y, z = sp.symbols("x y z")
+
+
+# Camino original como referencia: lambdify de SymPy y Simpson compuesto fila a fila
+def _simpson(valores, a, b):
+    n = len(valores) - 1
+    return (b - a) * (valores[0] + valores[-1] + 4 * np.sum(valores[1:-1:2]) + 2 * np.sum(valores[2:-2:2])) / (3 * n)
+
+
+def _lambdify(texto, variables):
+    return sp.lambdify(variables, obtener_expresion(texto), modules=["numpy"])
+
+
+def _numero(texto):
+    return float(obtener_expresion(texto))
+
+
+def _nodos(a, b, n):
+    return np.linspace(a, b, n + 1)
+
+
+def referencia_simple(expresion, a, b, n=N_SIMPLE):
+    f = _lambdify(expresion, (x,))
+    xs = _nodos(a, b, n)
+    return _simpson(np.broadcast_to(f(xs), xs.shape), a, b)
+
+
+def referencia_doble(expresion, a, b, c, d, n=N_DOBLE):
+    f, y_inf, y_sup = _lambdify(expresion, (x, y)), _lambdify(c, (x,)), _lambdify(d, (x,))
+    filas = []
+    for xi in _nodos(a, b, n):
+        ys = _nodos(float(y_inf(xi)), float(y_sup(xi)), n)
+        filas.append(_simpson(np.broadcast_to(f(xi, ys), ys.shape), ys[0], ys[-1]))
+    return _simpson(np.array(filas), a, b)
+
+
+def referencia_triple(expresion, a, b, c, d, e, g, n=N_TRIPLE):
+    f = _lambdify(expresion, (x, y, z))
+    y_inf, y_sup = _lambdify(c, (x,)), _lambdify(d, (x,))
+    z_inf, z_sup = _lambdify(e, (x, y)), _lambdify(g, (x, y))
+    filas = []
+    for xi in _nodos(a, b, n):
+        ys = _nodos(float(y_inf(xi)), float(y_sup(xi)), n)
+        columnas = []
+        for yj in ys:
+            zs = _nodos(float(z_inf(xi, yj)), float(z_sup(xi, yj)), n)
+            columnas.append(_simpson(np.broadcast_to(f(xi, yj, zs), zs.shape), zs[0], zs[-1]))
+        filas.append(_simpson(np.array(columnas), ys[0], ys[-1]))
+    return _simpson(np.array(filas), a, b)
+
+
+SIMPLES = [
+    ("x^2", "0", "1", 1 / 3),
+    ("sin(x)", "0", "pi", 2.0),
+    ("exp(-x^2)", "-2", "2", math.sqrt(math.pi) * math.erf(2)),
+    ("1/(1+x^2)", "0", "1", math.pi / 4),
+    ("x*log(1+x)", "0", "2", 1.5 * math.log(3)),
+    ("2cos(x)^2", "0", "2pi", 2 * math.pi),
+]
+
+DOBLES = [
+    ("x*y", "0", "1", "0", "x", 1 / 8),
+    ("sin(x)*cos(y)", "0", "pi", "0", "pi/2", 2.0),
+    ("exp(x+y)", "0", "1", "x", "2*x", (math.e ** 3 - 1) / 3 - (math.e ** 2 - 1) / 2),
+]
+
+TRIPLES = [
+    ("x*y*z", "0", "1", "0", "x", "0", "y", 1 / 48),
+    ("x+y+z", "0", "1", "0", "1", "0", "1", 1.5),
+    ("x^2*z", "0", "2", "0", "1", "0", "x+y", None),
+]
+
+
+@pytest.mark.parametrize("expresion, a, b, exacto", SIMPLES)
+def test_simple_coincide_con_simpson_lambdify(expresion, a, b, exacto):
+    res = calcular_integral("simple", expresion, {"a": a, "b": b}, metodo="simpson")
+    referencia = referencia_simple(expresion, _numero(a), _numero(b))
+    assert res["valor"] == pytest.approx(referencia, rel=1e-12, abs=1e-12)
+
+
+@pytest.mark.parametrize("expresion, a, b, c, d, exacto", DOBLES)
+def test_doble_coincide_con_simpson_lambdify(expresion, a, b, c, d, exacto):
+    res = calcular_integral("doble", expresion, {"a": a, "b": b, "c": c, "d": d}, metodo="simpson")
+    referencia = referencia_doble(expresion, _numero(a), _numero(b), c, d)
+    assert res["valor"] == pytest.approx(referencia, rel=1e-10, abs=1e-12)
+    assert res["valor"] == pytest.approx(exacto, rel=1e-6)
+
+
+@pytest.mark.parametrize("expresion, a, b, c, d, e, f, exacto", TRIPLES)
+def test_triple_coincide_con_simpson_lambdify(expresion, a, b, c, d, e, f, exacto):
+    limites = {"a": a, "b": b, "c": c, "d": d, "e": e, "f": f}
+    res = calcular_integral("triple", expresion, limites, metodo="simpson")
+    referencia = referencia_triple(expresion, float(a), float(b), c, d, e, f)
+    assert res["valor"] == pytest.approx(referencia, rel=1e-10, abs=1e-12)
+    if exacto is not None:
+        assert res["valor"] == pytest.approx(exacto, rel=1e-6)
+
+
+@pytest.mark.parametrize("expresion, a, b, exacto", SIMPLES)
+def test_simple_automatico_exacto(expresion, a, b, exacto):
+    res = calcular_integral("simple", expresion, {"a": a, "b": b})
+    assert res["valor"] == pytest.approx(exacto, rel=1e-8)
+
+
+@pytest.mark.parametrize("metodo", ["gauss_legendre", "gauss_kronrod", "tanh_sinh"])
+def test_metodos_deterministas_coinciden(metodo):
+    res = calcular_integral("doble", "x*y", {"a": "0", "b": "1", "c": "0", "d": "x"}, metodo=metodo)
+    assert res["valor"] == pytest.approx(1 / 8, rel=1e-6)
+    assert res["metodo"] == metodo
+
+
+def test_metodos_aleatorios_reproducibles():
+    limites = {"a": "0", "b": "1", "c": "0", "d": "1", "e": "0", "f": "1"}
+    primero = calcular_integral("triple", "x+y+z", limites, metodo="qmc", semilla=7)
+    segundo = calcular_integral("triple", "x+y+z", limites, metodo="qmc", semilla=7)
+    assert primero["valor"] == segundo["valor"]
+    assert primero["valor"] == pytest.approx(1.5, rel=1e-2)
+
+
+@pytest.mark.parametrize("expresion, limites, exacto", [
+    ("sin(x)", {"a": "0", "b": "pi"}, 2.0),
+    ("x*y", {"a": "0", "b": "1", "c": "0", "d": "x"}, 1 / 8),
+])
+def test_adaptativo_con_control_de_error(expresion, limites, exacto):
+    tipo = "doble" if "c" in limites else "simple"
+    res = calcular_integral(tipo, expresion, limites, modo="adaptativo", rtol=1e-10)
+    assert res["valor"] == pytest.approx(exacto, rel=1e-10)
+    assert res["convergio"] is True
+    assert res["error_estimado"] <= 1e-10 * abs(res["valor"])
+    assert res["evaluaciones"] > 0
+
+
+@pytest.mark.parametrize("argumentos, mensaje", [
+    (("simple", "", {"a": "0", "b": "1"}), "Expresión vacía"),
+    (("cuadruple", "x", {"a": "0", "b": "1"}), "Tipo de integral no soportada"),
+    (("simple", "x", {"a": "0", "b": "1+"}), "Límite inválido"),
+    (("simple", "1/x", {"a": "0", "b": "1"}), "diverge"),
+    (("simple", "tan(x)", {"a": "0", "b": "3"}), "diverge"),
+    (("simple", "x", {"a": "0", "b": "1"}, "raro"), "Modo de cálculo no soportado"),
+])
+def test_errores(argumentos, mensaje):
+    res = calcular_integral(*argumentos)
+    assert "valor" not in res
+    assert mensaje in res["error"]
+
+
+def test_metodo_desconocido():
+    res = calcular_integral("simple", "x", {"a": "0", "b": "1"}, metodo="trapecio")
+    assert "Método de cuadratura no soportado" in res["error"]
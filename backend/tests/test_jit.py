@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+import sympy as sp
+
+from app.calculo import jit
+from app.calculo.integrales import calcular_integral
+from app.utils.math_parser import compilar_numerica
+
+x, y = sp.symbols("x y")
+
+# Constantes negativas como base o exponente, signos y funciones
+CORPUS = [
+    "(-1)^x", "(-2)^x", "(-0.5)^y*x", "-x^2", "(-x)^3", "2^-x", "x^-2", "-3*x+1",
+    "sin(-x)*cos(y)", "exp(-x*y)", "abs(-x)+y", "-(x-y)^2", "1e-3*x*y", "x^(1/3)", "sqrt(-x)",
+]
+
+
+@pytest.fixture
+def con_jit(monkeypatch, tmp_path):
+    pytest.importorskip("numba")
+    monkeypatch.setattr(jit, "JIT_ACTIVO", True)
+    monkeypatch.setattr(jit, "JIT_UMBRAL", 1)
+    monkeypatch.setattr(jit, "JIT_CACHE", str(tmp_path))
+    # Estado del proceso limpio en cada prueba
+    monkeypatch.setattr(jit, "_kernels", {})
+    monkeypatch.setattr(jit, "_usos", {})
+    monkeypatch.setattr(jit, "_compilaciones", {})
+
+
+def _compilado(f):
+    jit.registrar_uso(f)
+    jit.esperar(timeout=60)
+    return jit.kernel_filas(f)
+
+
+def _ruta(f):
+    return os.path.join(jit.JIT_CACHE, f"kernel_{jit._fuente(f.nodo, f.aridad)[1]}.py")
+
+
+@pytest.mark.parametrize("expresion", CORPUS)
+def test_kernel_coincide_con_numpy(con_jit, expresion):
+    f = compilar_numerica(expresion, (x, y))
+    kernel = _compilado(f)
+    assert kernel is not None
+    xs = np.linspace(-2.0, 2.0, 9)
+    ys = np.linspace(-1.5, 2.5, 9)
+    # Con t = [0] y w = [1] el kernel devuelve f(P, lo) en cada fila
+    obtenido = jit.integra_filas(kernel, [xs], ys, ys + 1.0, (np.zeros(1), np.ones(1)))
+    with np.errstate(all="ignore"):
+        esperado = np.broadcast_to(f(xs, ys), xs.shape)
+    np.testing.assert_allclose(obtenido, esperado, rtol=1e-13, equal_nan=True)
+
+
+def test_umbral_cuenta_un_uso_por_calculo(con_jit, monkeypatch):
+    monkeypatch.setattr(jit, "JIT_UMBRAL", 3)
+    limites = {"a": "0", "b": "1", "c": "0", "d": "x"}
+    f = compilar_numerica("x*y + 0.25", (x, y))
+    for _ in range(2):
+        assert calcular_integral("doble", "x*y + 0.25", limites)["valor"] == pytest.approx(0.25)
+    assert jit._compilaciones == {}
+    assert jit.kernel_filas(f) is None
+    calcular_integral("doble", "x*y + 0.25", limites)
+    jit.esperar(timeout=60)
+    assert jit.kernel_filas(f) is not None
+    assert calcular_integral("doble", "x*y + 0.25", limites)["valor"] == pytest.approx(0.25)
+    # Las llamadas reales usan la firma que se compiló en segundo plano: ninguna compila en línea
+    assert len(jit.kernel_filas(f).signatures) == 1
+
+
+def test_compila_en_segundo_plano_sin_bloquear(con_jit, monkeypatch):
+    seguir = threading.Event()
+    cargar = jit._carga
+
+    def carga_lenta(*args):
+        seguir.wait(10)
+        return cargar(*args)
+
+    monkeypatch.setattr(jit, "_carga", carga_lenta)
+    limites = {"a": "0", "b": "2"}
+    f = compilar_numerica("x^3", (x,))
+    inicio = time.monotonic()
+    assert calcular_integral("simple", "x^3", limites)["valor"] == pytest.approx(4.0)
+    # Mientras compila: NumPy, sin esperar a la compilación
+    assert jit.kernel_filas(f) is None
+    assert calcular_integral("simple", "x^3", limites)["valor"] == pytest.approx(4.0)
+    assert time.monotonic() - inicio < 5
+    seguir.set()
+    jit.esperar(timeout=60)
+    assert jit.kernel_filas(f) is not None
+
+
+def test_si_falla_la_compilacion_sigue_con_numpy(con_jit, monkeypatch, caplog):
+    def falla(*args):
+        raise RuntimeError("sin compilador")
+
+    monkeypatch.setattr(jit, "_carga", falla)
+    f = compilar_numerica("x^2 + 1", (x,))
+    assert _compilado(f) is None
+    assert "sin compilador" in caplog.text
+    assert calcular_integral("simple", "x^2 + 1", {"a": "0", "b": "3"})["valor"] == pytest.approx(12.0)
+
+
+def test_reutiliza_el_kernel_del_disco(con_jit, monkeypatch):
+    f = compilar_numerica("x*y - 2", (x, y))
+    assert _compilado(f) is not None
+    assert os.path.exists(_ruta(f))
+    # Otro proceso: sin estado en memoria, pero el kernel ya está en el disco
+    monkeypatch.setattr(jit, "JIT_UMBRAL", 100)
+    monkeypatch.setattr(jit, "_kernels", {})
+    monkeypatch.setattr(jit, "_compilaciones", {})
+    assert _compilado(f) is not None
+
+
+def test_no_importa_un_kernel_modificado(con_jit, tmp_path, caplog):
+    f = compilar_numerica("x + 2*y", (x, y))
+    ruta, marca = _ruta(f), tmp_path / "ejecutado"
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        archivo.write(f"open({str(marca)!r}, 'w').close()\n")
+    kernel = _compilado(f)
+    assert kernel is not None
+    assert not marca.exists()
+    assert "no coincide" in caplog.text
+    with open(ruta, encoding="utf-8") as archivo:
+        assert archivo.read() == jit._fuente(f.nodo, f.aridad)[0]
@@ -0,0 +1,52 @@
+import pytest
+
+from app.utils import math_parser
+from app.utils.math_parser import validar_expr_con_variables
+
+
+@pytest.fixture
+def sin_sympy(monkeypatch):
+    # Cualquier paso por parse_expr (eval de código generado) hace fallar la prueba
+    def prohibido(*args, **kwargs):
+        raise AssertionError("parse_expr en el camino de la petición")
+    monkeypatch.setattr(math_parser, "parse_expr", prohibido)
+
+
+@pytest.mark.parametrize("texto, variables, esperado", [
+    ("x^2 + 2x", {"x"}, "x**2+2*x"),
+    ("xy*sin(x)", {"x", "y"}, "x*y*sin(x)"),
+    ("SQRT(x+y+z)", {"x", "y", "z"}, "sqrt(x+y+z)"),
+])
+def test_valida_sin_sympy(sin_sympy, texto, variables, esperado):
+    assert validar_expr_con_variables(texto, variables) == esperado
+
+
+def test_variables_no_permitidas_sin_sympy(sin_sympy):
+    with pytest.raises(ValueError, match="Variables no permitidas: w"):
+        validar_expr_con_variables("w*x", {"x"})
+
+
+@pytest.mark.parametrize("texto, variables, esperado", [
+    ("gamma(x)", {"x"}, "gamma(x)"),
+    ("sin x", {"x"}, "sin(x)"),
+    ("pi", {"x"}, "pi"),
+])
+def test_fuera_de_la_lista_blanca_usa_sympy(texto, variables, esperado):
+    assert validar_expr_con_variables(texto, variables) == esperado
+
+
+@pytest.mark.parametrize("texto, mensaje", [
+    ("2+3", "solo un número"),
+    ("x^^2", "expresión matemática"),
+    ("oo*y", "no permitidas: y"),
+])
+def test_invalidas(texto, mensaje):
+    with pytest.raises(ValueError, match=mensaje):
+        validar_expr_con_variables(texto, {"x"})
+
+
+def test_peticion_doble_sin_sympy(sin_sympy, cliente):
+    r = cliente.post("/doble", json={"expresion": "3x^2*y", "x_inf": "0", "x_sup": "1", "y_inf": "0",
+                                     "y_sup": "x", "modo_grafica": "ninguna"})
+    assert r.status_code == 200
+    assert r.json()["valor"] == pytest.approx(0.3)
@@ -0,0 +1,48 @@
+import pytest
+
+from app.calculo.integrales import calcular_integral
+from app.calculo.servicio import resolver_lote
+
+LOTES = [
+    ("simple", "sin(x)", [{"a": "0", "b": str(b)} for b in (1, 2, 3)] + [{"a": "0", "b": "1+"}]),
+    ("simple", "sqrt(x)", [{"a": "0", "b": "1"}, {"a": "-1", "b": "1"}]),
+    ("doble", "x*y", [{"a": "0", "b": str(b), "c": "0", "d": "x"} for b in (1, 2, 3)]
+     + [{"a": "-1", "b": "1", "c": "x^2", "d": "1"}, {"a": "0", "b": "1", "c": 0.0, "d": 2.0}]),
+    ("doble", "abs(x-0.3)*exp(y)", [{"a": "0", "b": "1", "c": "0", "d": "x"}, {"a": "0", "b": "2", "c": "0", "d": "x"}]),
+    ("doble", "y/sqrt(x)", [{"a": "0", "b": "1", "c": "0", "d": "1"}, {"a": "1", "b": "4", "c": "0", "d": "1"}]),
+    ("doble", "sqrt(x-1)*y", [{"a": "0", "b": "2", "c": "0", "d": "1"}, {"a": "1", "b": "2", "c": "0", "d": "1"}]),
+    ("triple", "x*y*z", [{"a": "0", "b": str(b), "c": "0", "d": "x", "e": "0", "f": "y"} for b in (1, 2)]
+     + [{"a": "0", "b": "1", "c": "0", "d": "1", "e": "0", "f": "1"}]),
+    ("triple", "abs(x-0.3)*y*z", [{"a": "0", "b": "1", "c": "0", "d": "1", "e": "0", "f": "1"}]),
+]
+
+
+@pytest.mark.parametrize("metodo", ["auto", "simpson"])
+@pytest.mark.parametrize("tipo, expresion, lista_limites", LOTES)
+def test_lote_coincide_con_calculo_individual(tipo, expresion, lista_limites, metodo):
+    opciones = {"modo": "fijo", "metodo": metodo}
+    lote = resolver_lote(tipo, expresion, lista_limites, opciones)
+    assert len(lote) == len(lista_limites)
+    for limites, resultado in zip(lista_limites, lote):
+        individual = calcular_integral(tipo, expresion, limites, **opciones)
+        if "error" in individual:
+            assert "error" in resultado
+            continue
+        assert resultado["valor"] == pytest.approx(individual["valor"], rel=1e-9, abs=1e-12)
+        assert resultado["metodo"] == individual["metodo"]
+
+
+@pytest.mark.parametrize("tipo, lista_limites", [
+    ("doble", [{"a": "0", "b": str(b / 10), "c": "0", "d": "x"} for b in range(1, 40)]),
+    ("triple", [{"a": "0", "b": str(b / 10), "c": "0", "d": "x", "e": "0", "f": "1"} for b in range(1, 20)]),
+])
+def test_lote_multiple_vectorizado(monkeypatch, tipo, lista_limites):
+    from app.calculo import servicio
+
+    def individual(*args, **kwargs):
+        raise AssertionError("el lote no debe calcular integrales una a una")
+
+    monkeypatch.setattr(servicio, "calcular_integral", individual)
+    expresion = "exp(-x*y)" if tipo == "doble" else "exp(-x*y)*z"
+    lote = resolver_lote(tipo, expresion, lista_limites, {"modo": "fijo", "metodo": "auto"})
+    assert all(r["metodo"] == "gauss_legendre" for r in lote)
@@ -0,0 +1,59 @@
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.calculo.integrales import calcular_integral
+from app.calculo.simbolica import SimbolicaAgotada, limite_tiempo
+
+requiere_alarma = pytest.mark.skipif(not hasattr(signal, "SIGALRM"), reason="sin SIGALRM")
+
+
+@requiere_alarma
+def test_limite_tiempo_no_lo_absorbe_except_exception():
+    inicio = time.monotonic()
+    with pytest.raises(SimbolicaAgotada):
+        with limite_tiempo(0.05):
+            while time.monotonic() - inicio < 5:
+                try:
+                    time.sleep(0.01)
+                except Exception:
+                    pass
+    assert time.monotonic() - inicio < 1
+
+
+@requiere_alarma
+def test_limite_tiempo_respeta_la_alarma_del_ejecutor():
+    signal.setitimer(signal.ITIMER_REAL, 10)
+    try:
+        with limite_tiempo(0.05):
+            pass
+        restante, _ = signal.getitimer(signal.ITIMER_REAL)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    assert 9 < restante <= 10
+
+
+@requiere_alarma
+def test_via_simbolica_exacta():
+    res = calcular_integral("simple", "x^2", {"a": "0", "b": "1"}, simbolico=True)
+    assert res["exacto"] == "1/3"
+    assert res["valor"] == pytest.approx(1 / 3)
+
+
+def test_sin_alarma_se_avisa_en_la_respuesta(caplog):
+    # Fuera del hilo principal (ejecutor en modo hilos) no se puede acotar SymPy
+    with ThreadPoolExecutor(1) as pool:
+        res = pool.submit(calcular_integral, "simple", "x^2", {"a": "0", "b": "1"}, simbolico=True).result()
+    assert res["simbolico"] == "no_disponible"
+    assert "exacto" not in res
+    assert res["valor"] == pytest.approx(1 / 3)
+    assert "no disponible" in caplog.text
+
+
+def test_sin_alarma_se_avisa_en_el_endpoint(cliente):
+    r = cliente.post("/simple", json={"expresion": "x^2", "limite_inf": "0", "limite_sup": "1",
+                                      "simbolico": True, "modo_grafica": "ninguna"})
+    assert r.status_code == 200
+    assert r.json()["simbolico"] == "no_disponible"
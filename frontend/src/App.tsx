@@ -22,6 +22,50 @@ document.head.appendChild(fontLink);
 
 const BACKEND_URL = "http://localhost:8000";
 
+// Si la gráfica se pide en modo asíncrono, el valor llega de inmediato y la imagen
+// se consulta en /graficas/{id} hasta que el backend termina de renderizarla.
+async function esperarGrafica(id: string, intentos = 60): Promise<string | null> {
+  for (let i = 0; i < intentos; i++) {
+    const res = await axios.get(`${BACKEND_URL}/graficas/${id}`, {
+      responseType: "blob",
+      validateStatus: (status) => status === 200 || status === 202,
+    });
+    if (res.status === 200) return URL.createObjectURL(res.data);
+    await new Promise((r) => setTimeout(r, 500));
+  }
+  return null;
+}
+
+// Con modo_grafica "datos" el backend devuelve las mallas de la gráfica como
+// float32 en base64 y aquí se arma la figura de Plotly, sin pedir una imagen.
+function decodificarFloat32(b64: string): Float32Array {
+  const bytes = Uint8Array.from(atob(b64), (c) => c.charCodeAt(0));
+  return new Float32Array(bytes.buffer);
+}
+
+function figuraDesdeDatos(datos: any) {
+  const x = Array.from(decodificarFloat32(datos.x));
+  const y = Array.from(decodificarFloat32(datos.y));
+  if (datos.tipo === "simple") {
+    return {
+      data: [{ x, y, type: "scatter", mode: "lines", fill: "tozeroy", line: { color: "blue", width: 2 } }],
+      layout: { title: { text: "f(x)" }, xaxis: { title: { text: "x" } }, yaxis: { title: { text: "f(x)" } } },
+    };
+  }
+  const [ny, nx] = datos.forma;
+  const z = Array.from(decodificarFloat32(datos.z));
+  // Filas de la malla (ny, nx); Plotly deja huecos donde el valor es null
+  const filas = (arr: number[]) =>
+    Array.from({ length: ny }, (_, i) => arr.slice(i * nx, (i + 1) * nx).map((v) => (Number.isNaN(v) ? null : v)));
+  return {
+    data: [{ x, y: filas(y), z: filas(z), type: "surface", colorscale: "Plasma" }],
+    layout: {
+      title: { text: datos.tipo === "doble" ? "f(x, y)" : "∫ f(x, y, z) dz" },
+      scene: { xaxis: { title: { text: "x" } }, yaxis: { title: { text: "y" } }, zaxis: { title: { text: "z" } } },
+    },
+  };
+}
+
 type TipoIntegral = "simple" | "doble" | "triple";
 
 function tieneFuncionesSinParentesis(expr: string) {
@@ -268,6 +312,7 @@ export default function App() {
           expresion,
           limite_inf: limiteInf,
           limite_sup: limiteSup,
+          modo_grafica: "datos",
         });
       } else if (tipo === "doble") {
         res = await axios.post(`${BACKEND_URL}/doble`, {
@@ -276,6 +321,7 @@ export default function App() {
           x_sup: xSup,
           y_inf: yInf,
           y_sup: ySup,
+          modo_grafica: "datos",
         });
       } else if (tipo === "triple") {
         res = await axios.post(`${BACKEND_URL}/triple`, {
@@ -286,11 +332,14 @@ export default function App() {
           y_sup: tySup,
           z_inf: tzInf,
           z_sup: tzSup,
+          modo_grafica: "datos",
         });
       }
       if (res) {
         setResultado(res.data.valor !== undefined ? res.data.valor : null);
-        if (res.data.grafica) {
+        if (res.data.grafica_datos) {
+          setGraficaUrl(figuraDesdeDatos(res.data.grafica_datos));
+        } else if (res.data.grafica) {
           if (typeof res.data.grafica === "string") {
             setGraficaUrl(
               res.data.grafica.startsWith("http")
@@ -300,6 +349,10 @@ export default function App() {
           } else {
             setGraficaUrl(res.data.grafica);
           }
+        } else if (res.data.grafica_id) {
+          esperarGrafica(res.data.grafica_id)
+            .then((url) => setGraficaUrl(url))
+            .catch(() => setError("Ocurrió un problema al graficar la región de integración."));
         } else {
           setGraficaUrl(null);
         }